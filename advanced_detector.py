@@ -1,8 +1,17 @@
+import copy
+import math
+import time
+from contextlib import nullcontext
+
 import torch
+import torch.distributed as dist
 import torch.nn as nn
+from torch.nn.parallel import DistributedDataParallel
 from torch.utils.data import DataLoader, TensorDataset
 import numpy as np
 
+from threshold_calibration import StreamingThresholdCalibrator
+
 class Autoencoder(nn.Module):
     """
     Architecture de l'Autoencodeur.
@@ -31,63 +40,186 @@ class Autoencoder(nn.Module):
         decoded = self.decoder(encoded)
         return decoded
 
+def _with_last(iterable):
+    """Itère en signalant le dernier élément, pour appliquer le dernier pas d'optimisation."""
+    iterator = iter(iterable)
+    try:
+        previous = next(iterator)
+    except StopIteration:
+        return
+    for item in iterator:
+        yield previous, False
+        previous = item
+    yield previous, True
+
 class AdvancedAnomalyDetector:
     """
     Détecteur avancé utilisant un Autoencodeur PyTorch.
     Il apprend la structure des données normales et détecte les déviations.
     """
-    def __init__(self, input_dim, encoding_dim=32):
+    def __init__(self, input_dim, encoding_dim=32, threshold_policy="max"):
         self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
         self.model = Autoencoder(input_dim, encoding_dim).to(self.device)
         self.criterion = nn.MSELoss() # On mesure l'erreur de reconstruction
         self.optimizer = torch.optim.Adam(self.model.parameters(), lr=1e-3)
         self.threshold = 0.0 # Le seuil sera déterminé après l'entraînement
+        self.threshold_policy = threshold_policy # 'max' ou un quantile ('p99', 'p99.9', ...)
+        self.thresholds = {} # Tous les seuils candidats calculés lors de la calibration
+        self.calibration_samples = 0
+        self._inference_model = None # Modèle compilé optionnel (TorchScript ou torch.compile)
 
-    def train(self, data_loader, epochs=20):
+    def train(self, data_loader, epochs=20, accumulation_steps=1, early_stopping_patience=None,
+              min_delta=0.0, calibrate=True):
+        """
+        Entraîne l'autoencodeur sur des données normales.
+        :param accumulation_steps: Nombre de lots dont les gradients sont cumulés avant chaque pas.
+        :param early_stopping_patience: Époques sans amélioration avant l'arrêt (None = désactivé).
+                                        Les meilleurs poids sont restaurés à l'arrêt.
+        :param min_delta: Baisse minimale de la perte considérée comme une amélioration.
+        :param calibrate: Détermine le seuil d'anomalie à la fin de l'entraînement.
+        :return: Historique par époque (perte moyenne, signaux/s).
+        """
         print(f"\nDébut de l'entraînement du détecteur avancé sur {self.device}...")
+        self._inference_model = None # Les poids vont changer : toute version compilée est périmée
         self.model.train()
+        distributed = isinstance(self.model, DistributedDataParallel)
+        history = []
+        best_loss, best_state, stale_epochs = math.inf, None, 0
         for epoch in range(epochs):
-            total_loss = 0
-            for (data,) in data_loader:
-                data = data.to(self.device)
-                self.optimizer.zero_grad()
-                reconstructed = self.model(data)
-                loss = self.criterion(reconstructed, data)
-                loss.backward()
-                self.optimizer.step()
-                total_loss += loss.item()
-            print(f'Epoch {epoch+1}/{epochs}, Perte: {total_loss/len(data_loader):.6f}')
+            if hasattr(data_loader.dataset, "set_epoch"):
+                data_loader.dataset.set_epoch(epoch)
+            start = time.perf_counter()
+            # La perte est cumulée sur le device : une seule synchronisation par époque
+            total_loss = torch.zeros((), device=self.device)
+            # Les datasets en flux (IterableDataset) n'ont pas de longueur : on compte les lots
+            n_batches = 0
+            n_samples = 0
+            self.optimizer.zero_grad()
+            # join() tolère des nombres de lots différents d'un processus à l'autre
+            with self.model.join() if distributed else nullcontext():
+                for (data,), is_last in _with_last(data_loader):
+                    data = data.to(self.device, non_blocking=True)
+                    n_batches += 1
+                    n_samples += data.shape[0]
+                    step = is_last or n_batches % accumulation_steps == 0
+                    # Entre deux pas, inutile de synchroniser les gradients entre processus
+                    with nullcontext() if step or not distributed else self.model.no_sync():
+                        reconstructed = self.model(data)
+                        loss = self.criterion(reconstructed, data)
+                        (loss / accumulation_steps).backward()
+                    if step:
+                        self.optimizer.step()
+                        self.optimizer.zero_grad()
+                    total_loss += loss.detach()
+
+            totals = torch.tensor([total_loss.item(), n_batches, n_samples], dtype=torch.float64)
+            if distributed:
+                dist.all_reduce(totals)
+            elapsed = time.perf_counter() - start
+            epoch_loss = totals[0].item() / max(totals[1].item(), 1)
+            throughput = totals[2].item() / elapsed if elapsed > 0 else 0.0
+            history.append({"epoch": epoch + 1, "loss": epoch_loss, "samples_per_sec": throughput})
+            print(f'Epoch {epoch+1}/{epochs}, Perte: {epoch_loss:.6f}, Débit: {throughput:,.0f} signaux/s')
+
+            if early_stopping_patience is not None:
+                if epoch_loss < best_loss - min_delta:
+                    best_loss, stale_epochs = epoch_loss, 0
+                    best_state = copy.deepcopy(self._base_model().state_dict())
+                else:
+                    stale_epochs += 1
+                    if stale_epochs >= early_stopping_patience:
+                        print(f"Arrêt anticipé : aucune amélioration depuis {stale_epochs} époques.")
+                        break
+        if best_state is not None:
+            self._base_model().load_state_dict(best_state)
         
         # Déterminer le seuil d'anomalie
-        self._set_threshold(data_loader)
+        if calibrate:
+            self._set_threshold(data_loader)
+        return history
+
+    def _base_model(self):
+        """Autoencodeur sous-jacent, y compris lorsqu'il est enveloppé par DistributedDataParallel."""
+        return self.model.module if isinstance(self.model, DistributedDataParallel) else self.model
 
     def _set_threshold(self, data_loader):
+        # Calibration en flux : mémoire constante, quel que soit le volume de données
         self.model.eval()
-        losses = []
+        calibrator = StreamingThresholdCalibrator()
         with torch.no_grad():
             for (data,) in data_loader:
                 data = data.to(self.device)
                 reconstructed = self.model(data)
                 loss = torch.mean((data - reconstructed) ** 2, dim=1)
-                losses.extend(loss.cpu().numpy())
-        # Le seuil est défini comme la perte de reconstruction maximale sur les données normales
-        self.threshold = max(losses)
-        print(f"Seuil d'anomalie déterminé : {self.threshold:.6f}")
+                calibrator.update(loss.cpu().numpy())
+        self.thresholds = calibrator.thresholds()
+        self.calibration_samples = calibrator.count
+        # Par défaut ('max'), le seuil est la perte de reconstruction maximale sur les données normales
+        self.threshold = calibrator.threshold(self.threshold_policy)
+        print(f"Seuil d'anomalie déterminé ({self.threshold_policy}) : {self.threshold:.6f}")
 
     def predict(self, data_loader):
         self.model.eval()
-        anomalies = []
-        with torch.no_grad():
-            for i, (data,) in enumerate(data_loader):
+        flags = []
+        with torch.inference_mode():
+            for (data,) in data_loader:
                 data = data.to(self.device)
                 reconstructed = self.model(data)
                 loss = torch.mean((data - reconstructed) ** 2, dim=1)
-                
-                # Compare la perte au seuil
-                is_anomaly = loss > self.threshold
-                for anomaly_flag in is_anomaly:
-                    anomalies.append(-1 if anomaly_flag.item() else 1)
-        return anomalies
+                # Compare la perte au seuil, sans synchronisation par élément
+                flags.append(loss > self.threshold)
+        if not flags:
+            return []
+        is_anomaly = torch.cat(flags).cpu().numpy()
+        return np.where(is_anomaly, -1, 1).tolist()
+
+    def compile_model(self, backend="torchscript"):
+        """
+        Prépare une version optimisée du modèle pour predict_batch.
+        :param backend: 'torchscript' (torch.jit.trace puis freeze) ou 'compile' (torch.compile).
+        """
+        self.model.eval()
+        if backend == "torchscript":
+            example = torch.zeros(1, self.model.encoder[0].in_features, device=self.device)
+            with torch.no_grad():
+                traced = torch.jit.trace(self.model, example)
+            self._inference_model = torch.jit.freeze(traced)
+        elif backend == "compile":
+            self._inference_model = torch.compile(self.model)
+        else:
+            raise ValueError(f"Backend de compilation inconnu : {backend}")
+        print(f"Modèle compilé pour l'inférence ({backend}).")
+        return self._inference_model
+
+    def reconstruction_errors(self, X, chunk_size=65536):
+        """
+        Erreurs de reconstruction d'un lot de données déjà normalisées.
+        :param X: Tableau NumPy ou tenseur de forme (N, input_dim).
+        :param chunk_size: Taille des blocs évalués en un passage (borne la mémoire).
+        :return: Tableau NumPy float32 de N erreurs.
+        """
+        tensor = torch.as_tensor(X, dtype=torch.float32)
+        if tensor.ndim != 2:
+            raise ValueError(f"Entrée attendue de forme (N, input_dim), reçu {tuple(tensor.shape)}.")
+        model = self._inference_model or self.model
+        self.model.eval()
+        errors = np.empty(tensor.shape[0], dtype=np.float32)
+        with torch.inference_mode():
+            for start in range(0, tensor.shape[0], chunk_size):
+                data = tensor[start:start + chunk_size].to(self.device)
+                reconstructed = model(data)
+                loss = torch.mean((data - reconstructed) ** 2, dim=1)
+                errors[start:start + data.shape[0]] = loss.cpu().numpy()
+        return errors
+
+    def predict_batch(self, X, chunk_size=65536):
+        """
+        Prédiction vectorisée : un seul seuillage NumPy sur toutes les erreurs.
+        :return: (labels, errors) avec labels = -1 (anomalie) ou 1 (normal), en int8.
+        """
+        errors = self.reconstruction_errors(X, chunk_size)
+        labels = np.where(errors > self.threshold, -1, 1).astype(np.int8)
+        return labels, errors
 
     def prepare_features(self, network_data):
         """
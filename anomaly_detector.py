@@ -1,5 +1,12 @@
 # anomaly_detector.py
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import joblib
+import numpy as np
 import pandas as pd
+from joblib import Parallel, delayed
 from sklearn.model_selection import train_test_split
 from sklearn.ensemble import IsolationForest # Un bon point de départ pour la détection d'anomalies
 
@@ -9,22 +16,31 @@ class AnomalyDetector:
     Utilise un modèle Isolation Forest pour commencer, comme prévu dans la phase 1.
     Ce modèle est efficace pour identifier des outliers dans les données.
     """
-    def __init__(self, contamination=0.01):
+    def __init__(self, contamination=0.01, n_jobs=None, verbose=True):
         """
         Initialise le détecteur.
         :param contamination: Le pourcentage attendu d'anomalies dans les données.
                               C'est un hyperparamètre clé pour notre modèle.
+        :param n_jobs: Nombre de cœurs pour l'entraînement et le scoring (-1 = tous).
+        :param verbose: Affiche les messages de suivi (à désactiver en production).
         """
-        self.model = IsolationForest(contamination=contamination, random_state=42)
+        self.model = IsolationForest(contamination=contamination, random_state=42, n_jobs=n_jobs)
+        self.n_jobs = n_jobs
+        self.verbose = verbose
+        self.feature_names = None
         self.is_trained = False
-        print("Détecteur d'anomalies initialisé.")
+        self._log("Détecteur d'anomalies initialisé.")
+
+    def _log(self, message):
+        if self.verbose:
+            print(message)
 
     def load_data(self, legit_path, attack_path):
         """
         Charge les données légitimes et les données d'attaque.
         Dans un cas réel, ces données proviendraient de la télémétrie ASTRA HIVE.
         """
-        print(f"Chargement des données depuis {legit_path} et {attack_path}...")
+        self._log(f"Chargement des données depuis {legit_path} et {attack_path}...")
         df_legit = pd.read_csv(legit_path)
         df_attack = pd.read_csv(attack_path)
 
@@ -34,7 +50,7 @@ class AnomalyDetector:
 
         # On combine les deux jeux de données
         df = pd.concat([df_legit, df_attack], ignore_index=True)
-        print("Données chargées et combinées.")
+        self._log("Données chargées et combinées.")
         return df
 
     def train(self, data):
@@ -42,12 +58,14 @@ class AnomalyDetector:
         Entraîne le modèle sur les données fournies.
         Le modèle apprendra à distinguer les signaux normaux des anormaux.
         """
-        print("Début de l'entraînement du modèle...")
+        self._log("Début de l'entraînement du modèle...")
         # Pour Isolation Forest, on entraîne sur les données sans les étiquettes
         features = data.drop('label', axis=1)
-        self.model.fit(features)
+        self.feature_names = list(features.columns)
+        # Entraînement sur un tableau NumPy : le scoring en production se fait sans pandas
+        self.model.fit(features.to_numpy(dtype=np.float64))
         self.is_trained = True
-        print("Entraînement terminé avec succès.")
+        self._log("Entraînement terminé avec succès.")
 
     def predict(self, signal_data):
         """
@@ -55,9 +73,96 @@ class AnomalyDetector:
         :param signal_data: Un DataFrame contenant les caractéristiques du signal à analyser.
         :return: -1 si c'est une anomalie, 1 si c'est normal.
         """
+        self._check_trained()
+        self._log(f"Prédiction sur {len(signal_data)} nouveaux signaux...")
+        return self.labels_from_scores(self.score_samples(signal_data))
+
+    def _check_trained(self):
         if not self.is_trained:
             raise Exception("Le modèle doit être entraîné avant de pouvoir faire des prédictions.")
-        
-        print(f"Prédiction sur {len(signal_data)} nouveaux signaux...")
-        prediction = self.model.predict(signal_data)
-        return prediction 
\ No newline at end of file
+
+    def _as_array(self, signal_data):
+        if isinstance(signal_data, pd.DataFrame):
+            columns = self.feature_names or list(signal_data.columns)
+            return signal_data[columns].to_numpy(dtype=np.float64)
+        return np.asarray(signal_data, dtype=np.float64)
+
+    def score_samples(self, signal_data, n_jobs=None, chunk_size=65536):
+        """
+        Scores d'anomalie de la forêt (plus bas = plus anormal), calculés en parallèle.
+        Le tableau est découpé en blocs répartis sur n_jobs threads : le parcours des arbres
+        (Cython) relâche le GIL, le modèle n'est donc ni copié ni sérialisé.
+        """
+        self._check_trained()
+        X = self._as_array(signal_data)
+        n_jobs = n_jobs if n_jobs is not None else self.n_jobs
+        if n_jobs in (None, 1) or X.shape[0] <= chunk_size:
+            return self.model.score_samples(X)
+        chunks = [X[i:i + chunk_size] for i in range(0, X.shape[0], chunk_size)]
+        scores = Parallel(n_jobs=n_jobs, prefer="threads")(
+            delayed(self.model.score_samples)(chunk) for chunk in chunks
+        )
+        return np.concatenate(scores)
+
+    def labels_from_scores(self, scores):
+        """Convertit des scores en étiquettes : -1 pour une anomalie, 1 pour un signal normal."""
+        return np.where(np.asarray(scores) < self.model.offset_, -1, 1)
+
+    def save(self, path):
+        """Sauvegarde la forêt entraînée et les colonnes attendues."""
+        self._check_trained()
+        joblib.dump({"model": self.model, "feature_names": self.feature_names}, path)
+        self._log(f"Détecteur IsolationForest sauvegardé dans {path}")
+
+    @classmethod
+    def load(cls, path, n_jobs=None, verbose=False):
+        """Recharge un détecteur sauvegardé par save()."""
+        state = joblib.load(path)
+        detector = cls.__new__(cls)
+        detector.model = state["model"]
+        detector.feature_names = state["feature_names"]
+        detector.n_jobs = n_jobs
+        detector.verbose = verbose
+        detector.is_trained = True
+        return detector
+
+
+# --- Scoring en flux d'archives CSV par un pool de processus ---
+_WORKER_DETECTOR = None
+
+def _init_stream_worker(model_path):
+    global _WORKER_DETECTOR
+    # Chaque processus charge la forêt une seule fois, au démarrage
+    _WORKER_DETECTOR = AnomalyDetector.load(model_path, n_jobs=1)
+
+def _score_chunk(X):
+    scores = _WORKER_DETECTOR.score_samples(X)
+    return scores, _WORKER_DETECTOR.labels_from_scores(scores)
+
+def score_csv_stream(model_path, input_path, output_path, chunksize=100_000, max_workers=None):
+    """
+    Score une archive CSV bloc par bloc dans un pool de processus et écrit les scores au fil de l'eau.
+    Au plus 2 blocs par processus sont en vol : la mémoire reste bornée quelle que soit la taille du fichier.
+    La sortie conserve l'ordre des lignes (colonnes 'score' et 'label').
+    :return: Nombre de lignes scorées.
+    """
+    feature_names = joblib.load(model_path)["feature_names"]
+    max_workers = max_workers or os.cpu_count()
+    pending = deque()
+    n_rows = 0
+    with ProcessPoolExecutor(max_workers, initializer=_init_stream_worker, initargs=(model_path,)) as pool, \
+            open(output_path, "w", newline="") as out:
+        out.write("score,label\n")
+
+        def write_oldest():
+            scores, labels = pending.popleft().result()
+            np.savetxt(out, np.column_stack([scores, labels]), fmt=["%.8f", "%d"], delimiter=",")
+            return len(scores)
+
+        for chunk in pd.read_csv(input_path, usecols=feature_names, chunksize=chunksize):
+            pending.append(pool.submit(_score_chunk, chunk[feature_names].to_numpy(dtype=np.float64)))
+            if len(pending) >= 2 * max_workers:
+                n_rows += write_oldest()
+        while pending:
+            n_rows += write_oldest()
+    return n_rows 
\ No newline at end of file
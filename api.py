@@ -1,9 +1,9 @@
-import torch
-import joblib
-import pandas as pd
+import os
 from flask import Flask, request, jsonify
 
-from advanced_detector import AdvancedAnomalyDetector
+from hive_inference import MicroBatchInferenceEngine, features_from_json
+from model_registry import ModelRegistry
+from online_learning import OnlineLearner
 
 # --- Configuration et Chargement des Modèles ---
 print("Initialisation du serveur API ASTRA HIVE...")
@@ -13,26 +13,55 @@ CONFIG = {
     "INPUT_DIM": 3,
     "ENCODING_DIM": 16,
     "MODEL_PATH": "astra_anomaly_detector.pth",
-    "SCALER_PATH": "astra_data_scaler.pkl"
+    "SCALER_PATH": "astra_data_scaler.pkl",
+    "KERNEL_PATH": "astra_scoring_kernel.npz",
+    "DEFAULT_THRESHOLD": 0.001, # Utilisé uniquement si le manifeste du modèle est absent
+    "MAX_BATCH_SIZE": 256, # Nombre maximal de signaux par passage avant
+    "MAX_WAIT_US": 2000, # Délai maximal de regroupement des requêtes (microsecondes)
+    "PRELOAD": os.environ.get("ASTRA_PRELOAD") == "1", # Charger avant le fork des workers (gunicorn --preload)
+    "ONLINE_LEARNING": os.environ.get("ASTRA_ONLINE_LEARNING") == "1", # Affinage continu sur le trafic réel
+    "RELOAD_INTERVAL_S": 5.0 # Fréquence de vérification du manifeste pour le rechargement à chaud
 }
 
-# 2. Initialiser l'architecture du détecteur
-# Note : Nous créons une instance pour pouvoir charger le state_dict
-detector = AdvancedAnomalyDetector(
-    input_dim=CONFIG["INPUT_DIM"], 
-    encoding_dim=CONFIG["ENCODING_DIM"]
+# 2. Déclarer les artefacts : le noyau de scoring exporté est préféré au .pth + scaler,
+#    ce qui évite d'importer torch et joblib dans les workers
+registry = ModelRegistry(
+    model_path=CONFIG["MODEL_PATH"],
+    scaler_path=CONFIG["SCALER_PATH"],
+    kernel_path=CONFIG["KERNEL_PATH"],
+    input_dim=CONFIG["INPUT_DIM"],
+    encoding_dim=CONFIG["ENCODING_DIM"],
+    max_batch_size=CONFIG["MAX_BATCH_SIZE"],
+    default_threshold=CONFIG["DEFAULT_THRESHOLD"]
 )
 
-# 3. Charger les poids du modèle entraîné
-detector.model.load_state_dict(torch.load(CONFIG["MODEL_PATH"]))
-detector.model.eval() # Très important : passer le modèle en mode évaluation
-print(f"Modèle chargé depuis '{CONFIG['MODEL_PATH']}'")
+# 3. Charger les artefacts : avant le fork en mode preload, sinon en arrière-plan
+if CONFIG["PRELOAD"]:
+    registry.preload()
+else:
+    registry.load_in_background()
+registry.watch(CONFIG["RELOAD_INTERVAL_S"])
 
-# 4. Charger le scaler
-scaler = joblib.load(CONFIG["SCALER_PATH"])
-print(f"Scaler chargé depuis '{CONFIG['SCALER_PATH']}'")
+# 4. Apprentissage en ligne (optionnel) : les signaux scorés alimentent le tampon de rejeu
+learner = OnlineLearner(registry) if CONFIG["ONLINE_LEARNING"] else None
 
-# 5. Initialiser l'application Flask
+def score_batch(X):
+    # Le seuil accompagne les erreurs : verdict décidé avec la génération qui a scoré le lot
+    errors, threshold = registry.score_with_threshold(X)
+    if learner is not None:
+        learner.observe(X, errors, threshold)
+    return errors, threshold
+
+# 5. Déclarer le moteur d'inférence par micro-lots
+#    Son thread démarre à la première requête, donc dans chaque worker après le fork
+engine = MicroBatchInferenceEngine(
+    score_batch,
+    max_batch_size=CONFIG["MAX_BATCH_SIZE"],
+    max_wait_us=CONFIG["MAX_WAIT_US"]
+)
+print(f"Moteur d'inférence configuré (lots de {CONFIG['MAX_BATCH_SIZE']}, délai {CONFIG['MAX_WAIT_US']} µs)")
+
+# 6. Initialiser l'application Flask
 app = Flask(__name__)
 print("Serveur API prêt à recevoir des requêtes.")
 
@@ -49,22 +78,19 @@ def predict():
         return jsonify({"error": "Données non fournies"}), 400
 
     try:
-        # Convertir les données en DataFrame pour le scaler
-        df = pd.DataFrame([input_data])
-        
-        # Normaliser les données avec le scaler chargé
-        scaled_data = scaler.transform(df)
-        tensor_data = torch.FloatTensor(scaled_data).to(detector.device)
-
-        # Faire la prédiction
-        with torch.no_grad():
-            reconstructed = detector.model(tensor_data)
-            # Calculer l'erreur de reconstruction
-            loss = torch.mean((tensor_data - reconstructed) ** 2, dim=1)
-            is_anomaly = loss > 0.001 # Utiliser un seuil prédéfini ou celui calculé
-        
-        result = "Anomalie Détectée" if is_anomaly.item() else "Signal Normal"
-        confidence_score = loss.item()
+        features = features_from_json(input_data)
+    except (KeyError, TypeError, ValueError) as e:
+        return jsonify({"error": f"Signal invalide : {e}"}), 400
+
+    if not registry.is_ready():
+        return jsonify({"error": "Modèle en cours de chargement", **registry.readiness()}), 503
+
+    try:
+        # Le moteur regroupe ce signal avec les requêtes concurrentes
+        # et l'évalue en un seul passage du noyau de scoring
+        confidence_score, threshold = engine.predict(features)
+        is_anomaly = confidence_score > threshold
+        result = "Anomalie Détectée" if is_anomaly else "Signal Normal"
 
         # Retourner une réponse JSON claire
         return jsonify({
@@ -75,6 +101,18 @@ def predict():
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+# --- Endpoints de supervision ---
+@app.route("/health", methods=["GET"])
+def health():
+    """Liveness : le processus répond, que le modèle soit chargé ou non."""
+    return jsonify({**registry.liveness(), "service": "ASTRA HIVE API"})
+
+@app.route("/ready", methods=["GET"])
+def ready():
+    """Readiness : 200 uniquement lorsque les artefacts sont chargés."""
+    status = registry.readiness()
+    return jsonify(status), (200 if status["ready"] else 503)
+
 if __name__ == "__main__":
     # Lancer le serveur sur le port 5000
-    app.run(debug=True, port=5000) 
\ No newline at end of file
+    app.run(debug=True, port=5000, threaded=True) 
\ No newline at end of file
@@ -2,6 +2,8 @@
 from flask import Flask, request, jsonify
 import numpy as np
 
+from detection_rules import RULE_LIMITS, VALID_MODULATIONS
+
 app = Flask(__name__)
 
 # Simulation d'un détecteur d'anomalies simple
@@ -13,12 +15,13 @@ def detect_anomaly(data):
     power = data.get('power', 0)
     modulation = data.get('modulation', 0)
     
-    # Seuils d'anomalie (simulation)
-    if frequency > 15.0 or frequency < 10.0:
+    low, high = RULE_LIMITS["frequency"]
+    if frequency > high or frequency < low:
         return True, "Fréquence anormale"
-    if power > 500.0 or power < 50.0:
+    low, high = RULE_LIMITS["power"]
+    if power > high or power < low:
         return True, "Puissance anormale"
-    if modulation not in [0, 1]:
+    if modulation not in VALID_MODULATIONS:
         return True, "Modulation invalide"
     
     return False, "Signal normal"
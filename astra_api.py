@@ -1,32 +1,42 @@
-from fastapi import FastAPI, HTTPException
+import os
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import Response, StreamingResponse
 from pydantic import BaseModel, conlist
-import torch
-import joblib
+from starlette.concurrency import run_in_threadpool
 import numpy as np
-from advanced_detector import AdvancedAnomalyDetector, Autoencoder
+from hive_inference import allocate_bulk_results, decode_bulk_signals, encode_bulk_results, iter_ndjson_results
+from model_registry import ModelRegistry
+from online_learning import OnlineLearner
 
 # --- Configuration ---
 MODEL_PATH = "astra_anomaly_detector.pth"
 SCALER_PATH = "astra_data_scaler.pkl"
+KERNEL_PATH = "astra_scoring_kernel.npz"
 INPUT_DIM = 3
 ENCODING_DIM = 16
+DEFAULT_THRESHOLD = 0.004 # Utilisé uniquement si le manifeste du modèle est absent
+PRELOAD = os.environ.get("ASTRA_PRELOAD") == "1" # Charger avant le fork des workers
+ONLINE_LEARNING = os.environ.get("ASTRA_ONLINE_LEARNING") == "1" # Affinage continu sur le trafic réel
+RELOAD_INTERVAL_S = 5.0 # Fréquence de vérification du manifeste pour le rechargement à chaud
+MAX_BULK_ROWS = 5_000_000 # Taille maximale d'un lot binaire (60 Mo en float32)
+BULK_BODY_SLACK = 64 * 1024 # En-tête .npy ou métadonnées Arrow au-delà des données float32
+MAX_BULK_BYTES = MAX_BULK_ROWS * INPUT_DIM * 4 + BULK_BODY_SLACK
 
 # --- Chargement du modèle et du scaler ---
 app = FastAPI(title="ASTRA Anomaly Detection API", description="API de détection d'anomalies pour signaux satellites", version="1.0")
 
-try:
-    scaler = joblib.load(SCALER_PATH)
-except Exception as e:
-    scaler = None
-    print(f"Erreur lors du chargement du scaler : {e}")
+# Le registre charge le noyau de scoring à la demande : torch et joblib ne sont
+# importés que si le noyau exporté est absent
+registry = ModelRegistry(MODEL_PATH, SCALER_PATH, KERNEL_PATH, INPUT_DIM, ENCODING_DIM,
+                         default_threshold=DEFAULT_THRESHOLD)
+if PRELOAD:
+    registry.preload()
+learner = OnlineLearner(registry) if ONLINE_LEARNING else None
 
-try:
-    model = Autoencoder(INPUT_DIM, ENCODING_DIM)
-    model.load_state_dict(torch.load(MODEL_PATH, map_location=torch.device('cpu')))
-    model.eval()
-except Exception as e:
-    model = None
-    print(f"Erreur lors du chargement du modèle : {e}")
+@app.on_event("startup")
+def start_model_loading():
+    registry.load_in_background()
+    registry.watch(RELOAD_INTERVAL_S)
 
 # --- Schéma d'entrée pour FastAPI ---
 class SignalInput(BaseModel):
@@ -37,30 +47,31 @@ class SignalInput(BaseModel):
 class BatchInput(BaseModel):
     signals: conlist(SignalInput, min_items=1)
 
-# --- Endpoint de santé ---
+# --- Endpoints de santé ---
 @app.get("/health")
 def health():
-    if model is not None and scaler is not None:
-        return {"status": "ok"}
-    else:
-        raise HTTPException(status_code=500, detail="Modèle ou scaler non chargé")
+    # Liveness : le worker répond, que le modèle soit chargé ou non
+    return registry.liveness()
+
+@app.get("/ready")
+def ready():
+    # Readiness : le worker peut servir des prédictions
+    status = registry.readiness()
+    if not status["ready"]:
+        raise HTTPException(status_code=503, detail=status)
+    return status
 
 # --- Endpoint de prédiction ---
 @app.post("/predict")
 def predict(batch: BatchInput):
-    if model is None or scaler is None:
-        raise HTTPException(status_code=500, detail="Modèle ou scaler non chargé")
+    if not registry.is_ready():
+        raise HTTPException(status_code=503, detail="Modèle ou scaler en cours de chargement")
     # Préparation des données
-    X = np.array([[s.frequency, s.power, s.modulation] for s in batch.signals])
-    X_scaled = scaler.transform(X)
-    X_tensor = torch.FloatTensor(X_scaled)
-    with torch.no_grad():
-        reconstructed = model(X_tensor)
-        losses = torch.mean((X_tensor - reconstructed) ** 2, dim=1).numpy()
-    # Seuil d'anomalie : on reprend la logique du modèle (max sur les données d'entraînement)
-    # Ici, on peut charger le seuil depuis un fichier ou le recalculer (à adapter si besoin)
-    # Pour la démo, on utilise un seuil par défaut
-    threshold = 0.004
+    X = np.array([[s.frequency, s.power, s.modulation] for s in batch.signals], dtype=np.float32)
+    # Seuil d'anomalie : celui calibré à l'entraînement pour la génération qui a scoré ce lot
+    losses, threshold = registry.score_with_threshold(X)
+    if learner is not None:
+        learner.observe(X, losses, threshold)
     results = []
     for i, loss in enumerate(losses):
         verdict = "Anomalie" if loss > threshold else "Normal"
@@ -71,12 +82,69 @@ def predict(batch: BatchInput):
         })
     return {"results": results}
 
+# --- Endpoint de prédiction en masse (binaire) ---
+class PackedResponse(Response):
+    """Réponse binaire servie directement depuis le tampon de résultats, sans copie en bytes."""
+    media_type = "application/octet-stream"
+
+    def render(self, content):
+        return content
+
+async def _read_bulk_body(request):
+    # Refus avant lecture sur Content-Length, puis plafond pendant la lecture (corps chunked ou mensonger)
+    length = request.headers.get("content-length")
+    if length is not None and length.isdigit() and int(length) > MAX_BULK_BYTES:
+        raise HTTPException(status_code=413, detail=f"Corps limité à {MAX_BULK_BYTES} octets.")
+    body = bytearray()
+    async for chunk in request.stream():
+        body += chunk
+        if len(body) > MAX_BULK_BYTES:
+            raise HTTPException(status_code=413, detail=f"Corps limité à {MAX_BULK_BYTES} octets.")
+    return body
+
+def _score_bulk(X, out=None):
+    losses, threshold = registry.score_with_threshold(X, out=out)
+    if learner is not None:
+        learner.observe(X, losses, threshold)
+    return losses, threshold
+
+@app.post("/predict/bulk")
+async def predict_bulk(request: Request, format: str = "packed"):
+    """
+    Corps : float32 petit-boutiste (N, 3) brut, fichier .npy ou flux Arrow (selon Content-Type).
+    Réponse 'packed' : N erreurs float32 puis N verdicts uint8 ; 'ndjson' : une ligne JSON par signal.
+    """
+    if not registry.is_ready():
+        raise HTTPException(status_code=503, detail="Modèle ou scaler en cours de chargement")
+    if format not in ("packed", "ndjson"):
+        raise HTTPException(status_code=400, detail=f"Format de réponse inconnu : {format}")
+    body = await _read_bulk_body(request)
+    try:
+        X = decode_bulk_signals(body, request.headers.get("content-type"), INPUT_DIM)
+    except (ValueError, ImportError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if X.shape[0] == 0 or X.shape[0] > MAX_BULK_ROWS:
+        raise HTTPException(status_code=400, detail=f"Le lot doit contenir entre 1 et {MAX_BULK_ROWS} signaux.")
+    # Scoring hors de la boucle d'événements : les autres requêtes continuent d'être servies
+    if format == "ndjson":
+        losses, threshold = await run_in_threadpool(_score_bulk, X)
+        return StreamingResponse(iter_ndjson_results(losses, threshold), media_type="application/x-ndjson",
+                                 headers=_bulk_headers(X, threshold))
+    # Format packé : les erreurs sont écrites directement dans le tampon de la réponse
+    payload, errors = allocate_bulk_results(X.shape[0])
+    losses, threshold = await run_in_threadpool(_score_bulk, X, errors)
+    return PackedResponse(encode_bulk_results(losses, threshold, payload), headers=_bulk_headers(X, threshold))
+
+def _bulk_headers(X, threshold):
+    return {"X-Astra-Rows": str(X.shape[0]), "X-Astra-Threshold": repr(float(threshold))}
+
 # --- Exemple d'utilisation (pour la doc auto) ---
 @app.get("/")
 def root():
     return {
         "message": "Bienvenue sur l'API de détection d'anomalies ASTRA.",
         "usage": "POST /predict avec un JSON de signaux pour obtenir un verdict.",
+        "bulk_usage": "POST /predict/bulk avec un tampon float32 (N, 3) ou un .npy ; ?format=ndjson pour un flux.",
         "example": {
             "signals": [
                 {"frequency": 12.5, "power": 100.1, "modulation": 1},
@@ -0,0 +1,35 @@
+# astra_bench.py
+import time
+
+import numpy as np
+
+
+def latency_percentiles(samples_s, percentiles=(50, 95, 99)):
+    """Percentiles de latence en microsecondes (p50, p95, p99 par défaut)."""
+    if len(samples_s) == 0:
+        return {f"p{p}": None for p in percentiles}
+    values = np.percentile(np.asarray(samples_s, dtype=np.float64) * 1e6, percentiles)
+    return {f"p{p}": float(v) for p, v in zip(percentiles, values)}
+
+
+def report(name, n_ops, seconds, latencies_s=None, unit="ops"):
+    """Affiche et retourne le débit et, si fournis, les percentiles de latence d'un benchmark."""
+    result = {"name": name, "ops": n_ops, "seconds": seconds, "ops_per_s": n_ops / seconds if seconds else 0.0}
+    line = f"{name:>32} : {result['ops_per_s']:12,.0f} {unit}/s"
+    if latencies_s is not None:
+        result.update(latency_percentiles(latencies_s))
+        line += "  " + "  ".join(f"{k}={v:,.1f} µs" for k, v in result.items()
+                                 if k.startswith("p") and v is not None)
+    print(line)
+    return result
+
+
+def time_calls(fn, n, *args):
+    """Appelle fn n fois et retourne (durée totale, latences individuelles)."""
+    latencies = np.empty(n, dtype=np.float64)
+    start = time.perf_counter()
+    for i in range(n):
+        t0 = time.perf_counter()
+        fn(*args)
+        latencies[i] = time.perf_counter() - t0
+    return time.perf_counter() - start, latencies
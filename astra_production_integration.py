@@ -4,10 +4,29 @@ import json
 import time
 from datetime import datetime
 from sentry_hsm_prod import SentryHSMProduction
-# Simulation PQC sans dépendance externe
+from kem_pool import KEMKeyPool
+from wave_channel_manager import WaveChannelManager
+
 class WavePQCChannel:
+    """
+    Canal WAVE vers le satellite : la poignée de main hybride (Dilithium + Kyber) n'est faite
+    qu'à la première commande ; les suivantes réutilisent la session ou un ticket de reprise.
+    """
+    def __init__(self, satellite_name="Astra-Sat-042-Prod", session_ttl=300.0, max_uses=1000):
+        self.satellite_name = satellite_name
+        self.session_ttl = session_ttl
+        self.max_uses = max_uses
+        self.manager = None
+        self.satellite = None
+        self.last_mode = None
+
     def establish_channel(self):
-        return True  # Simulation réussie
+        if self.manager is None:
+            from wave_hybrid_prod import AuthenticatedSatellite, SecureGroundStation
+            self.satellite = AuthenticatedSatellite(self.satellite_name, kem_pool=KEMKeyPool(size=8, low_watermark=2))
+            self.manager = WaveChannelManager(SecureGroundStation(), self.session_ttl, self.max_uses)
+        _, self.command_key, self.last_mode, _ = self.manager.command_key(self.satellite)
+        return True
 from advanced_detector import AdvancedAnomalyDetector
 import subprocess
 import os
@@ -91,7 +110,7 @@ class AstraProductionSystem:
         try:
             channel = self.wave.establish_channel()
             if channel:
-                self.log_event("WAVE", "Canal PQC établi avec succès", "INFO")
+                self.log_event("WAVE", f"Canal PQC établi avec succès ({self.wave.last_mode})", "INFO")
                 return True
             else:
                 self.log_event("WAVE", "Échec d'établissement du canal PQC", "ERROR")
@@ -119,6 +138,26 @@ class AstraProductionSystem:
             self.log_event("SENTRY", f"Erreur d'autorisation : {e}", "ERROR")
             return False
     
+
+    def authorize_commands(self, commands, operator_key="Operator-01-Key", merkle=True):
+        """
+        Autorise un lot de commandes d'une fenêtre d'uplink via ASTRA SENTRY.
+        En mode Merkle, une seule opération de clé privée couvre tout le lot.
+        Retourne un booléen par commande, dans l'ordre.
+        """
+        try:
+            signatures = self.sentry.sign_commands(commands, operator_key, merkle=merkle)
+            if signatures is None:
+                self.log_event("SENTRY", f"Échec de signature du lot ({len(commands)} commandes)", "ERROR")
+                return [False] * len(commands)
+            results = self.sentry.verify_commands(commands, signatures, operator_key)
+            self.log_event("SENTRY", f"Lot autorisé : {sum(results)}/{len(commands)} commandes",
+                           "INFO" if all(results) else "WARNING")
+            return results
+        except Exception as e:
+            self.log_event("SENTRY", f"Erreur d'autorisation du lot : {e}", "ERROR")
+            return [False] * len(commands)
+
     def execute_critical_command(self, command, network_context=None):
         """
         Exécute une commande critique en respectant le protocole de sécurité complet.
@@ -0,0 +1,294 @@
+# broadcast_hub.py
+import asyncio
+import json
+import time
+from collections import deque
+
+# Sujet des messages sans pilier associé (journal général du tableau de bord)
+LOG_TOPIC = "log"
+# Réponse de resynchronisation, adressée à un seul client et jamais fusionnée
+SYNC_TOPIC = "sync"
+# Code de fermeture WebSocket d'un client abandonné car trop lent (1013 : réessayer plus tard)
+SLOW_CLIENT_CLOSE_CODE = 1013
+
+
+class ClientChannel:
+    """
+    File sortante bornée d'un tableau de bord, vidée par une tâche d'écriture dédiée.
+    Un client lent ne retarde jamais les autres : quand sa file est pleine, le message en
+    attente du même pilier est remplacé (seul le dernier état compte), sinon le plus ancien est abandonné.
+    """
+    def __init__(self, websocket, topics=None, max_queue=256, send_timeout=5.0):
+        self.websocket = websocket
+        self.topics = set(topics) if topics else None # None : tous les sujets
+        self.max_queue = max_queue
+        self.send_timeout = send_timeout
+        self.queue = deque()
+        self.wakeup = asyncio.Event()
+        self.task = None
+        self.stats = {"queued": 0, "sent": 0, "coalesced": 0, "dropped": 0, "superseded": 0, "timeouts": 0}
+
+    def enqueue(self, topic, frame, seq=None):
+        if len(self.queue) >= self.max_queue:
+            if topic not in (LOG_TOPIC, SYNC_TOPIC) and self._coalesce(topic, frame, seq):
+                return
+            self.queue.popleft()
+            self.stats["dropped"] += 1
+        self.queue.append((topic, seq, frame))
+        self.stats["queued"] += 1
+        self.wakeup.set()
+
+    def _coalesce(self, topic, frame, seq):
+        for i, (queued_topic, _, _) in enumerate(self.queue):
+            if queued_topic == topic:
+                del self.queue[i]
+                self.queue.append((topic, seq, frame))
+                self.stats["coalesced"] += 1
+                return True
+        return False
+
+    def discard_between(self, since, last_seq):
+        """Retire de la file les trames de séquence dans ]since, last_seq], déjà portées par une trame SYNC."""
+        kept = deque(event for event in self.queue if event[1] is None or not since < event[1] <= last_seq)
+        self.stats["superseded"] += len(self.queue) - len(kept)
+        self.queue = kept
+
+    async def run(self, on_close):
+        try:
+            while True:
+                await self.wakeup.wait()
+                self.wakeup.clear()
+                while self.queue:
+                    _, _, frame = self.queue.popleft()
+                    # Un client bloqué au-delà de send_timeout est considéré comme perdu
+                    await asyncio.wait_for(self.websocket.send(frame), self.send_timeout)
+                    self.stats["sent"] += 1
+        except asyncio.CancelledError:
+            raise
+        except asyncio.TimeoutError:
+            # Client trop lent : la connexion est fermée pour qu'il se reconnecte puis se resynchronise
+            self.stats["timeouts"] += 1
+            await self._close()
+        except Exception:
+            # Connexion fermée côté client : rien à fermer
+            pass
+        finally:
+            on_close(self.websocket)
+
+    async def _close(self):
+        try:
+            await asyncio.wait_for(self.websocket.close(code=SLOW_CLIENT_CLOSE_CODE, reason="client trop lent"),
+                                   self.send_timeout)
+        except Exception:
+            pass
+
+
+class EventJournal:
+    """
+    Mémoire des événements récents pour les tableaux de bord qui (re)joignent le flux.
+    Anneau de taille fixe des trames déjà sérialisées, numérotées, et dernier état connu de chaque pilier.
+    """
+    def __init__(self, capacity=1024):
+        self.events = deque(maxlen=capacity)
+        self.snapshot = {}
+        self.last_seq = 0
+
+    def next_seq(self):
+        self.last_seq += 1
+        return self.last_seq
+
+    def record(self, seq, topic, frame, is_state=False):
+        self.events.append((seq, topic, frame))
+        if is_state:
+            self.snapshot[topic] = frame
+
+    def since(self, seq):
+        """Trames postérieures à seq, en O(événements manqués) ; complete=False si l'anneau a débordé."""
+        missed = []
+        for event in reversed(self.events):
+            if event[0] <= seq:
+                break
+            missed.append(event)
+        missed.reverse()
+        complete = not missed or missed[0][0] == seq + 1
+        return missed, complete
+
+    def sync_frame(self, since=None, topics=None):
+        """
+        Trame unique : dernier état de chaque pilier et événements depuis `since`.
+        Les trames stockées sont concaténées telles quelles, sans nouvelle sérialisation.
+        """
+        wanted = (lambda topic: True) if not topics else (lambda topic: topic in topics)
+        snapshot = ",".join(f"{json.dumps(topic)}:{frame}" for topic, frame in self.snapshot.items() if wanted(topic))
+        events, complete = self.since(since) if since is not None else ([], True)
+        events = ",".join(frame for _, topic, frame in events if wanted(topic))
+        return (f'{{"type":"SYNC","last_seq":{self.last_seq},"complete":{"true" if complete else "false"},'
+                f'"snapshot":{{{snapshot}}},"events":[{events}]}}')
+
+
+class BroadcastHub:
+    """
+    Diffusion des événements du jumeau numérique vers les tableaux de bord.
+    Chaque message est sérialisé une seule fois puis déposé, sans attente, dans la file
+    de chaque abonné au sujet (pilier) concerné.
+    """
+    def __init__(self, max_queue=256, send_timeout=5.0, journal_size=1024):
+        self.max_queue = max_queue
+        self.send_timeout = send_timeout
+        self.journal = EventJournal(journal_size)
+        self._channels = {}
+        self._all_topics = set()
+        self._by_topic = {}
+        self.stats = {"published": 0, "deliveries": 0, "slow_clients_closed": 0}
+
+    def __len__(self):
+        return len(self._channels)
+
+    def register(self, websocket, topics=None):
+        """Inscrit un client et démarre sa tâche d'écriture (à appeler depuis la boucle)."""
+        channel = ClientChannel(websocket, topics, self.max_queue, self.send_timeout)
+        self._channels[websocket] = channel
+        self._index(channel)
+        channel.task = asyncio.ensure_future(channel.run(self.unregister))
+        return channel
+
+    def unregister(self, websocket):
+        channel = self._channels.pop(websocket, None)
+        if channel is None:
+            return
+        self._unindex(channel)
+        self.stats["slow_clients_closed"] += channel.stats["timeouts"]
+        if channel.task is not None and channel.task is not asyncio.current_task():
+            channel.task.cancel()
+
+    def subscribe(self, websocket, topics):
+        """Change les sujets suivis par un client (None ou liste vide : tous)."""
+        channel = self._channels.get(websocket)
+        if channel is None:
+            return
+        self._unindex(channel)
+        channel.topics = set(topics) if topics else None
+        self._index(channel)
+
+    def _index(self, channel):
+        if channel.topics is None:
+            self._all_topics.add(channel)
+        else:
+            for topic in channel.topics:
+                self._by_topic.setdefault(topic, set()).add(channel)
+
+    def _unindex(self, channel):
+        self._all_topics.discard(channel)
+        for topic in channel.topics or ():
+            subscribers = self._by_topic.get(topic)
+            if subscribers is not None:
+                subscribers.discard(channel)
+                if not subscribers:
+                    del self._by_topic[topic]
+
+    def publish(self, payload, topic=LOG_TOPIC):
+        """
+        Sérialise le message une fois, l'inscrit au journal et le dépose dans la file de chaque abonné.
+        Les messages dict reçoivent un numéro de séquence 'seq'. Ne bloque jamais.
+        """
+        seq = self.journal.next_seq()
+        if isinstance(payload, str):
+            frame, is_state = payload, False
+        else:
+            frame, is_state = json.dumps({**payload, "seq": seq}), "pillar_status" in payload
+        self.journal.record(seq, topic, frame, is_state)
+        delivered = 0
+        for subscribers in (self._all_topics, self._by_topic.get(topic, ())):
+            for channel in subscribers:
+                channel.enqueue(topic, frame, seq)
+                delivered += 1
+        self.stats["published"] += 1
+        self.stats["deliveries"] += delivered
+        return delivered
+
+    def sync(self, websocket, since=None):
+        """
+        Envoie à un client, en une trame, l'état de chaque pilier et les événements manqués depuis `since`.
+        Construite et mise en file sans attente : aucune diffusion ne peut s'intercaler. Les trames
+        postérieures à `since` encore en file sont retirées, la trame SYNC les contenant déjà ;
+        sans `since`, seul l'état des piliers est renvoyé et la file reste intacte.
+        """
+        channel = self._channels.get(websocket)
+        if channel is None:
+            return
+        since = int(since) if since is not None else None
+        if since is not None:
+            channel.discard_between(since, self.journal.last_seq)
+        channel.enqueue(SYNC_TOPIC, self.journal.sync_frame(since, channel.topics))
+
+    def channel_stats(self):
+        """Totaux des files clients : messages envoyés, fusionnés et abandonnés."""
+        totals = {"clients": len(self._channels), "queued": 0, "sent": 0, "coalesced": 0, "dropped": 0,
+                  "max_backlog": 0}
+        for channel in self._channels.values():
+            for key in ("queued", "sent", "coalesced", "dropped"):
+                totals[key] += channel.stats[key]
+            totals["max_backlog"] = max(totals["max_backlog"], len(channel.queue))
+        return {**self.stats, **totals}
+
+    async def close(self):
+        tasks = [c.task for c in self._channels.values() if c.task is not None]
+        for websocket in list(self._channels):
+            self.unregister(websocket)
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+class _BenchmarkWebSocket:
+    """Tableau de bord simulé : enregistre l'instant de réception de chaque trame."""
+    def __init__(self, delay):
+        self.delay = delay
+        self.received = []
+
+    async def send(self, frame):
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        self.received.append((frame, time.perf_counter()))
+
+
+async def _broadcast_benchmark(n_clients, n_messages, slow_fraction, slow_delay, max_queue):
+    from astra_bench import report
+
+    hub = BroadcastHub(max_queue=max_queue)
+    n_slow = int(n_clients * slow_fraction)
+    sockets = [_BenchmarkWebSocket(slow_delay if i < n_slow else 0.0) for i in range(n_clients)]
+    pillars = ["hive-status", "core-status", "wave-status", "sentry-status"]
+    for i, ws in enumerate(sockets):
+        # Un quart des tableaux de bord ne suit qu'un pilier
+        hub.register(ws, [pillars[i % len(pillars)]] if i % 4 == 0 else None)
+
+    published_at = {}
+    publish_latencies = []
+    start = time.perf_counter()
+    for i in range(n_messages):
+        pillar = pillars[i % len(pillars)]
+        t0 = time.perf_counter()
+        frame = json.dumps({"message": f"Événement {i}", "level": "info",
+                            "pillar_status": {"pillar": pillar, "status": "ok", "message": "Opérationnel"}})
+        hub.publish(frame, pillar)
+        publish_latencies.append(time.perf_counter() - t0)
+        published_at[frame] = t0
+        if i % 10 == 0:
+            await asyncio.sleep(0) # Laisse les tâches d'écriture progresser, comme la boucle réelle
+    publish_seconds = time.perf_counter() - start
+    await asyncio.sleep(0.2)
+
+    delivery = [received - published_at[frame] for ws in sockets[n_slow:] for frame, received in ws.received]
+    print(f"\n--- Diffusion : {n_clients} tableaux de bord ({n_slow} lents), {n_messages} messages ---")
+    report("publish()", n_messages, publish_seconds, publish_latencies, unit="msg")
+    report("livraison (clients rapides)", len(delivery), publish_seconds, delivery, unit="trames")
+    print(hub.channel_stats())
+    await hub.close()
+
+
+def run_broadcast_benchmark(n_clients=1000, n_messages=2000, slow_fraction=0.05, slow_delay=0.05, max_queue=256):
+    """Mesure le coût de publish() et la latence de livraison avec une part de clients lents."""
+    asyncio.run(_broadcast_benchmark(n_clients, n_messages, slow_fraction, slow_delay, max_queue))
+
+
+if __name__ == "__main__":
+    run_broadcast_benchmark()
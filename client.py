@@ -1,19 +1,20 @@
-import requests
 import json
 
+from hive_client import HiveClient, HiveError
+
 API_URL = "http://127.0.0.1:5000/predict"
+HIVE = HiveClient(API_URL) # Une seule session : la connexion est réutilisée entre les tests
 
 def test_signal(signal_data):
     """Envoie un signal à l'API et affiche la réponse."""
     try:
-        response = requests.post(API_URL, json=signal_data)
-        response.raise_for_status() # Lève une exception si le statut est une erreur (4xx ou 5xx)
+        response = HIVE.predict(signal_data) # Lève HiveError si le statut est une erreur (4xx ou 5xx)
         
         print(f"Test du signal : {signal_data}")
-        print(f"  -> Réponse de l'API : {response.json()}")
+        print(f"  -> Réponse de l'API : {response}")
         print("-" * 20)
 
-    except requests.exceptions.RequestException as e:
+    except HiveError as e:
         print(f"Erreur lors de la communication avec l'API : {e}")
 
 if __name__ == "__main__":
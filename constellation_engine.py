@@ -0,0 +1,182 @@
+# constellation_engine.py
+import asyncio
+import heapq
+import multiprocessing
+import time
+from collections import deque
+
+import numpy as np
+
+# États de heartbeat, stockés en int8
+HEARTBEAT_UNKNOWN = 0
+HEARTBEAT_OK = 1
+HEARTBEAT_FAILED = 2
+HEARTBEAT_LABELS = {HEARTBEAT_UNKNOWN: "unknown", HEARTBEAT_OK: "ok", HEARTBEAT_FAILED: "failed"}
+
+
+class ConstellationState:
+    """
+    État d'une flotte de satellites en tableaux NumPy (une ligne par satellite),
+    à la place d'un dict SATELLITE_STATE par satellite : ~20 octets par satellite.
+    """
+    def __init__(self, n_satellites, id_offset=0, period=7.0):
+        self.ids = np.arange(id_offset, id_offset + n_satellites, dtype=np.int32)
+        self.firmware_ok = np.ones(n_satellites, dtype=bool)
+        self.heartbeat_status = np.full(n_satellites, HEARTBEAT_UNKNOWN, dtype=np.int8)
+        self.last_heartbeat = np.full(n_satellites, np.nan, dtype=np.float64)
+        self.consecutive_failures = np.zeros(n_satellites, dtype=np.uint16)
+        self.period = np.full(n_satellites, period, dtype=np.float32)
+
+    def __len__(self):
+        return self.ids.shape[0]
+
+    def corrupt_firmware(self, indices):
+        self.firmware_ok[indices] = False
+
+    def record_heartbeats(self, indices, ok, now):
+        """Met à jour un lot de satellites en une passe vectorisée."""
+        self.heartbeat_status[indices] = np.where(ok, HEARTBEAT_OK, HEARTBEAT_FAILED)
+        self.last_heartbeat[indices[ok]] = now
+        self.consecutive_failures[indices[ok]] = 0
+        failed = indices[~ok]
+        self.consecutive_failures[failed] = np.minimum(self.consecutive_failures[failed].astype(np.int32) + 1,
+                                                       np.iinfo(np.uint16).max)
+
+    def summary(self):
+        counts = np.bincount(self.heartbeat_status, minlength=len(HEARTBEAT_LABELS))
+        return {
+            "satellites": len(self),
+            **{HEARTBEAT_LABELS[k]: int(counts[k]) for k in HEARTBEAT_LABELS},
+            "firmware_corrupted": int(np.count_nonzero(~self.firmware_ok)),
+        }
+
+
+class SimulatedHeartbeat:
+    """Réponses simulées : un satellite au firmware sain répond, sauf perte aléatoire (failure_rate)."""
+    def __init__(self, state, failure_rate=0.0, seed=0):
+        self.state = state
+        self.failure_rate = failure_rate
+        self.rng = np.random.default_rng(seed)
+
+    async def __call__(self, indices, now):
+        ok = self.state.firmware_ok[indices]
+        if self.failure_rate:
+            ok = ok & (self.rng.random(indices.shape[0]) >= self.failure_rate)
+        return ok
+
+
+class ConstellationEngine:
+    """
+    Simulation d'une constellation pour le jumeau numérique.
+    Un seul ordonnanceur (tas des prochaines échéances) remplace une tâche asyncio.sleep
+    par satellite : à chaque réveil, tous les heartbeats échus sont traités en un lot.
+    """
+    def __init__(self, n_satellites, period=7.0, id_offset=0, heartbeat=None, failure_rate=0.0, max_batch=4096,
+                 report_interval=5.0, on_report=None, seed=0):
+        """
+        :param heartbeat: Coroutine (indices, now) -> tableau bool des heartbeats valides ;
+                          par défaut SimulatedHeartbeat. Un vérificateur cryptographique par lot s'y branche.
+        :param on_report: Fonction appelée toutes les report_interval secondes avec report().
+        """
+        self.state = ConstellationState(n_satellites, id_offset, period)
+        self.heartbeat = heartbeat or SimulatedHeartbeat(self.state, failure_rate, seed)
+        self.max_batch = max_batch
+        self.report_interval = report_interval
+        self.on_report = on_report
+        self.rng = np.random.default_rng(seed)
+        self._heap = []
+        self.lags = deque(maxlen=100_000)
+        self.stats = {"ticks": 0, "heartbeats": 0, "failures": 0, "max_batch": 0}
+
+    def _schedule_initial(self, now):
+        # Premières échéances réparties sur une période : pas de rafale au démarrage
+        due = now + self.rng.uniform(0, self.state.period, len(self.state))
+        self._heap = list(zip(due.tolist(), range(len(self.state))))
+        heapq.heapify(self._heap)
+
+    def _pop_due(self, now):
+        due, indices = [], []
+        while self._heap and self._heap[0][0] <= now and len(indices) < self.max_batch:
+            t, i = heapq.heappop(self._heap)
+            due.append(t)
+            indices.append(i)
+        return np.array(due), np.array(indices, dtype=np.int64)
+
+    async def run(self, duration=None):
+        """Exécute la simulation (indéfiniment si duration est None)."""
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        self._schedule_initial(start)
+        next_report = start + self.report_interval
+        while duration is None or loop.time() - start < duration:
+            now = loop.time()
+            due, indices = self._pop_due(now)
+            if indices.size:
+                ok = np.asarray(await self.heartbeat(indices, now), dtype=bool)
+                self.state.record_heartbeats(indices, ok, now)
+                self.lags.extend((now - due).tolist())
+                self.stats["ticks"] += 1
+                self.stats["heartbeats"] += int(indices.size)
+                self.stats["failures"] += int(np.count_nonzero(~ok))
+                self.stats["max_batch"] = max(self.stats["max_batch"], int(indices.size))
+                for t, i in zip((due + self.state.period[indices]).tolist(), indices.tolist()):
+                    heapq.heappush(self._heap, (t, i))
+            if self.on_report is not None and now >= next_report:
+                self.on_report(self.report())
+                next_report = now + self.report_interval
+            if self._heap and self._heap[0][0] <= loop.time():
+                await asyncio.sleep(0) # Lot suivant déjà échu : on rend seulement la main aux autres tâches
+            else:
+                wake = self._heap[0][0] if self._heap else loop.time() + self.report_interval
+                await asyncio.sleep(max(0.0, min(wake, next_report) - loop.time()))
+
+    def report(self):
+        """État agrégé de la flotte et retard de traitement des heartbeats (µs)."""
+        from astra_bench import latency_percentiles
+
+        return {**self.state.summary(), **self.stats, **latency_percentiles(list(self.lags))}
+
+
+def _run_shard(args):
+    n_satellites, id_offset, period, duration, failure_rate, seed = args
+    engine = ConstellationEngine(n_satellites, period, id_offset, failure_rate=failure_rate, seed=seed)
+    asyncio.run(engine.run(duration))
+    return engine.report()
+
+
+def run_sharded(n_satellites, n_shards=None, duration=30.0, period=7.0, failure_rate=0.001):
+    """
+    Répartit la flotte entre n_shards processus (chacun sa boucle asyncio et sa tranche d'identifiants).
+    Retourne les rapports par shard et leur agrégat.
+    """
+    n_shards = n_shards or multiprocessing.cpu_count()
+    bounds = np.linspace(0, n_satellites, n_shards + 1).astype(int)
+    jobs = [(int(bounds[i + 1] - bounds[i]), int(bounds[i]), period, duration, failure_rate, i)
+            for i in range(n_shards)]
+    with multiprocessing.get_context("spawn").Pool(n_shards) as pool:
+        reports = pool.map(_run_shard, jobs)
+    totals = {key: sum(r[key] for r in reports)
+              for key in ("satellites", "unknown", "ok", "failed", "firmware_corrupted", "heartbeats", "failures")}
+    totals["worst_p99"] = max((r["p99"] for r in reports if r["p99"] is not None), default=None)
+    return reports, totals
+
+
+def _format_us(value):
+    # Pas de heartbeat mesuré dans la fenêtre : p99 indisponible
+    return "n/a" if value is None else f"{value:.0f} µs"
+
+
+def run_constellation_benchmark(n_satellites=100_000, n_shards=4, duration=20.0, period=7.0):
+    """Charge le segment sol simulé avec une flotte réaliste et affiche le débit de heartbeats."""
+    start = time.perf_counter()
+    reports, totals = run_sharded(n_satellites, n_shards, duration, period)
+    elapsed = time.perf_counter() - start
+    print(f"\n--- Constellation : {n_satellites} satellites, {n_shards} shards, {duration:.0f} s ---")
+    for i, r in enumerate(reports):
+        print(f"Shard {i} : {r['heartbeats']} heartbeats, lots max {r['max_batch']}, retard p99 {_format_us(r['p99'])}")
+    print(f"Total : {totals['heartbeats'] / elapsed:,.0f} heartbeats/s, "
+          f"{totals['ok']} OK, {totals['failed']} en échec, retard p99 max {_format_us(totals['worst_p99'])}")
+
+
+if __name__ == "__main__":
+    run_constellation_benchmark()
@@ -0,0 +1,226 @@
+# detection_cascade.py
+import threading
+import time
+
+import numpy as np
+
+from detection_rules import RULE_LIMITS, VALID_MODULATIONS
+
+# Verdicts produits par chaque étage de la cascade
+NORMAL = 0
+ANOMALY = 1
+UNCERTAIN = -1
+
+
+class RuleStage:
+    """
+    Étage 1 : règles à seuils de api_simple, vectorisées.
+    Une violation de règle est une anomalie certaine. Un signal strictement à l'intérieur
+    de la boîte nominale (apprise sur du trafic légitime) est déclaré normal ; le reste est escaladé.
+    """
+    name = "rules"
+
+    def __init__(self, limits=RULE_LIMITS, nominal_box=None):
+        self.low = np.array([limits["frequency"][0], limits["power"][0]], dtype=np.float32)
+        self.high = np.array([limits["frequency"][1], limits["power"][1]], dtype=np.float32)
+        self.nominal_box = nominal_box
+
+    def fit_nominal_box(self, X_normal, quantiles=(0.01, 0.99)):
+        """Boîte nominale = quantiles par feature du trafic légitime (bornes incluses)."""
+        X_normal = np.asarray(X_normal, dtype=np.float32)
+        low, high = np.quantile(X_normal, quantiles, axis=0)
+        self.nominal_box = (low.astype(np.float32), high.astype(np.float32))
+        return self
+
+    def evaluate(self, X, final=False):
+        X = np.asarray(X, dtype=np.float32)
+        fp = X[:, :2]
+        violation = np.any((fp < self.low) | (fp > self.high), axis=1)
+        violation |= ~np.isin(X[:, 2], VALID_MODULATIONS)
+        verdicts = np.full(X.shape[0], NORMAL if final else UNCERTAIN, dtype=np.int8)
+        if self.nominal_box is not None and not final:
+            low, high = self.nominal_box
+            inside = np.all((X >= low) & (X <= high), axis=1)
+            verdicts[inside] = NORMAL
+        verdicts[violation] = ANOMALY
+        return verdicts
+
+
+class ForestStage:
+    """
+    Étage 2 : IsolationForest (anomaly_detector.AnomalyDetector).
+    Score haut (>= normal_cut) : normal ; score bas (<= anomaly_cut) : anomalie ; entre les deux : escaladé.
+    En dernier étage, la frontière native de la forêt (offset_) tranche.
+    """
+    name = "forest"
+
+    def __init__(self, detector, normal_cut=None, anomaly_cut=None):
+        self.detector = detector
+        self.normal_cut = normal_cut
+        self.anomaly_cut = anomaly_cut
+
+    def calibrate(self, X_normal, normal_quantile=0.5, anomaly_quantile=0.001):
+        """
+        Bandes de confiance à partir des scores du trafic légitime :
+        la moitié la plus typique est acceptée, seul un score plus bas que 99,9 % des signaux
+        légitimes est rejeté sans avis de l'autoencodeur.
+        """
+        scores = self.detector.score_samples(X_normal)
+        self.normal_cut = float(np.quantile(scores, normal_quantile))
+        self.anomaly_cut = float(min(np.quantile(scores, anomaly_quantile), self.detector.model.offset_))
+        return self
+
+    def evaluate(self, X, final=False):
+        scores = self.detector.score_samples(X)
+        if final or self.normal_cut is None:
+            return np.where(self.detector.labels_from_scores(scores) == -1, ANOMALY, NORMAL).astype(np.int8)
+        verdicts = np.full(scores.shape[0], UNCERTAIN, dtype=np.int8)
+        verdicts[scores >= self.normal_cut] = NORMAL
+        if self.anomaly_cut is not None:
+            verdicts[scores <= self.anomaly_cut] = ANOMALY
+        return verdicts
+
+
+class AutoencoderStage:
+    """
+    Étage 3 : autoencodeur via le registre d'artefacts (noyau NumPy) et son seuil calibré.
+    Avec une bande (margin), seuls les signaux proches du seuil restent incertains.
+    """
+    name = "autoencoder"
+
+    def __init__(self, registry, margin=None):
+        self.registry = registry
+        self.margin = margin
+
+    def evaluate(self, X, final=False):
+        errors, threshold = self.registry.score_with_threshold(np.asarray(X, dtype=np.float32))
+        if final or self.margin is None:
+            return (errors > threshold).astype(np.int8)
+        verdicts = np.full(errors.shape[0], UNCERTAIN, dtype=np.int8)
+        verdicts[errors <= threshold * (1 - self.margin)] = NORMAL
+        verdicts[errors > threshold * (1 + self.margin)] = ANOMALY
+        return verdicts
+
+
+class DetectionCascade:
+    """
+    Cascade de détection d'ASTRA HIVE : chaque étage ne voit que les signaux que les
+    étages moins coûteux n'ont pas su trancher. Le dernier étage décide de tout ce qui lui parvient.
+    """
+    def __init__(self, stages):
+        if not stages:
+            raise ValueError("La cascade doit comporter au moins un étage.")
+        self.stages = list(stages)
+        self._lock = threading.Lock()
+        self.reset_stats()
+
+    def reset_stats(self):
+        with self._lock:
+            self._counters = [
+                {"seen": 0, "decided": 0, "anomalies": 0, "escalated": 0, "seconds": 0.0}
+                for _ in self.stages
+            ]
+
+    def predict(self, X):
+        """
+        :return: (verdicts int8 : 1 anomalie / 0 normal, index de l'étage ayant décidé chaque signal)
+        """
+        X = np.asarray(X, dtype=np.float32)
+        verdicts = np.zeros(X.shape[0], dtype=np.int8)
+        decided_by = np.zeros(X.shape[0], dtype=np.int8)
+        pending = np.arange(X.shape[0])
+        last = len(self.stages) - 1
+        for i, stage in enumerate(self.stages):
+            if pending.size == 0:
+                break
+            start = time.perf_counter()
+            stage_verdicts = stage.evaluate(X[pending], final=(i == last))
+            elapsed = time.perf_counter() - start
+            decided = stage_verdicts != UNCERTAIN
+            verdicts[pending[decided]] = stage_verdicts[decided]
+            decided_by[pending[decided]] = i
+            n_decided = int(np.count_nonzero(decided))
+            with self._lock:
+                counters = self._counters[i]
+                counters["seen"] += pending.size
+                counters["decided"] += n_decided
+                counters["anomalies"] += int(np.count_nonzero(stage_verdicts == ANOMALY))
+                counters["escalated"] += pending.size - n_decided
+                counters["seconds"] += elapsed
+            pending = pending[~decided]
+        return verdicts, decided_by
+
+    def stats(self):
+        """Taux de décision et latence moyenne par signal pour chaque étage."""
+        with self._lock:
+            total = self._counters[0]["seen"]
+            report = []
+            for stage, c in zip(self.stages, self._counters):
+                report.append({
+                    "stage": stage.name,
+                    **c,
+                    "traffic_share": c["seen"] / total if total else 0.0,
+                    "hit_rate": c["decided"] / c["seen"] if c["seen"] else 0.0,
+                    "us_per_signal": 1e6 * c["seconds"] / c["seen"] if c["seen"] else 0.0,
+                })
+            return report
+
+
+def run_cascade_benchmark(n_signals=200_000, attack_rate=0.01, model_path="astra_anomaly_detector.pth",
+                          scaler_path="astra_data_scaler.pkl", kernel_path="astra_scoring_kernel.npz"):
+    """
+    Compare la cascade à l'autoencodeur seul sur du trafic synthétique (majorité nominale).
+    Nécessite les artefacts produits par finalize_model.py.
+    """
+    import pandas as pd
+
+    from anomaly_detector import AnomalyDetector
+    from model_registry import ModelRegistry
+
+    rng = np.random.default_rng(0)
+    n_attack = int(n_signals * attack_rate)
+    legit = np.column_stack([
+        rng.normal(12.5, 0.02, n_signals - n_attack),
+        rng.normal(100.0, 0.2, n_signals - n_attack),
+        np.ones(n_signals - n_attack),
+    ]).astype(np.float32)
+    attack = np.column_stack([
+        rng.uniform(11.0, 14.0, n_attack),
+        rng.uniform(200.0, 450.0, n_attack),
+        rng.integers(0, 2, n_attack),
+    ]).astype(np.float32)
+    X = np.concatenate([legit, attack])
+    y = np.concatenate([np.zeros(len(legit)), np.ones(n_attack)]).astype(np.int8)
+
+    reference = legit[:20_000]
+    forest = AnomalyDetector(verbose=False, n_jobs=-1)
+    forest.train(pd.DataFrame(reference, columns=["frequency", "power", "modulation"]).assign(label=1))
+    registry = ModelRegistry(model_path, scaler_path, kernel_path)
+    registry.load()
+
+    cascade = DetectionCascade([
+        RuleStage().fit_nominal_box(reference),
+        ForestStage(forest).calibrate(reference),
+        AutoencoderStage(registry),
+    ])
+    start = time.perf_counter()
+    verdicts, _ = cascade.predict(X)
+    cascade_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    errors, threshold = registry.score_with_threshold(X)
+    baseline = (errors > threshold).astype(np.int8)
+    baseline_seconds = time.perf_counter() - start
+
+    def recall(pred):
+        return np.count_nonzero(pred[y == 1]) / max(1, n_attack)
+
+    print(f"\n--- Cascade de détection ({n_signals} signaux) ---")
+    for s in cascade.stats():
+        print(f"{s['stage']:>12} : {s['traffic_share']:6.1%} du trafic, "
+              f"{s['hit_rate']:6.1%} décidés, {s['us_per_signal']:.3f} µs/signal")
+    print(f"Cascade      : {cascade_seconds:.3f} s, rappel {recall(verdicts):.3f}")
+    print(f"Autoencodeur : {baseline_seconds:.3f} s, rappel {recall(baseline):.3f}")
+
+
+if __name__ == "__main__":
+    run_cascade_benchmark()
@@ -0,0 +1,8 @@
+# detection_rules.py
+# Seuils d'anomalie par règles (simulation), sans dépendance : partagés par api_simple
+# et par l'étage de règles de detection_cascade, dans l'ordre des features (frequency, power, modulation)
+RULE_LIMITS = {
+    "frequency": (10.0, 15.0),
+    "power": (50.0, 500.0),
+}
+VALID_MODULATIONS = (0, 1)
@@ -2,21 +2,37 @@
 import asyncio
 import websockets
 import json
-import requests
 import os
 
-# --- Simulation des primitives PQC si pq_crystals n'est pas disponible ---
-try:
-    from pq_crystals.dilithium import Dilithium5
-    from pq_crystals.kyber import Kyber1024
-except ImportError:
-    from pqc_sim import Dilithium5, Kyber1024
+from broadcast_hub import LOG_TOPIC, BroadcastHub
+from constellation_engine import ConstellationEngine
+from heartbeat_verifier import CryptoHeartbeat, HeartbeatVerifier
+from hive_client import AsyncHiveClient, HiveError, is_anomaly, make_local_backend
+from kem_pool import KEMKeyPool
+
+from wave_channel_manager import WaveChannelManager
+from wave_hybrid_prod import AuthenticatedSatellite, SecureGroundStation
+
+# --- Primitives PQC : liboqs, pq_crystals ou simulateur selon l'environnement ---
+from pqc_backend import Dilithium5
 
 # --- Configuration ---
 HIVE_API_URL = "http://127.0.0.1:5000/predict"
-CONNECTED_CLIENTS = set()
+HIVE_LOCAL = os.environ.get("ASTRA_HIVE_LOCAL") == "1" # Modèle co-localisé : scoring en processus, sans HTTP
+CONSTELLATION_SIZE = int(os.environ.get("ASTRA_CONSTELLATION_SIZE", "0")) # Flotte simulée en plus du satellite principal
+CONSTELLATION_CRYPTO = os.environ.get("ASTRA_CONSTELLATION_CRYPTO") == "1" # Heartbeats de la flotte signés et vérifiés
+# Signatures et vérifications exécutées dans un pool : la boucle websocket n'est jamais affamée
+HEARTBEAT_VERIFIER = HeartbeatVerifier(Dilithium5)
+# Diffusion : une sérialisation par message, une file bornée par tableau de bord
+HUB = BroadcastHub(max_queue=256, send_timeout=5.0, journal_size=4096)
+# Client HIVE non bloquant partagé : la boucle websocket n'attend jamais un appel HTTP synchrone
+HIVE_CLIENT = AsyncHiveClient(HIVE_API_URL, local=make_local_backend() if HIVE_LOCAL else None)
+
+# Canal WAVE : une poignée de main hybride, puis des clés de commande dérivées de la session en cache
+WAVE_CHANNELS = WaveChannelManager(SecureGroundStation(), session_ttl=300.0, max_uses=1000)
 
 # --- Simulation de l'état du satellite ---
+WAVE_SATELLITE = AuthenticatedSatellite(kem_pool=KEMKeyPool(size=8, low_watermark=2)) # Clé Kyber éphémère par session
 SATELLITE_SIGNING_PK, SATELLITE_SIGNING_SK = Dilithium5.keypair()
 SATELLITE_STATE = {
     "firmware_integrity": "OK",
@@ -24,73 +40,51 @@ SATELLITE_STATE = {
 }
 
 async def send_log(message, level='info', pillar_status=None):
-    """Envoie un message de log à tous les tableaux de bord connectés."""
+    """Diffuse un message de log aux tableaux de bord abonnés au pilier concerné (sans attendre les clients)."""
     log_data = {"message": message, "level": level}
+    topic = LOG_TOPIC
     if pillar_status:
         log_data["pillar_status"] = pillar_status
-    
-    print(f"📝 [SEND_LOG] Préparation envoi: {message[:50]}...")
-    
-    if CONNECTED_CLIENTS:
-        to_remove = set()
-        tasks = []
-        for client in CONNECTED_CLIENTS:
-            try:
-                task = client.send(json.dumps(log_data))
-                tasks.append(task)
-                print(f"📤 [SEND_LOG] Tâche créée pour client")
-            except Exception as e:
-                print(f"❌ [SEND_LOG] Erreur création tâche: {e}")
-                to_remove.add(client)
-        
-        for client in to_remove:
-            CONNECTED_CLIENTS.discard(client)
-            print(f"🗑️ [SEND_LOG] Client supprimé de la liste")
-        
-        if tasks:
-            try:
-                print(f"🚀 [SEND_LOG] Exécution de {len(tasks)} tâches...")
-                results = await asyncio.gather(*tasks, return_exceptions=True)
-                for i, result in enumerate(results):
-                    if isinstance(result, Exception):
-                        print(f"❌ [SEND_LOG] Tâche {i} échouée: {result}")
-                    else:
-                        print(f"✅ [SEND_LOG] Tâche {i} réussie")
-            except Exception as e:
-                print(f"💥 [SEND_LOG] Erreur lors de l'exécution des tâches: {e}")
-    else:
-        print("⚠️ [SEND_LOG] Aucun client connecté")
+        topic = pillar_status.get("pillar", LOG_TOPIC)
+    HUB.publish(log_data, topic)
 
 async def check_hive_status():
     # ... (cette fonction ne change pas) ...
     await send_log("Interrogation d'ASTRA HIVE...", 'info', {"pillar": "hive-status", "status": "ok", "message": "Analyse..."})
     try:
         telemetry = {"frequency": 12.5, "power": 100.0, "modulation": 1}
-        response = requests.post(HIVE_API_URL, json=telemetry)
-        data = response.json()
-        if data.get("prediction") == "Anomalie Détectée":
+        data = await HIVE_CLIENT.predict(telemetry)
+        if is_anomaly(data):
             await send_log("ALERTE HIVE : Comportement réseau anormal.", 'critical', {"pillar": "hive-status", "status": "alert", "message": "Anomalie!"})
             return False
         await send_log("HIVE confirme un état réseau nominal.", 'info', {"pillar": "hive-status", "status": "ok", "message": "Opérationnel"})
         return True
-    except requests.exceptions.RequestException:
+    except HiveError:
         await send_log("Impossible de contacter ASTRA HIVE !", 'critical', {"pillar": "hive-status", "status": "alert", "message": "Hors Ligne"})
         return False
 
 async def establish_wave_channel():
-    """Simule l'établissement d'un canal sécurisé PQC avec ASTRA WAVE."""
+    """Établit le canal sécurisé PQC avec ASTRA WAVE, ou reprend la session en cache."""
+    if WAVE_CHANNELS.has_session(WAVE_SATELLITE.name):
+        # Session valide ou ticket de reprise : ni latence de négociation, ni KEM, ni signature
+        try:
+            counter, _, mode, _ = WAVE_CHANNELS.command_key(WAVE_SATELLITE)
+        except ConnectionError:
+            await send_log("ASTRA WAVE : Session refusée, identité du satellite révoquée !", 'critical',
+                           {"pillar": "wave-status", "status": "alert", "message": "Identité révoquée"})
+            return
+        await send_log(f"ASTRA WAVE : Session reprise ({mode}), clé de commande n°{counter} dérivée.", 'info',
+                       {"pillar": "wave-status", "status": "ok", "message": "Canal Sécurisé"})
+        return
     await send_log("ASTRA WAVE : Initiation du canal de communication post-quantique.", 'info', 
                    {"pillar": "wave-status", "status": "ok", "message": "Négociation PQC..."})
     await asyncio.sleep(1)
-    # Simulation de l'échange de clés Kyber
-    pk, sk = Kyber1024.keypair()
-    ciphertext, shared_secret = Kyber1024.enc(pk)
-    decrypted_secret = Kyber1024.dec(ciphertext, sk)
-    
-    if shared_secret == decrypted_secret:
-         await send_log("ASTRA WAVE : Canal sécurisé établi avec succès.", 'info',
-                        {"pillar": "wave-status", "status": "ok", "message": "Canal Sécurisé"})
-    else:
+    try:
+        # Poignée de main hybride (Dilithium + Kyber) hors de la boucle d'événements
+        await asyncio.get_running_loop().run_in_executor(None, WAVE_CHANNELS.command_key, WAVE_SATELLITE)
+        await send_log("ASTRA WAVE : Canal sécurisé établi avec succès.", 'info',
+                       {"pillar": "wave-status", "status": "ok", "message": "Canal Sécurisé"})
+    except ConnectionError:
         await send_log("ASTRA WAVE : Échec de l'établissement du canal PQC !", 'critical',
                        {"pillar": "wave-status", "status": "alert", "message": "Échec PQC"})
 
@@ -113,8 +107,9 @@ async def cryptographic_heartbeat_protocol():
         await asyncio.sleep(7)
         await send_log("ASTRA CORE : Envoi du défi 'heartbeat' au satellite...", 'info')
         challenge = os.urandom(32)
-        signature = Dilithium5.sign(SATELLITE_SIGNING_SK, challenge)
-        if Dilithium5.verify(SATELLITE_SIGNING_PK, challenge, signature):
+        signature, = await HEARTBEAT_VERIFIER.sign_batch([(SATELLITE_SIGNING_SK, challenge)])
+        valid, = await HEARTBEAT_VERIFIER.verify_batch([(SATELLITE_SIGNING_PK, challenge, signature)])
+        if valid:
             SATELLITE_STATE["last_heartbeat_status"] = "OK"
             await send_log("ASTRA CORE : Réponse 'heartbeat' valide. Le satellite est vivant et authentique.", 'info',
                            {"pillar": "core-status", "status": "ok", "message": "Heartbeat OK"})
@@ -140,21 +135,22 @@ async def handle_command_attempt():
 
 async def handler(websocket, path=None):
     print(f"🔗 Nouvelle connexion WebSocket établie (path: {path})")
-    CONNECTED_CLIENTS.add(websocket)
+    HUB.register(websocket)
     try:
-        print("📤 Envoi du message de bienvenue...")
         await send_log("Client connecté. Synchronisation de l'état des piliers.", 'info')
-        print("✅ Message de bienvenue envoyé avec succès")
         
         async for message in websocket:
             try:
-                print(f"📨 Message reçu: {message[:100]}...")
                 data = json.loads(message)
-                if data.get("action") == "ATTEMPT_COMMAND":
-                    print("🚀 Exécution de la commande...")
+                if data.get("action") == "SUBSCRIBE":
+                    # {"action": "SUBSCRIBE", "topics": ["hive-status", "log"]} ; liste vide : tous les sujets
+                    HUB.subscribe(websocket, data.get("topics"))
+                elif data.get("action") == "SYNC":
+                    # {"action": "SYNC", "since": <dernier seq reçu>} : état des piliers + événements manqués
+                    HUB.sync(websocket, data.get("since"))
+                elif data.get("action") == "ATTEMPT_COMMAND":
                     await handle_command_attempt()
                 elif data.get("action") == "CORRUPT_FIRMWARE":
-                    print("⚠️ Simulation de corruption firmware...")
                     SATELLITE_STATE["firmware_integrity"] = "CORRUPTED"
                     await send_log("ATTAQUE SIMULÉE : Le firmware du satellite a été corrompu !", 'critical')
                 else:
@@ -171,15 +167,32 @@ async def handler(websocket, path=None):
         print(f"💥 Erreur WebSocket critique : {e}")
         await send_log(f"Erreur WebSocket : {e}", 'error')
     finally:
-        print("🧹 Nettoyage de la connexion...")
-        CONNECTED_CLIENTS.discard(websocket)
-        print(f"📊 Clients connectés restants: {len(CONNECTED_CLIENTS)}")
+        HUB.unregister(websocket)
+        print(f"📊 Clients connectés restants: {len(HUB)}")
+
+def publish_constellation_report(report):
+    status = "alert" if report["failed"] or report["firmware_corrupted"] else "ok"
+    HUB.publish({
+        "message": f"Constellation : {report['ok']}/{report['satellites']} heartbeats valides.",
+        "level": "info" if status == "ok" else "warning",
+        "pillar_status": {"pillar": "constellation-status", "status": status, "message": report},
+    }, "constellation-status")
 
 async def main():
     print("Serveur du Jumeau Numérique (v3 - Heartbeat) démarré sur ws://127.0.0.1:5005")
     asyncio.create_task(cryptographic_heartbeat_protocol())
-    async with websockets.serve(handler, "127.0.0.1", 5005):
-        await asyncio.Future()
+    if CONSTELLATION_SIZE:
+        engine = ConstellationEngine(CONSTELLATION_SIZE, on_report=publish_constellation_report)
+        if CONSTELLATION_CRYPTO:
+            engine.heartbeat = CryptoHeartbeat(engine.state, HEARTBEAT_VERIFIER)
+        asyncio.create_task(engine.run())
+    try:
+        async with websockets.serve(handler, "127.0.0.1", 5005):
+            await asyncio.Future()
+    finally:
+        await HUB.close()
+        await HIVE_CLIENT.close()
+        HEARTBEAT_VERIFIER.shutdown()
 
 if __name__ == "__main__":
     # Assurez-vous que l'API HIVE (api.py) est lancée avant ce serveur.
@@ -1,21 +1,36 @@
 import torch
 import pandas as pd
-from sklearn.preprocessing import MinMaxScaler
 from sklearn.metrics import classification_report
-from torch.utils.data import DataLoader, TensorDataset
 import os
 import joblib # Pour sauvegarder notre scaler
+import numpy as np
 
 from advanced_detector import AdvancedAnomalyDetector
+from hive_kernel import ScoringKernel
+from model_manifest import save_model_manifest
+from telemetry_stream import fit_minmax_scaler_streaming, iter_chunks, make_telemetry_loader
+from training_engine import configure_threads, scale_learning_rate, set_learning_rate, train_distributed
 
 # --- Configuration du Modèle (Hyperparamètres) ---
 CONFIG = {
     "INPUT_DIM": 3, # Fréquence, puissance, modulation
     "ENCODING_DIM": 16, # Dimension de la représentation compressée
     "EPOCHS": 100, # Augmentation pour un meilleur entraînement
-    "BATCH_SIZE": 2,
+    "BATCH_SIZE": 256, # Grands lots : un pas d'optimisation amortit mieux le parallélisme CPU
+    "BASE_BATCH_SIZE": 32, # Taille de lot de référence pour LEARNING_RATE
+    "LEARNING_RATE": 1e-3,
+    "LR_SCALING": "sqrt", # Mise à l'échelle du taux d'apprentissage : 'linear', 'sqrt' ou None
+    "ACCUMULATION_STEPS": 1, # Lots cumulés par pas d'optimisation
+    "EARLY_STOPPING_PATIENCE": 10, # Époques sans amélioration avant l'arrêt (None = désactivé)
+    "NUM_THREADS": None, # Threads PyTorch par processus (None = tous les cœurs)
+    "WORLD_SIZE": 1, # Processus d'entraînement data-parallel (gloo) ; 1 = un seul processus
+    "TRAIN_SOURCES": None, # CSV, shards .npy/Parquet ou motif glob ; None = données de simulation
+    "CHUNK_ROWS": 65536, # Lignes lues par bloc : borne la mémoire de l'entraînement
+    "NUM_WORKERS": 0, # Workers du DataLoader (les blocs sont répartis entre eux)
+    "THRESHOLD_POLICY": "max", # Seuil retenu : 'max' ou un quantile calibré ('p99', 'p99.9', ...)
     "MODEL_PATH": "astra_anomaly_detector.pth", # Chemin pour sauvegarder le modèle
-    "SCALER_PATH": "astra_data_scaler.pkl" # Chemin pour sauvegarder le scaler
+    "SCALER_PATH": "astra_data_scaler.pkl", # Chemin pour sauvegarder le scaler
+    "KERNEL_PATH": "astra_scoring_kernel.npz" # Noyau de scoring NumPy (scaler + poids fusionnés)
 }
 
 def setup_dummy_data():
@@ -50,42 +65,99 @@ def run_production_cycle():
     """
     print("\n--- DÉBUT DU CYCLE DE PRODUCTION ASTRA HIVE ---")
 
-    # 1. Préparation des données
+    # 1. Préparation des données (lues en flux, jamais chargées en entier)
     legit_path, attack_path = setup_dummy_data()
-    df_legit = pd.read_csv(legit_path)
-    df_attack = pd.read_csv(attack_path)
+    train_sources = CONFIG["TRAIN_SOURCES"] or legit_path
 
-    # 2. Normalisation et sauvegarde du scaler
-    scaler = MinMaxScaler()
-    df_legit_scaled = scaler.fit_transform(df_legit)
+    # 2. Normalisation (min/max courants en une passe) et sauvegarde du scaler
+    scaler = fit_minmax_scaler_streaming(train_sources, CONFIG["CHUNK_ROWS"])
     joblib.dump(scaler, CONFIG["SCALER_PATH"])
     print(f"Scaler de normalisation sauvegardé dans {CONFIG['SCALER_PATH']}")
 
-    # 3. Création des DataLoaders
-    train_dataset = TensorDataset(torch.FloatTensor(df_legit_scaled))
-    train_loader = DataLoader(train_dataset, batch_size=CONFIG["BATCH_SIZE"], shuffle=True)
+    # 3. Paramètres d'entraînement multi-cœurs
+    effective_batch = CONFIG["BATCH_SIZE"] * CONFIG["ACCUMULATION_STEPS"] * CONFIG["WORLD_SIZE"]
+    lr = scale_learning_rate(CONFIG["LEARNING_RATE"], effective_batch, CONFIG["BASE_BATCH_SIZE"], CONFIG["LR_SCALING"])
+    print(f"Lot effectif : {effective_batch}, taux d'apprentissage : {lr:.6f}")
 
     # 4. Entraînement du modèle
-    detector = AdvancedAnomalyDetector(
-        input_dim=CONFIG["INPUT_DIM"], 
-        encoding_dim=CONFIG["ENCODING_DIM"]
-    )
-    detector.train(train_loader, epochs=CONFIG["EPOCHS"])
+    if CONFIG["WORLD_SIZE"] > 1:
+        detector = train_distributed(
+            train_sources, scaler,
+            world_size=CONFIG["WORLD_SIZE"],
+            input_dim=CONFIG["INPUT_DIM"],
+            encoding_dim=CONFIG["ENCODING_DIM"],
+            epochs=CONFIG["EPOCHS"],
+            batch_size=CONFIG["BATCH_SIZE"],
+            lr=lr,
+            chunk_rows=CONFIG["CHUNK_ROWS"],
+            num_workers=CONFIG["NUM_WORKERS"],
+            accumulation_steps=CONFIG["ACCUMULATION_STEPS"],
+            early_stopping_patience=CONFIG["EARLY_STOPPING_PATIENCE"],
+            threshold_policy=CONFIG["THRESHOLD_POLICY"],
+            threads_per_rank=CONFIG["NUM_THREADS"]
+        )
+    else:
+        configure_threads(CONFIG["NUM_THREADS"])
+        # DataLoader en flux
+        train_loader = make_telemetry_loader(
+            train_sources, scaler,
+            batch_size=CONFIG["BATCH_SIZE"],
+            chunk_rows=CONFIG["CHUNK_ROWS"],
+            num_workers=CONFIG["NUM_WORKERS"]
+        )
+        detector = AdvancedAnomalyDetector(
+            input_dim=CONFIG["INPUT_DIM"], 
+            encoding_dim=CONFIG["ENCODING_DIM"],
+            threshold_policy=CONFIG["THRESHOLD_POLICY"]
+        )
+        set_learning_rate(detector, lr)
+        detector.train(
+            train_loader,
+            epochs=CONFIG["EPOCHS"],
+            accumulation_steps=CONFIG["ACCUMULATION_STEPS"],
+            early_stopping_patience=CONFIG["EARLY_STOPPING_PATIENCE"]
+        )
 
     # 5. Sauvegarde du modèle entraîné
     torch.save(detector.model.state_dict(), CONFIG["MODEL_PATH"])
     print(f"Modèle entraîné sauvegardé dans {CONFIG['MODEL_PATH']}")
 
+    # 5 bis. Export du noyau de scoring et contrôle de parité avec le modèle PyTorch
+    kernel = ScoringKernel.from_artifacts(scaler, detector.model)
+    X_legit = next(iter_chunks(train_sources, CONFIG["CHUNK_ROWS"]))
+    with torch.no_grad():
+        tensor_data = torch.FloatTensor(scaler.transform(X_legit)).to(detector.device)
+        torch_errors = torch.mean((tensor_data - detector.model(tensor_data)) ** 2, dim=1).cpu().numpy()
+    if not np.allclose(kernel.score(X_legit), torch_errors, rtol=1e-4, atol=1e-6):
+        raise RuntimeError("Le noyau de scoring NumPy diverge du modèle PyTorch.")
+    kernel.save(CONFIG["KERNEL_PATH"])
+    print(f"Noyau de scoring exporté dans {CONFIG['KERNEL_PATH']}")
+
+    # 5 ter. Manifeste du modèle : seuils calibrés, relus par tous les serveurs
+    manifest_path = save_model_manifest(
+        CONFIG["MODEL_PATH"],
+        threshold=detector.threshold,
+        thresholds=detector.thresholds,
+        threshold_policy=detector.threshold_policy,
+        calibration_samples=detector.calibration_samples,
+        input_dim=CONFIG["INPUT_DIM"],
+        encoding_dim=CONFIG["ENCODING_DIM"],
+        scaler_path=CONFIG["SCALER_PATH"],
+        kernel_path=CONFIG["KERNEL_PATH"]
+    )
+    print(f"Manifeste du modèle sauvegardé dans {manifest_path}")
+
     # 6. Évaluation rigoureuse des performances
     print("\n--- Évaluation des Performances du Modèle Final ---")
-    # On prépare un jeu de test complet
-    df_test = pd.concat([df_legit, df_attack], ignore_index=True)
-    true_labels = [1] * len(df_legit) + [-1] * len(df_attack) # Les vraies étiquettes
-    df_test_scaled = scaler.transform(df_test)
-    test_dataset = TensorDataset(torch.FloatTensor(df_test_scaled))
-    test_loader = DataLoader(test_dataset, batch_size=1)
-    
-    predicted_labels = detector.predict(test_loader)
+    # Le jeu de test (signaux légitimes puis attaques) est évalué bloc par bloc
+    true_labels, predicted_labels = [], []
+    for path, label in ((legit_path, 1), (attack_path, -1)):
+        for chunk in iter_chunks(path, CONFIG["CHUNK_ROWS"]):
+            labels, _ = detector.predict_batch(scaler.transform(chunk))
+            predicted_labels.append(labels)
+            true_labels.append(np.full(len(chunk), label, dtype=np.int8)) # Les vraies étiquettes
+    true_labels = np.concatenate(true_labels)
+    predicted_labels = np.concatenate(predicted_labels)
 
     # Affichage du rapport de classification
     print(classification_report(true_labels, predicted_labels, target_names=['Anomalie', 'Signal Normal']))
@@ -0,0 +1,170 @@
+# heartbeat_verifier.py
+import asyncio
+import math
+import os
+import time
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import numpy as np
+
+from pqc_backend import Dilithium5
+
+
+def _verify_chunk(scheme, items):
+    # None si valide, sinon le motif d'échec ; seuls certains schémas distinguent une clé inconnue
+    # (verify_status du simulateur pqc_sim) d'une signature invalide
+    verify_status = getattr(scheme, "verify_status", None)
+    if verify_status is not None:
+        return [verify_status(pk, challenge, signature) for pk, challenge, signature in items]
+    return [None if scheme.verify(pk, challenge, signature) else "bad_signature"
+            for pk, challenge, signature in items]
+
+
+def _sign_chunk(scheme, items):
+    return [scheme.sign(sk, challenge) for sk, challenge in items]
+
+
+class LatencyHistogram:
+    """Histogramme de latence à seaux en puissances de 2 (µs), plus une fenêtre pour les percentiles."""
+    def __init__(self, window=10_000):
+        self.buckets = {}
+        self.recent = deque(maxlen=window)
+
+    def observe(self, seconds):
+        us = seconds * 1e6
+        bucket = 1 << max(0, math.ceil(math.log2(us))) if us > 1 else 1
+        self.buckets[bucket] = self.buckets.get(bucket, 0) + 1
+        self.recent.append(seconds)
+
+    def snapshot(self):
+        from astra_bench import latency_percentiles
+
+        return {
+            "buckets_us": {f"<={k}": self.buckets[k] for k in sorted(self.buckets)},
+            **latency_percentiles(list(self.recent)),
+        }
+
+
+class HeartbeatVerifier:
+    """
+    Vérification des heartbeats d'une flotte, par lots et hors de la boucle d'événements.
+    Les réponses d'un tick sont découpées en blocs vérifiés dans un pool de threads
+    (ou de processus pour un schéma pur Python sans état). Au-delà de max_in_flight ticks
+    en cours, l'appelant attend : la vérification en retard ralentit l'émission des défis
+    au lieu d'accumuler du travail, et les entrées/sorties websocket restent servies.
+    Avec le simulateur pqc_sim, ASTRA_PQC_SIM_MAX_KEYS doit être au moins égal à la taille de la
+    flotte : les clés évincées de son registre échouent (compté dans stats["failure_reasons"]["unknown_key"]).
+    """
+    def __init__(self, scheme=Dilithium5, max_workers=None, use_processes=False, chunk_size=256, max_in_flight=2):
+        """
+        :param scheme: Classe exposant sign(sk, msg) et verify(pk, msg, sig) (Dilithium5 par défaut).
+        :param use_processes: Pool de processus ; le schéma doit alors être importable et sans état
+                              global (ce n'est pas le cas du simulateur pqc_sim).
+        """
+        self.scheme = scheme
+        self.chunk_size = chunk_size
+        max_workers = max_workers or os.cpu_count()
+        self.executor = ProcessPoolExecutor(max_workers) if use_processes else ThreadPoolExecutor(
+            max_workers, thread_name_prefix="heartbeat-verify")
+        self.max_in_flight = max_in_flight
+        self._slots = None
+        self.latency = LatencyHistogram()
+        self.stats = {"ticks": 0, "verified": 0, "failed": 0, "failure_reasons": Counter(), "backpressure_waits": 0,
+                      "in_flight": 0}
+
+    async def _run_chunks(self, fn, items):
+        loop = asyncio.get_running_loop()
+        chunks = [items[i:i + self.chunk_size] for i in range(0, len(items), self.chunk_size)]
+        results = await asyncio.gather(*(loop.run_in_executor(self.executor, fn, self.scheme, c) for c in chunks))
+        return [r for chunk in results for r in chunk]
+
+    async def sign_batch(self, items):
+        """Signe des (sk, challenge) hors de la boucle : simule les réponses des satellites."""
+        return await self._run_chunks(_sign_chunk, items)
+
+    async def verify_batch(self, items):
+        """Vérifie une liste de (pk, challenge, signature) ; retourne un tableau bool."""
+        if self._slots is None:
+            # Créé dans la boucle qui l'utilise
+            self._slots = asyncio.Semaphore(self.max_in_flight)
+        if self._slots.locked():
+            self.stats["backpressure_waits"] += 1
+        async with self._slots:
+            self.stats["in_flight"] += 1
+            start = time.perf_counter()
+            try:
+                failures = await self._run_chunks(_verify_chunk, items)
+            finally:
+                self.stats["in_flight"] -= 1
+            self.latency.observe(time.perf_counter() - start)
+        self.stats["ticks"] += 1
+        self.stats["verified"] += len(items)
+        ok = np.fromiter((reason is None for reason in failures), dtype=bool, count=len(failures))
+        self.stats["failed"] += int(np.count_nonzero(~ok))
+        self.stats["failure_reasons"].update(reason for reason in failures if reason is not None)
+        return ok
+
+    def report(self):
+        report = {**self.stats, "failure_reasons": dict(self.stats["failure_reasons"]),
+                  "latency": self.latency.snapshot()}
+        registry_report = getattr(self.scheme, "registry_report", None)
+        if registry_report is not None:
+            report["key_registry"] = registry_report()
+        return report
+
+    def shutdown(self):
+        self.executor.shutdown(wait=True)
+
+
+class CryptoHeartbeat:
+    """
+    Heartbeat cryptographique pour ConstellationEngine : défi aléatoire, signature par le satellite,
+    vérification par lot. Un satellite au firmware corrompu signe avec une clé qui n'est pas la sienne.
+    """
+    def __init__(self, state, verifier):
+        self.state = state
+        self.verifier = verifier
+        registry_report = getattr(verifier.scheme, "registry_report", None)
+        if registry_report is not None and len(state) + 1 > registry_report()["max_keys"]:
+            print(f"⚠️ Flotte de {len(state)} satellites au-delà du registre de clés simulé "
+                  f"({registry_report()['max_keys']}) : des heartbeats valides échoueront (clé inconnue).")
+        keys = [verifier.scheme.keypair() for _ in range(len(state))]
+        self.public_keys = [pk for pk, _ in keys]
+        self.secret_keys = [sk for _, sk in keys]
+        _, self._rogue_sk = verifier.scheme.keypair()
+
+    async def __call__(self, indices, now):
+        challenges = [os.urandom(32) for _ in range(indices.shape[0])]
+        firmware_ok = self.state.firmware_ok[indices].tolist()
+        signatures = await self.verifier.sign_batch([
+            (self.secret_keys[i] if healthy else self._rogue_sk, c)
+            for i, healthy, c in zip(indices.tolist(), firmware_ok, challenges)
+        ])
+        return await self.verifier.verify_batch([
+            (self.public_keys[i], c, s) for i, c, s in zip(indices.tolist(), challenges, signatures)
+        ])
+
+
+def run_heartbeat_benchmark(n_satellites=20_000, duration=15.0, period=7.0, max_workers=None):
+    """Flotte simulée avec heartbeats cryptographiques : débit, lots et latence de vérification par tick."""
+    from constellation_engine import ConstellationEngine
+
+    verifier = HeartbeatVerifier(max_workers=max_workers)
+    engine = ConstellationEngine(n_satellites, period)
+    engine.heartbeat = CryptoHeartbeat(engine.state, verifier)
+    engine.state.corrupt_firmware(np.arange(0, n_satellites, 1000))
+    start = time.perf_counter()
+    asyncio.run(engine.run(duration))
+    elapsed = time.perf_counter() - start
+    report = verifier.report()
+    print(f"\n--- Heartbeats cryptographiques : {n_satellites} satellites, {duration:.0f} s ---")
+    print(f"{report['verified'] / elapsed:,.0f} vérifications/s sur {report['ticks']} ticks, "
+          f"{report['failed']} échecs {report['failure_reasons']}, {report['backpressure_waits']} attentes de contre-pression")
+    print(f"Latence par tick : {report['latency']}")
+    print(f"Retard d'ordonnancement : {engine.report()}")
+    verifier.shutdown()
+
+
+if __name__ == "__main__":
+    run_heartbeat_benchmark()
@@ -0,0 +1,198 @@
+# hive_client.py
+import asyncio
+import json
+import random
+
+import numpy as np
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from hive_inference import features_from_json
+
+try:
+    import aiohttp
+except ImportError: # Repli : client synchrone exécuté dans un thread, la boucle n'est jamais bloquée
+    aiohttp = None
+
+HIVE_API_URL = "http://127.0.0.1:5000/predict"
+ANOMALY_PREDICTION = "Anomalie Détectée"
+NORMAL_PREDICTION = "Signal Normal"
+RETRY_STATUSES = (502, 503, 504) # 503 : modèle en cours de chargement côté API
+
+
+class HiveError(Exception):
+    """ASTRA HIVE injoignable ou réponse invalide (status_code si une réponse HTTP a été reçue)."""
+    def __init__(self, message, status_code=None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def is_anomaly(response):
+    """Interprète une réponse de /predict."""
+    return response.get("prediction") == ANOMALY_PREDICTION
+
+
+class LocalHiveBackend:
+    """
+    Court-circuit en processus : lorsque le modèle est co-localisé, les signaux sont scorés
+    directement par le registre d'artefacts, sans HTTP. Réponses au même format que /predict.
+    """
+    def __init__(self, registry):
+        self.registry = registry
+
+    def predict(self, signal):
+        try:
+            errors, threshold = self.registry.score_with_threshold(
+                np.array([features_from_json(signal)], dtype=np.float32))
+        except (RuntimeError, TimeoutError) as e:
+            # Artefacts en échec ou encore en chargement : même contrat d'erreur que le client HTTP
+            raise HiveError(f"ASTRA HIVE local indisponible : {e}") from e
+        error = float(errors[0])
+        prediction = ANOMALY_PREDICTION if error > threshold else NORMAL_PREDICTION
+        return {"prediction": prediction, "reconstruction_error": error}
+
+    async def predict_async(self, signal):
+        # Le scoring d'un signal prend quelques microsecondes ; seul le premier chargement
+        # des artefacts est déporté dans un thread pour ne pas bloquer la boucle
+        if not self.registry.is_ready():
+            try:
+                await asyncio.get_running_loop().run_in_executor(None, self.registry.get_kernel)
+            except (RuntimeError, TimeoutError) as e:
+                raise HiveError(f"ASTRA HIVE local indisponible : {e}") from e
+        return self.predict(signal)
+
+
+def make_local_backend(model_path="astra_anomaly_detector.pth", scaler_path="astra_data_scaler.pkl",
+                       kernel_path="astra_scoring_kernel.npz", default_threshold=0.001):
+    """Crée un backend local avec les artefacts de api.py, chargés en arrière-plan."""
+    from model_registry import ModelRegistry
+
+    registry = ModelRegistry(model_path, scaler_path, kernel_path, default_threshold=default_threshold)
+    registry.load_in_background()
+    return LocalHiveBackend(registry)
+
+
+class HiveClient:
+    """
+    Client synchrone d'ASTRA HIVE sur une session HTTP partagée :
+    connexions keep-alive réutilisées, délais bornés et nouvelles tentatives avec backoff.
+    """
+    def __init__(self, url=HIVE_API_URL, timeout=(1.0, 2.0), retries=3, backoff_factor=0.2, pool_maxsize=16,
+                 local=None):
+        """
+        :param timeout: (connexion, lecture) en secondes.
+        :param retries: Nouvelles tentatives sur erreur réseau ou statut 502/503/504.
+        :param local: LocalHiveBackend optionnel, utilisé à la place de HTTP.
+        """
+        self.url = url
+        self.timeout = timeout
+        self.local = local
+        self.session = requests.Session()
+        # /predict est sans effet de bord : le rejouer après un échec est sûr
+        retry = Retry(total=retries, backoff_factor=backoff_factor, status_forcelist=RETRY_STATUSES,
+                      allowed_methods=frozenset({"GET", "POST"}))
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_maxsize, max_retries=retry)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def predict(self, signal):
+        """Retourne la réponse de /predict pour un signal (dict frequency/power/modulation)."""
+        if self.local is not None:
+            return self.local.predict(signal)
+        try:
+            response = self.session.post(self.url, json=signal, timeout=self.timeout)
+            response.raise_for_status()
+            return response.json()
+        except requests.exceptions.HTTPError as e:
+            raise HiveError(f"ASTRA HIVE a répondu {e.response.status_code}", e.response.status_code) from e
+        except (requests.exceptions.RequestException, ValueError) as e:
+            raise HiveError(f"ASTRA HIVE injoignable : {e}") from e
+
+    def close(self):
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class AsyncHiveClient:
+    """
+    Client asyncio d'ASTRA HIVE, utilisable depuis la boucle du jumeau numérique.
+    Pool de connexions keep-alive (aiohttp), délais, nouvelles tentatives avec backoff exponentiel,
+    et regroupement des requêtes identiques en vol : un seul appel HTTP, un résultat partagé.
+    """
+    def __init__(self, url=HIVE_API_URL, timeout=2.0, retries=3, backoff_factor=0.2, pool_size=16, local=None):
+        self.url = url
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+        self.pool_size = pool_size
+        self.local = local
+        self._session = None
+        self._sync_client = None
+        self._inflight = {}
+        self.stats = {"requests": 0, "coalesced": 0, "retries": 0, "local": 0}
+
+    async def predict(self, signal):
+        if self.local is not None:
+            self.stats["local"] += 1
+            return await self.local.predict_async(signal)
+        key = json.dumps(signal, sort_keys=True)
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._predict_http(signal))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+            self.stats["requests"] += 1
+        else:
+            self.stats["coalesced"] += 1
+        # shield : l'annulation d'un appelant n'interrompt pas la requête partagée
+        return await asyncio.shield(task)
+
+    async def _predict_http(self, signal):
+        if aiohttp is None:
+            if self._sync_client is None:
+                self._sync_client = HiveClient(self.url, timeout=(self.timeout, self.timeout), retries=self.retries,
+                                               backoff_factor=self.backoff_factor, pool_maxsize=self.pool_size)
+            return await asyncio.get_running_loop().run_in_executor(None, self._sync_client.predict, signal)
+
+        session = self._get_session()
+        for attempt in range(self.retries + 1):
+            try:
+                async with session.post(self.url, json=signal) as response:
+                    if response.status >= 400:
+                        raise HiveError(f"ASTRA HIVE a répondu {response.status}", response.status)
+                    return await response.json()
+            except (aiohttp.ClientError, asyncio.TimeoutError, HiveError) as e:
+                retryable = not isinstance(e, HiveError) or e.status_code in RETRY_STATUSES
+                if not retryable or attempt == self.retries:
+                    if isinstance(e, HiveError):
+                        raise
+                    raise HiveError(f"ASTRA HIVE injoignable : {e!r}") from e
+            self.stats["retries"] += 1
+            # Backoff exponentiel avec gigue, pour ne pas resynchroniser les clients
+            await asyncio.sleep(self.backoff_factor * (2 ** attempt) * random.uniform(0.5, 1.5))
+
+    def _get_session(self):
+        # Créée dans la boucle en cours : une session aiohttp est liée à sa boucle
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.pool_size, keepalive_timeout=30)
+            self._session = aiohttp.ClientSession(connector=connector,
+                                                  timeout=aiohttp.ClientTimeout(total=self.timeout))
+        return self._session
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+        if self._sync_client is not None:
+            self._sync_client.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
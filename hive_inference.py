@@ -0,0 +1,292 @@
+# hive_inference.py
+import io
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+# Ordre des features attendu par le scaler et l'autoencodeur
+FEATURE_ORDER = ["frequency", "power", "modulation"]
+
+# Format binaire des échanges en masse : float32 petit-boutiste, (N, 3) en ordre C
+BULK_DTYPE = np.dtype("<f4")
+NPY_HEADER_MAX_BYTES = 65536 # Borne de l'en-tête .npy lu avant les données
+BULK_CONTENT_TYPES = {
+    "raw": "application/octet-stream",
+    "npy": "application/x-npy",
+    "arrow": "application/vnd.apache.arrow.stream",
+}
+
+# Sentinelle utilisée pour arrêter proprement le thread de traitement
+_STOP = object()
+
+
+def features_from_json(input_data):
+    """Extrait les features d'un signal JSON dans l'ordre attendu par le modèle."""
+    return [float(input_data[k]) for k in FEATURE_ORDER]
+
+
+def decode_bulk_signals(body, content_type="application/octet-stream", input_dim=3):
+    """
+    Décode un corps binaire en tableau (N, input_dim) float32, sans copie lorsque c'est possible.
+    - application/octet-stream : tampon brut '<f4' lu directement par np.frombuffer ;
+    - application/x-npy : fichier .npy dont seul l'en-tête est analysé (pas de pickle) ;
+    - application/vnd.apache.arrow.stream : flux IPC Arrow (pyarrow, optionnel), colonnes FEATURE_ORDER.
+    """
+    content_type = (content_type or BULK_CONTENT_TYPES["raw"]).split(";")[0].strip()
+    if content_type == BULK_CONTENT_TYPES["raw"]:
+        if len(body) % (BULK_DTYPE.itemsize * input_dim):
+            raise ValueError(f"Taille du corps ({len(body)} octets) incompatible avec des lignes de {input_dim} float32.")
+        X = np.frombuffer(body, dtype=BULK_DTYPE).reshape(-1, input_dim)
+    elif content_type == BULK_CONTENT_TYPES["npy"]:
+        # Seul le début du corps est copié pour lire l'en-tête (les tableaux bytearray seraient recopiés en entier)
+        stream = io.BytesIO(memoryview(body)[:NPY_HEADER_MAX_BYTES])
+        version = np.lib.format.read_magic(stream)
+        if version == (1, 0):
+            shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(stream)
+        else:
+            shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(stream)
+        if dtype.hasobject or len(shape) != 2 or shape[1] != input_dim:
+            raise ValueError(f"Tableau .npy attendu de forme (N, {input_dim}) numérique, reçu {shape} {dtype}.")
+        count = shape[0] * shape[1]
+        X = np.frombuffer(body, dtype=dtype, count=count, offset=stream.tell())
+        X = X.reshape(shape, order="F" if fortran_order else "C")
+    elif content_type == BULK_CONTENT_TYPES["arrow"]:
+        try:
+            import pyarrow as pa
+        except ImportError:
+            raise ImportError("La lecture Arrow nécessite pyarrow (pip install pyarrow).")
+        table = pa.ipc.open_stream(pa.py_buffer(body)).read_all()
+        # Passage colonnes -> lignes : seule copie inévitable, le noyau travaille en (N, input_dim)
+        X = np.column_stack([table.column(c).to_numpy() for c in FEATURE_ORDER[:input_dim]])
+    else:
+        raise ValueError(f"Type de contenu non supporté : {content_type}")
+    # Conversion uniquement si nécessaire (dtype ou ordre mémoire différents)
+    return np.ascontiguousarray(X, dtype=np.float32)
+
+
+def allocate_bulk_results(n):
+    """
+    Tampon de résultats packés pour N signaux et vue float32 sur ses N erreurs : passée en out=
+    au scoring, elle évite de recopier les erreurs dans la réponse.
+    """
+    payload = bytearray(n * (BULK_DTYPE.itemsize + 1))
+    return payload, np.frombuffer(payload, dtype=BULK_DTYPE, count=n)
+
+
+def encode_bulk_results(errors, threshold, payload=None):
+    """
+    Résultats packés : N erreurs '<f4' suivies de N verdicts uint8 (1 = anomalie).
+    Écrits dans un seul tampon, sans sérialisation ligne par ligne.
+    :param payload: Tampon d'allocate_bulk_results dont les erreurs sont déjà écrites (pas de copie).
+    """
+    n = len(errors)
+    if payload is None:
+        payload, view = allocate_bulk_results(n)
+        view[:] = errors
+    np.greater(errors, threshold, out=np.frombuffer(payload, dtype=np.uint8, count=n, offset=n * BULK_DTYPE.itemsize),
+               casting="unsafe")
+    return payload
+
+
+def decode_bulk_results(payload):
+    """Inverse de encode_bulk_results : retourne (erreurs float32, verdicts bool)."""
+    n = len(payload) // (BULK_DTYPE.itemsize + 1)
+    errors = np.frombuffer(payload, dtype=BULK_DTYPE, count=n)
+    verdicts = np.frombuffer(payload, dtype=np.uint8, count=n, offset=n * BULK_DTYPE.itemsize).astype(bool)
+    return errors, verdicts
+
+
+def iter_ndjson_results(errors, threshold, chunk_rows=8192):
+    """Résultats au format NDJSON, produits par blocs pour une réponse en flux."""
+    for start in range(0, len(errors), chunk_rows):
+        chunk = errors[start:start + chunk_rows]
+        anomalies = chunk > threshold
+        yield "".join(
+            f'{{"reconstruction_error":{e:.8g},"verdict":"{"Anomalie" if a else "Normal"}"}}\n'
+            for e, a in zip(chunk.tolist(), anomalies.tolist())
+        ).encode()
+
+
+def make_torch_scorer(model, scaler, device):
+    """
+    Construit une fonction de scoring par lot à partir du modèle PyTorch et du scaler.
+    La fonction reçoit un tableau (N, 3) brut et retourne les N erreurs de reconstruction.
+    """
+    import torch
+
+    scale = np.asarray(scaler.scale_, dtype=np.float32)
+    offset = np.asarray(scaler.min_, dtype=np.float32)
+
+    def score_batch(X):
+        # Équivalent à scaler.transform(X), sans passer par pandas ni sklearn à chaque lot
+        X_scaled = X * scale + offset
+        tensor_data = torch.from_numpy(X_scaled).to(device)
+        with torch.no_grad():
+            reconstructed = model(tensor_data)
+            loss = torch.mean((tensor_data - reconstructed) ** 2, dim=1)
+        return loss.cpu().numpy()
+
+    return score_batch
+
+
+class MicroBatchInferenceEngine:
+    """
+    Moteur d'inférence par micro-lots pour ASTRA HIVE.
+    Les requêtes concurrentes sont placées dans une file, puis évaluées ensemble
+    en un seul passage avant dès que le lot est plein ou que le délai maximal est atteint.
+    Chaque appelant récupère ensuite sa propre erreur de reconstruction.
+    """
+    def __init__(self, score_batch, max_batch_size=256, max_wait_us=2000, input_dim=3):
+        """
+        :param score_batch: Fonction (N, input_dim) -> N erreurs de reconstruction, ou
+                            (N erreurs, contexte) : chaque appelant reçoit alors (erreur, contexte),
+                            par exemple le seuil de la génération qui a scoré le lot.
+        :param max_batch_size: Nombre maximal de signaux évalués en un seul passage.
+        :param max_wait_us: Délai maximal (en microsecondes) entre l'arrivée du premier
+                            signal d'un lot et son évaluation.
+        """
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size doit être supérieur ou égal à 1.")
+        self.score_batch = score_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_us / 1_000_000
+        self.input_dim = input_dim
+        self._queue = queue.Queue()
+        self._buffer = np.empty((max_batch_size, input_dim), dtype=np.float32)
+        self._worker = None
+        self._lock = threading.Lock()
+        self.stats = {"batches": 0, "signals": 0}
+
+    def start(self):
+        """Démarre le thread de traitement des lots (idempotent)."""
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name="hive-microbatch", daemon=True)
+                self._worker.start()
+        return self
+
+    def stop(self, timeout=None):
+        """Arrête le thread après avoir traité les signaux déjà en file."""
+        with self._lock:
+            worker = self._worker
+            self._worker = None
+        if worker is not None:
+            self._queue.put(_STOP)
+            worker.join(timeout)
+
+    def submit(self, features):
+        """Ajoute un signal à la file et retourne un Future portant son erreur de reconstruction."""
+        if len(features) != self.input_dim:
+            raise ValueError(f"Un signal doit contenir {self.input_dim} features, reçu {len(features)}.")
+        worker = self._worker
+        if worker is None or not worker.is_alive():
+            # Démarrage paresseux : couvre aussi les workers forkés, qui n'héritent pas du thread
+            self.start()
+        future = Future()
+        self._queue.put((time.perf_counter(), features, future))
+        return future
+
+    def predict(self, features, timeout=None):
+        """Version bloquante de submit : retourne directement l'erreur de reconstruction."""
+        return self.submit(features).result(timeout)
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                return
+            pending = [item]
+            # Le délai court à partir de l'arrivée du premier signal du lot,
+            # ce qui borne la latence ajoutée par le regroupement.
+            deadline = item[0] + self.max_wait
+            stop_requested = False
+            while len(pending) < self.max_batch_size:
+                remaining = deadline - time.perf_counter()
+                try:
+                    if remaining > 0:
+                        item = self._queue.get(timeout=remaining)
+                    else:
+                        item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stop_requested = True
+                    break
+                pending.append(item)
+            self._flush(pending)
+            if stop_requested:
+                return
+
+    def _flush(self, pending):
+        n = len(pending)
+        X = self._buffer[:n]
+        try:
+            for i, (_, features, _) in enumerate(pending):
+                X[i] = features
+            errors = self.score_batch(X)
+        except Exception as e:
+            for _, _, future in pending:
+                future.set_exception(e)
+            return
+        if isinstance(errors, tuple):
+            errors, context = errors
+            for (_, _, future), error in zip(pending, errors):
+                future.set_result((float(error), context))
+        else:
+            for (_, _, future), error in zip(pending, errors):
+                future.set_result(float(error))
+        self.stats["batches"] += 1
+        self.stats["signals"] += n
+
+
+def run_inference_benchmark(n_signals=20000, n_threads=32, max_batch_size=256, max_wait_us=2000):
+    """
+    Compare le chemin historique (un passage avant par requête) au moteur par micro-lots.
+    Utilise un autoencodeur non entraîné : seul le débit nous intéresse ici.
+    """
+    import torch
+    from concurrent.futures import ThreadPoolExecutor
+    from sklearn.preprocessing import MinMaxScaler
+
+    from advanced_detector import Autoencoder
+
+    model = Autoencoder(3, 16).eval()
+    scaler = MinMaxScaler().fit(np.array([[10.0, 50.0, 0.0], [15.0, 500.0, 1.0]]))
+    rng = np.random.default_rng(42)
+    signals = (rng.random((n_signals, 3)) * [5.0, 450.0, 1.0] + [10.0, 50.0, 0.0]).tolist()
+    score_batch = make_torch_scorer(model, scaler, torch.device("cpu"))
+
+    def per_request(features):
+        return score_batch(np.asarray([features], dtype=np.float32))[0]
+
+    print(f"\n--- BENCHMARK INFÉRENCE HIVE ({n_signals} signaux, {n_threads} clients) ---")
+    with ThreadPoolExecutor(n_threads) as pool:
+        start = time.perf_counter()
+        list(pool.map(per_request, signals))
+        baseline = n_signals / (time.perf_counter() - start)
+    print(f"Chemin par requête      : {baseline:,.0f} signaux/s")
+
+    engine = MicroBatchInferenceEngine(score_batch, max_batch_size, max_wait_us).start()
+    latencies = []
+
+    def batched(features):
+        t0 = time.perf_counter()
+        engine.predict(features)
+        latencies.append(time.perf_counter() - t0)
+
+    with ThreadPoolExecutor(n_threads) as pool:
+        start = time.perf_counter()
+        list(pool.map(batched, signals))
+        throughput = n_signals / (time.perf_counter() - start)
+    engine.stop()
+    p99 = np.percentile(latencies, 99) * 1000
+    print(f"Moteur par micro-lots   : {throughput:,.0f} signaux/s (x{throughput / baseline:.1f})")
+    print(f"Latence p99             : {p99:.2f} ms (délai de vidage {max_wait_us} µs)")
+    print(f"Taille moyenne des lots : {engine.stats['signals'] / max(engine.stats['batches'], 1):.1f}")
+
+
+if __name__ == "__main__":
+    run_inference_benchmark()
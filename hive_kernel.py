@@ -0,0 +1,159 @@
+# hive_kernel.py
+import os
+import threading
+
+import numpy as np
+
+# Activations supportées après chaque couche linéaire de l'autoencodeur
+SUPPORTED_ACTIVATIONS = ("none", "relu", "sigmoid")
+
+
+class ScoringKernel:
+    """
+    Noyau de scoring compilé pour ASTRA HIVE.
+    Fusionne la normalisation MinMaxScaler et les couches de l'Autoencodeur
+    en tableaux NumPy float32 contigus, évalués dans des tampons préalloués.
+    Aucun objet Python par ligne, aucun import de pandas, sklearn ou torch.
+    """
+    def __init__(self, scale, offset, weights, biases, activations, clip_range=None, max_batch_size=4096):
+        """
+        :param scale, offset: Normalisation fusionnée, X_scaled = X * scale + offset.
+        :param weights: Matrices (in, out) de chaque couche linéaire, déjà transposées.
+        :param biases: Biais (out,) de chaque couche linéaire.
+        :param activations: Activation appliquée après chaque couche ('none', 'relu', 'sigmoid').
+        :param clip_range: Bornes (min, max) si le scaler a été entraîné avec clip=True.
+        :param max_batch_size: Taille des tampons préalloués ; les entrées plus grandes sont découpées.
+        """
+        if not (len(weights) == len(biases) == len(activations)):
+            raise ValueError("weights, biases et activations doivent avoir la même longueur.")
+        for activation in activations:
+            if activation not in SUPPORTED_ACTIVATIONS:
+                raise ValueError(f"Activation non supportée : {activation}")
+        self.scale = np.ascontiguousarray(scale, dtype=np.float32)
+        self.offset = np.ascontiguousarray(offset, dtype=np.float32)
+        self.weights = [np.ascontiguousarray(w, dtype=np.float32) for w in weights]
+        self.biases = [np.ascontiguousarray(b, dtype=np.float32) for b in biases]
+        self.activations = list(activations)
+        self.clip_range = tuple(clip_range) if clip_range is not None else None
+        self.max_batch_size = max_batch_size
+        self.input_dim = self.scale.shape[0]
+        if self.weights[0].shape[0] != self.input_dim or self.weights[-1].shape[1] != self.input_dim:
+            raise ValueError("La première et la dernière couche doivent correspondre à la dimension d'entrée.")
+        # Tampons propres à chaque thread : les serveurs appellent score() en parallèle
+        self._local = threading.local()
+
+    @classmethod
+    def from_artifacts(cls, scaler, model, max_batch_size=4096):
+        """
+        Exporte le noyau depuis un MinMaxScaler entraîné et un Autoencoder PyTorch.
+        Les couches sont lues dans l'ordre de l'encodeur puis du décodeur.
+        """
+        weights, biases, activations = [], [], []
+        for layer in list(model.encoder) + list(model.decoder):
+            name = type(layer).__name__
+            if name == "Linear":
+                weights.append(layer.weight.detach().cpu().numpy().T)
+                biases.append(layer.bias.detach().cpu().numpy())
+                activations.append("none")
+            elif name in ("ReLU", "Sigmoid"):
+                if not activations or activations[-1] != "none":
+                    raise ValueError(f"Activation {name} sans couche linéaire associée.")
+                activations[-1] = name.lower()
+            else:
+                raise ValueError(f"Couche non supportée par le noyau de scoring : {name}")
+        clip_range = scaler.feature_range if getattr(scaler, "clip", False) else None
+        return cls(scaler.scale_, scaler.min_, weights, biases, activations, clip_range, max_batch_size)
+
+    def save(self, path):
+        """
+        Sauvegarde le noyau dans un fichier .npz (chargeable sans torch ni sklearn).
+        L'écriture passe par un fichier temporaire renommé, pour ne jamais exposer un noyau partiel.
+        """
+        arrays = {
+            "scale": self.scale,
+            "offset": self.offset,
+            "activations": np.array(self.activations),
+        }
+        if self.clip_range is not None:
+            arrays["clip_range"] = np.array(self.clip_range, dtype=np.float32)
+        for i, (w, b) in enumerate(zip(self.weights, self.biases)):
+            arrays[f"weight_{i}"] = w
+            arrays[f"bias_{i}"] = b
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(f, **arrays)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path, max_batch_size=4096):
+        """Recharge un noyau sauvegardé par save()."""
+        with np.load(path, allow_pickle=False) as data:
+            activations = [str(a) for a in data["activations"]]
+            weights = [data[f"weight_{i}"] for i in range(len(activations))]
+            biases = [data[f"bias_{i}"] for i in range(len(activations))]
+            clip_range = data["clip_range"].tolist() if "clip_range" in data.files else None
+            return cls(data["scale"], data["offset"], weights, biases, activations, clip_range, max_batch_size)
+
+    def _buffers(self):
+        buffers = getattr(self._local, "buffers", None)
+        if buffers is None:
+            n = self.max_batch_size
+            buffers = {
+                "input": np.empty((n, self.input_dim), dtype=np.float32),
+                "layers": [np.empty((n, w.shape[1]), dtype=np.float32) for w in self.weights],
+            }
+            self._local.buffers = buffers
+        return buffers
+
+    def transform(self, X, out=None):
+        """Applique la normalisation fusionnée (équivalent de scaler.transform)."""
+        X = np.asarray(X, dtype=np.float32)
+        if out is None:
+            out = np.empty(X.shape, dtype=np.float32)
+        np.multiply(X, self.scale, out=out)
+        out += self.offset
+        if self.clip_range is not None:
+            np.clip(out, self.clip_range[0], self.clip_range[1], out=out)
+        return out
+
+    def score(self, X, out=None):
+        """
+        Calcule l'erreur de reconstruction (MSE par ligne) d'un tableau (N, input_dim).
+        Donne les mêmes erreurs que torch.mean((x - model(x)) ** 2, dim=1).
+        """
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim != 2 or X.shape[1] != self.input_dim:
+            raise ValueError(f"Entrée attendue de forme (N, {self.input_dim}), reçu {X.shape}.")
+        n = X.shape[0]
+        if out is None:
+            out = np.empty(n, dtype=np.float32)
+        buffers = self._buffers()
+        for start in range(0, n, self.max_batch_size):
+            stop = min(start + self.max_batch_size, n)
+            self._score_chunk(X[start:stop], out[start:stop], buffers)
+        return out
+
+    def _score_chunk(self, X, out, buffers):
+        m = X.shape[0]
+        scaled = self.transform(X, out=buffers["input"][:m])
+        h = scaled
+        for w, b, activation, buf in zip(self.weights, self.biases, self.activations, buffers["layers"]):
+            y = buf[:m]
+            np.matmul(h, w, out=y)
+            y += b
+            if activation == "relu":
+                np.maximum(y, 0.0, out=y)
+            elif activation == "sigmoid":
+                np.negative(y, out=y)
+                # exp peut déborder vers inf pour les grandes entrées : 1 / (1 + inf) = 0, comme torch
+                with np.errstate(over="ignore"):
+                    np.exp(y, out=y)
+                y += 1.0
+                np.reciprocal(y, out=y)
+            h = y
+        # Erreur de reconstruction calculée en place dans le tampon de sortie du décodeur
+        np.subtract(scaled, h, out=h)
+        np.square(h, out=h)
+        np.mean(h, axis=1, out=out)
@@ -0,0 +1,294 @@
+# hsm_keystore.py
+import glob
+import json
+import os
+import re
+import threading
+import zlib
+from collections.abc import MutableMapping
+
+CHECKPOINT_FILE = "CHECKPOINT"
+SEGMENT_PATTERN = re.compile(r"segment-(\d{6})\.log$")
+DEFAULT_SEGMENT_MAX_BYTES = 16 * 1024 * 1024
+
+
+class KeyStoreCorruptedError(Exception):
+    """Enregistrement invalide au milieu du journal (hors fin de segment actif)."""
+
+
+def _fsync_dir(path):
+    # Rend durable la création ou le renommage d'un fichier dans le répertoire
+    if not hasattr(os, "O_DIRECTORY"):
+        return
+    fd = os.open(path, os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _encode_record(op, label, value=None):
+    body = f"{op}\t{json.dumps(label)}\t{json.dumps(value, separators=(',', ':'))}"
+    return f"{zlib.crc32(body.encode('utf-8')):08x}\t{body}\n".encode("utf-8")
+
+
+def _decode_record(line):
+    """Retourne (op, label, début de la valeur, fin de la valeur) ou None si la ligne est invalide."""
+    if not line.endswith(b"\n") or len(line) < 10:
+        return None
+    crc, body = line[:8], line[9:-1]
+    try:
+        if int(crc, 16) != zlib.crc32(body):
+            return None
+        op, raw_label, _ = body.split(b"\t", 2)
+        label = json.loads(raw_label)
+    except ValueError:
+        return None
+    # La valeur suit "crc\top\tlabel\t" et précède le saut de ligne
+    value_start = 9 + len(op) + len(raw_label) + 2
+    return op.decode("ascii"), label, value_start, len(line) - 1
+
+
+class HSMKeyStore:
+    """
+    Stockage des clés du HSM simulé en journal append-only.
+    Chaque opération ajoute une ligne CRC + JSON au segment actif (fsync), l'index en mémoire
+    associe chaque label à la position de sa valeur : lecture en O(1) par pread, démarrage
+    par un simple parcours séquentiel. La compaction réécrit les seules entrées vivantes
+    dans un nouveau segment, publié par renommage atomique du fichier CHECKPOINT.
+    """
+    def __init__(self, directory="astra_hsm_store", segment_max_bytes=DEFAULT_SEGMENT_MAX_BYTES, sync=True,
+                 legacy_file=None):
+        """
+        :param sync: fsync après chaque écriture (désactiver uniquement pour un import massif suivi de sync()).
+        :param legacy_file: Ancien astra_hsm_simulation.json, importé tant qu'il n'a pas été renommé
+                            en .migrated (une migration interrompue reprend au démarrage suivant).
+        """
+        self.directory = directory
+        self.segment_max_bytes = segment_max_bytes
+        self.sync_writes = sync
+        self._lock = threading.RLock()
+        self._index = {}
+        self._readers = {}
+        self._live_bytes = 0
+        self._total_bytes = 0
+        self._active_id = None
+        self._active = None
+        os.makedirs(directory, exist_ok=True)
+        self._open()
+        if legacy_file and os.path.exists(legacy_file):
+            self.migrate_legacy_json(legacy_file)
+
+    # --- Ouverture et relecture du journal ---
+    def _segment_path(self, segment_id):
+        return os.path.join(self.directory, f"segment-{segment_id:06d}.log")
+
+    def _base_segment(self):
+        try:
+            with open(os.path.join(self.directory, CHECKPOINT_FILE), "r") as f:
+                return json.load(f)["base_segment"]
+        except FileNotFoundError:
+            return 1
+
+    def _segment_ids(self, base):
+        ids = []
+        for path in glob.glob(os.path.join(self.directory, "segment-*.log")):
+            match = SEGMENT_PATTERN.search(path)
+            if match and int(match.group(1)) >= base:
+                ids.append(int(match.group(1)))
+        return sorted(ids)
+
+    def _open(self):
+        base = self._base_segment()
+        ids = self._segment_ids(base) or [base]
+        for segment_id in ids:
+            self._replay(segment_id, is_last=(segment_id == ids[-1]))
+        self._active_id = ids[-1]
+        self._active = open(self._segment_path(self._active_id), "ab")
+
+    def _replay(self, segment_id, is_last):
+        path = self._segment_path(segment_id)
+        if not os.path.exists(path):
+            open(path, "ab").close()
+        offset = 0
+        torn = False
+        with open(path, "rb") as f:
+            for line in f:
+                record = _decode_record(line)
+                if record is None:
+                    if not is_last:
+                        raise KeyStoreCorruptedError(f"Enregistrement invalide dans {path} à l'octet {offset}.")
+                    torn = True
+                    break
+                op, label, start, end = record
+                self._apply(op, label, (segment_id, offset + start, end - start), len(line))
+                offset += len(line)
+        if torn:
+            # Écriture interrompue par un arrêt brutal : la fin du segment actif est tronquée
+            with open(path, "r+b") as out:
+                out.truncate(offset)
+                out.flush()
+                os.fsync(out.fileno())
+            print(f"⚠️ Journal HSM : enregistrement incomplet ignoré en fin de {os.path.basename(path)}.")
+        self._readers[segment_id] = os.open(path, os.O_RDONLY)
+
+    def _apply(self, op, label, location, record_bytes):
+        previous = self._index.pop(label, None)
+        if previous is not None:
+            self._live_bytes -= previous[3]
+        if op == "put":
+            self._index[label] = (*location, record_bytes)
+            self._live_bytes += record_bytes
+        self._total_bytes += record_bytes
+
+    # --- Lecture ---
+    def __contains__(self, label):
+        return label in self._index
+
+    def __len__(self):
+        return len(self._index)
+
+    def labels(self):
+        with self._lock:
+            return list(self._index)
+
+    def get(self, label):
+        """Valeur d'un label (KeyError s'il est absent) : un pread et un json.loads."""
+        # Sous verrou : compact() ferme les descripteurs et reconstruit l'index, un pread concurrent
+        # pourrait lire un descripteur fermé ou réattribué à un autre fichier
+        with self._lock:
+            segment_id, start, length, _ = self._index[label]
+            raw = os.pread(self._readers[segment_id], length, start)
+        return json.loads(raw)
+
+    # --- Écriture ---
+    def _append(self, op, label, value=None):
+        record = _encode_record(op, label, value)
+        with self._lock:
+            if self._active.tell() + len(record) > self.segment_max_bytes and self._active.tell() > 0:
+                self._roll_segment()
+            offset = self._active.tell()
+            self._active.write(record)
+            self._active.flush()
+            if self.sync_writes:
+                os.fsync(self._active.fileno())
+            _, _, start, end = _decode_record(record)
+            self._apply(op, label, (self._active_id, offset + start, end - start), len(record))
+
+    def put(self, label, value):
+        self._append("put", label, value)
+
+    def delete(self, label):
+        if label not in self._index:
+            raise KeyError(label)
+        self._append("del", label)
+
+    def sync(self):
+        """Force l'écriture sur disque du segment actif."""
+        with self._lock:
+            self._active.flush()
+            os.fsync(self._active.fileno())
+
+    def _roll_segment(self):
+        self.sync()
+        self._active.close()
+        self._active_id += 1
+        self._active = open(self._segment_path(self._active_id), "ab")
+        self._readers[self._active_id] = os.open(self._segment_path(self._active_id), os.O_RDONLY)
+        _fsync_dir(self.directory)
+
+    # --- Compaction ---
+    def garbage_ratio(self):
+        return 1.0 - self._live_bytes / self._total_bytes if self._total_bytes else 0.0
+
+    def compact(self):
+        """
+        Réécrit les entrées vivantes dans un nouveau segment de base, puis bascule CHECKPOINT
+        par renommage atomique. Un arrêt à n'importe quelle étape laisse un état relisible :
+        tant que CHECKPOINT n'est pas remplacé, les anciens segments restent la référence.
+        """
+        with self._lock:
+            self.sync()
+            new_id = self._active_id + 1
+            new_path = self._segment_path(new_id)
+            tmp_path = new_path + ".tmp"
+            with open(tmp_path, "wb") as out:
+                for label in self._index:
+                    out.write(_encode_record("put", label, self.get(label)))
+                out.flush()
+                os.fsync(out.fileno())
+            os.replace(tmp_path, new_path)
+            checkpoint_tmp = os.path.join(self.directory, CHECKPOINT_FILE + ".tmp")
+            with open(checkpoint_tmp, "w") as f:
+                json.dump({"base_segment": new_id}, f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(checkpoint_tmp, os.path.join(self.directory, CHECKPOINT_FILE))
+            _fsync_dir(self.directory)
+
+            old_ids = list(self._readers)
+            self._active.close()
+            for fd in self._readers.values():
+                os.close(fd)
+            self._index, self._readers = {}, {}
+            self._live_bytes = self._total_bytes = 0
+            self._open()
+            for segment_id in old_ids:
+                os.remove(self._segment_path(segment_id))
+            print(f"🗜️ Magasin de clés HSM compacté : {len(self._index)} clés dans {os.path.basename(new_path)}.")
+
+    def migrate_legacy_json(self, legacy_file):
+        """
+        Importe l'ancien fichier JSON réécrit en entier, puis le renomme en .migrated.
+        Seuls les labels absents du journal sont importés : après un arrêt en cours de migration,
+        le fichier encore présent est repris sans écraser les clés déjà migrées.
+        """
+        with open(legacy_file, "r") as f:
+            keys = json.load(f).get("keys", {})
+        keys = {label: value for label, value in keys.items() if label not in self._index}
+        sync_writes, self.sync_writes = self.sync_writes, False
+        try:
+            for label, value in keys.items():
+                self.put(label, value)
+            self.sync()
+        finally:
+            self.sync_writes = sync_writes
+        os.replace(legacy_file, legacy_file + ".migrated")
+        print(f"Migration de {len(keys)} clé(s) depuis {legacy_file} vers le journal HSM.")
+
+    def close(self):
+        with self._lock:
+            if self._active is not None:
+                self.sync()
+                self._active.close()
+                self._active = None
+            for fd in self._readers.values():
+                os.close(fd)
+            self._readers = {}
+
+    def keys_mapping(self):
+        return KeyStoreMapping(self)
+
+
+class KeyStoreMapping(MutableMapping):
+    """Vue dict du magasin : conserve l'interface hsm_data["keys"][label] des appelants existants."""
+    def __init__(self, store):
+        self.store = store
+
+    def __getitem__(self, label):
+        return self.store.get(label)
+
+    def __setitem__(self, label, value):
+        self.store.put(label, value)
+
+    def __delitem__(self, label):
+        self.store.delete(label)
+
+    def __contains__(self, label):
+        return label in self.store
+
+    def __iter__(self):
+        return iter(self.store.labels())
+
+    def __len__(self):
+        return len(self.store)
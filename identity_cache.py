@@ -0,0 +1,113 @@
+# identity_cache.py
+import threading
+import time
+from collections import OrderedDict
+
+
+class IdentityCache:
+    """
+    Cache LRU borné des identités de satellites déjà vérifiées.
+    Clé : (clé publique Dilithium, sha256 de la clé publique Kyber, signature) ; valeur : instant
+    jusqu'auquel la vérification reste acquise. Une clé Kyber ou une signature différente donne
+    une autre entrée : seule la présentation exacte d'un matériel déjà vérifié évite la vérification.
+    Une identité révoquée est purgée du cache et refusée jusqu'à restore().
+    """
+    def __init__(self, max_entries=100_000, ttl=3600.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._by_signing_pk = {}
+        self._revoked = set()
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "inserts": 0, "evictions": 0, "expirations": 0, "revocations": 0}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def is_revoked(self, signing_pk):
+        return signing_pk in self._revoked
+
+    def lookup(self, signing_pk, kem_digest, signature):
+        """Vrai si ce matériel a été vérifié et que la vérification n'a pas expiré."""
+        key = (signing_pk, kem_digest, signature)
+        with self._lock:
+            verified_until = self._entries.get(key)
+            if verified_until is None:
+                self.stats["misses"] += 1
+                return False
+            if verified_until <= time.monotonic():
+                self._discard(key)
+                self.stats["expirations"] += 1
+                self.stats["misses"] += 1
+                return False
+            self._entries.move_to_end(key)
+            self.stats["hits"] += 1
+            return True
+
+    def remember(self, signing_pk, kem_digest, signature):
+        """Enregistre une vérification réussie (ignorée si l'identité a été révoquée entre-temps)."""
+        key = (signing_pk, kem_digest, signature)
+        with self._lock:
+            if signing_pk in self._revoked:
+                return
+            self._entries[key] = time.monotonic() + self.ttl
+            self._entries.move_to_end(key)
+            self._by_signing_pk.setdefault(signing_pk, set()).add(key)
+            self.stats["inserts"] += 1
+            while len(self._entries) > self.max_entries:
+                oldest = next(iter(self._entries))
+                self._discard(oldest)
+                self.stats["evictions"] += 1
+
+    def _discard(self, key):
+        del self._entries[key]
+        keys = self._by_signing_pk.get(key[0])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_signing_pk[key[0]]
+
+    def revoke(self, signing_pk):
+        """Révoque une identité : ses entrées sont purgées et ses prochaines présentations refusées."""
+        with self._lock:
+            self._revoked.add(signing_pk)
+            for key in self._by_signing_pk.pop(signing_pk, ()):
+                del self._entries[key]
+            self.stats["revocations"] += 1
+
+    def restore(self, signing_pk):
+        """Lève une révocation (la prochaine présentation sera vérifiée normalement)."""
+        with self._lock:
+            self._revoked.discard(signing_pk)
+
+    def report(self):
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return {**self.stats, "size": len(self._entries), "revoked": len(self._revoked),
+                "hit_rate": self.stats["hits"] / lookups if lookups else 0.0}
+
+
+def run_identity_cache_benchmark(n_satellites=5000):
+    """Reconnexion de toute une flotte après bascule de station sol, sans puis avec identités en cache."""
+    import contextlib
+    import io
+
+    from astra_bench import report
+    from wave_hybrid_prod import AuthenticatedSatellite, SecureGroundStation
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        presentations = [AuthenticatedSatellite(f"Astra-Sat-{i:05d}").get_signed_public_keys()
+                         for i in range(n_satellites)]
+        station = SecureGroundStation()
+    print(f"\n--- Reconnexion de {n_satellites} satellites ---")
+    for name in ("premier passage (vérifications)", "bascule (identités en cache)"):
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            for presentation in presentations:
+                station.establish_hybrid_channel(*presentation)
+            seconds = time.perf_counter() - start
+        report(name, n_satellites, seconds, unit="poignées de main")
+    print(f"Cache d'identités : {station.identity_cache.report()}")
+
+
+if __name__ == "__main__":
+    run_identity_cache_benchmark()
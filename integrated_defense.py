@@ -1,5 +1,5 @@
-import requests
 import json
+from hive_client import HiveClient, HiveError, is_anomaly
 from sentry_auth import SentryMFA, generate_qr_code_for_setup
 import pyotp
 
@@ -11,6 +11,8 @@ class IntegratedDefenseController:
     def __init__(self, user, secret_key, hardware_key_id):
         self.sentry_module = SentryMFA(user, secret_key, hardware_key_id)
         self.hive_api_url = "http://127.0.0.1:5000/predict"
+        # Session HTTP réutilisée entre les commandes (keep-alive, délais, nouvelles tentatives)
+        self.hive = HiveClient(self.hive_api_url)
 
     def _check_network_status_with_hive(self):
         """
@@ -23,20 +25,17 @@ class IntegratedDefenseController:
             suspicious_network_telemetry = {
                 "frequency": 19.0, "power": 600.0, "modulation": 0
             }
-            response = requests.post(self.hive_api_url, json=suspicious_network_telemetry)
-            response.raise_for_status()
-            
-            data = response.json()
+            data = self.hive.predict(suspicious_network_telemetry)
             print(f"Analyse HIVE reçue: {data}")
             
-            if data.get("prediction") == "Anomalie Détectée":
+            if is_anomaly(data):
                 print("🚨 ALERTE HIVE : Comportement réseau anormal détecté sur la constellation.")
                 return False
             
             print("✅ HIVE confirme un état réseau nominal.")
             return True
             
-        except requests.exceptions.RequestException as e:
+        except HiveError as e:
             print(f"❌ Impossible de contacter ASTRA HIVE : {e}")
             # Principe de précaution : en cas de doute, on refuse la commande
             return False
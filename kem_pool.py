@@ -0,0 +1,140 @@
+# kem_pool.py
+import threading
+import time
+from collections import deque
+
+from pqc_backend import Kyber1024
+
+
+def zeroize(buffer):
+    """Écrase un bytearray en place (les objets bytes, immuables, ne peuvent pas être effacés)."""
+    buffer[:] = bytes(len(buffer))
+
+
+class EphemeralKEMKey:
+    """
+    Paire de clés KEM à usage unique : la clé secrète est effacée dès la décapsulation
+    (ou à discard() si la poignée de main échoue avant).
+    """
+    def __init__(self, scheme, public_key, secret_key):
+        self.scheme = scheme
+        self.public_key = public_key
+        self._secret_key = secret_key
+
+    def decapsulate(self, ciphertext):
+        if self._secret_key is None:
+            raise ValueError("Clé KEM éphémère déjà consommée.")
+        try:
+            return self.scheme.dec(ciphertext, self._secret_key)
+        finally:
+            self.discard()
+
+    def discard(self):
+        if self._secret_key is not None:
+            zeroize(self._secret_key)
+            self._secret_key = None
+
+
+class KEMKeyPool:
+    """
+    Réserve de paires Kyber pré-calculées par un thread producteur.
+    Quand la profondeur descend au seuil bas, le producteur remplit la réserve jusqu'à sa taille
+    nominale : une poignée de main retire une clé prête en O(1) et n'attend la génération
+    que si la réserve est vide (compté dans stats["waits"]).
+    Les clés secrètes sont conservées en bytearray pour pouvoir être effacées ; la copie bytes
+    renvoyée par keypair() est relâchée aussitôt mais reste en mémoire jusqu'au ramasse-miettes.
+    """
+    def __init__(self, scheme=Kyber1024, size=32, low_watermark=8, start=True):
+        if not 0 <= low_watermark < size:
+            raise ValueError("Le seuil bas doit être compris entre 0 et la taille de la réserve.")
+        self.scheme = scheme
+        self.size = size
+        self.low_watermark = low_watermark
+        self._keys = deque()
+        self._cond = threading.Condition()
+        self._closed = False
+        self._thread = None
+        self.stats = {"produced": 0, "acquired": 0, "waits": 0, "wait_seconds": 0.0, "refills": 0,
+                      "min_depth": size}
+        if start:
+            self.start()
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._produce, name="kem-pool", daemon=True)
+            self._thread.start()
+
+    def _produce(self):
+        while True:
+            with self._cond:
+                while not self._closed and len(self._keys) > self.low_watermark:
+                    self._cond.wait()
+                if self._closed:
+                    return
+                missing = self.size - len(self._keys)
+                self.stats["refills"] += 1
+            for _ in range(missing):
+                # Génération hors verrou : acquire() reste servi pendant le remplissage
+                pk, sk = self.scheme.keypair()
+                with self._cond:
+                    if self._closed:
+                        return
+                    self._keys.append((pk, bytearray(sk)))
+                    self.stats["produced"] += 1
+                    self._cond.notify_all()
+
+    def depth(self):
+        return len(self._keys)
+
+    def acquire(self, timeout=None):
+        """Retire une paire prête ; attend le producteur si la réserve est vide (TimeoutError au-delà de timeout)."""
+        with self._cond:
+            if not self._keys:
+                self.stats["waits"] += 1
+                start = time.perf_counter()
+                self._cond.notify_all()
+                if not self._cond.wait_for(lambda: self._keys or self._closed, timeout):
+                    raise TimeoutError("Réserve de clés KEM vide.")
+                self.stats["wait_seconds"] += time.perf_counter() - start
+            if self._closed:
+                raise RuntimeError("Réserve de clés KEM fermée.")
+            pk, sk = self._keys.popleft()
+            self.stats["acquired"] += 1
+            depth = len(self._keys)
+            self.stats["min_depth"] = min(self.stats["min_depth"], depth)
+            if depth <= self.low_watermark:
+                self._cond.notify_all()
+        return EphemeralKEMKey(self.scheme, pk, sk)
+
+    def report(self):
+        return {**self.stats, "depth": len(self._keys)}
+
+    def close(self):
+        """Arrête le producteur et efface les clés secrètes restantes."""
+        with self._cond:
+            self._closed = True
+            while self._keys:
+                zeroize(self._keys.popleft()[1])
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+
+
+def run_kem_pool_benchmark(n_handshakes=20_000, size=64, low_watermark=16):
+    """Coût de la clé éphémère dans une poignée de main : génération en ligne contre réserve pré-calculée."""
+    from astra_bench import report, time_calls
+
+    print(f"\n--- Clés KEM éphémères ({n_handshakes} poignées de main) ---")
+    seconds, latencies = time_calls(Kyber1024.keypair, n_handshakes)
+    report("génération en ligne", n_handshakes, seconds, latencies)
+    pool = KEMKeyPool(size=size, low_watermark=low_watermark)
+    while pool.depth() < size:
+        time.sleep(0.01)
+    seconds, latencies = time_calls(lambda: pool.acquire().discard(), n_handshakes)
+    report("réserve pré-calculée", n_handshakes, seconds, latencies)
+    print(f"Réserve : {pool.report()}")
+    pool.close()
+
+
+if __name__ == "__main__":
+    run_kem_pool_benchmark()
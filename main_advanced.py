@@ -1,11 +1,9 @@
 # main_advanced.py
-import torch
-from torch.utils.data import DataLoader, TensorDataset
 import pandas as pd
-from sklearn.preprocessing import MinMaxScaler
 import os
 
 from advanced_detector import AdvancedAnomalyDetector
+from telemetry_stream import FEATURE_COLUMNS, fit_minmax_scaler_streaming, iter_chunks, make_telemetry_loader
 
 def setup_dummy_data():
     """Crée des fichiers de données factices pour que notre script puisse fonctionner."""
@@ -41,39 +39,30 @@ def run_advanced_simulation():
     
     # 1. Charger les données
     legit_path, attack_path = setup_dummy_data()
-    df_legit = pd.read_csv(legit_path)
-    df_attack = pd.read_csv(attack_path)
     
     # 2. Normaliser les données (essentiel pour les autoencodeurs)
-    scaler = MinMaxScaler()
-    df_legit_scaled = scaler.fit_transform(df_legit)
-    # On utilise le même scaler pour les données d'attaque pour être cohérent
-    df_attack_scaled = scaler.transform(df_attack)
+    #    Le scaler est ajusté en flux : les données légitimes ne sont jamais chargées en entier
+    scaler = fit_minmax_scaler_streaming(legit_path)
     
     # 3. Préparer les DataLoader PyTorch
-    # Le DataLoader d'entraînement ne contient QUE des données légitimes
-    train_dataset = TensorDataset(torch.FloatTensor(df_legit_scaled))
-    train_loader = DataLoader(train_dataset, batch_size=2, shuffle=True)
-    
-    # Le DataLoader de test contient un mélange
-    test_data = pd.concat([df_legit, df_attack], ignore_index=True)
-    test_data_scaled = scaler.transform(test_data)
-    test_dataset = TensorDataset(torch.FloatTensor(test_data_scaled))
-    test_loader = DataLoader(test_dataset, batch_size=1)
+    # Le DataLoader d'entraînement ne contient QUE des données légitimes, lues par blocs
+    train_loader = make_telemetry_loader(legit_path, scaler, batch_size=2)
     
     # 4. Initialiser et entraîner le détecteur
-    input_dim = df_legit.shape[1]
+    input_dim = scaler.n_features_in_
     detector = AdvancedAnomalyDetector(input_dim=input_dim)
     detector.train(train_loader, epochs=50) # On augmente les époques pour une meilleure convergence
     
-    # 5. Prédire sur l'ensemble de test
-    predictions = detector.predict(test_loader)
-    
+    # 5. Prédire sur l'ensemble de test (signaux légitimes puis attaques), lu bloc par bloc
     print("\n--- RÉSULTATS DE LA PRÉDICTION (Modèle Avancé) ---")
-    for i, p in enumerate(predictions):
-        original_signal = test_data.iloc[i].to_dict()
-        result = "Anomalie Détectée" if p == -1 else "Signal Normal"
-        print(f"Signal #{i+1} {original_signal}: {result}")
+    i = 0
+    for chunk in iter_chunks([legit_path, attack_path]):
+        labels, _ = detector.predict_batch(scaler.transform(chunk))
+        for signal, p in zip(chunk.tolist(), labels):
+            i += 1
+            original_signal = dict(zip(FEATURE_COLUMNS, signal))
+            result = "Anomalie Détectée" if p == -1 else "Signal Normal"
+            print(f"Signal #{i} {original_signal}: {result}")
     print("-------------------------------------------------")
 
 
@@ -0,0 +1,87 @@
+# merkle_batch.py
+import hashlib
+import hmac
+
+# Préfixes de domaine : une feuille ne peut pas être confondue avec un nœud interne
+_LEAF_PREFIX = b"\x00"
+_NODE_PREFIX = b"\x01"
+# Séparation de domaine de la signature de racine : elle ne peut pas valoir signature d'une commande isolée
+ROOT_SIGNATURE_TAG = b"ASTRA-SENTRY-MERKLE-ROOT\x00"
+
+
+def leaf_hash(data):
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    return hashlib.sha256(_LEAF_PREFIX + data).digest()
+
+
+def _node_hash(left, right):
+    return hashlib.sha256(_NODE_PREFIX + left + right).digest()
+
+
+def merkle_tree(leaves):
+    """
+    Construit l'arbre de Merkle de données (commandes str ou bytes).
+    Retourne les niveaux, des feuilles à la racine. Un nœud sans frère remonte tel quel
+    (pas de duplication, qui rendrait deux lots différents indiscernables).
+    """
+    if not leaves:
+        raise ValueError("Impossible de construire un arbre de Merkle vide.")
+    level = [leaf_hash(leaf) for leaf in leaves]
+    levels = [level]
+    while len(level) > 1:
+        level = [_node_hash(level[i], level[i + 1]) if i + 1 < len(level) else level[i]
+                 for i in range(0, len(level), 2)]
+        levels.append(level)
+    return levels
+
+
+def merkle_root(leaves):
+    return merkle_tree(leaves)[-1][0]
+
+
+def merkle_proofs(levels):
+    """Preuve d'inclusion de chaque feuille : liste de (hash du frère, frère à gauche ?)."""
+    proofs = []
+    for index in range(len(levels[0])):
+        proof = []
+        i = index
+        for level in levels[:-1]:
+            sibling = i ^ 1
+            if sibling < len(level):
+                proof.append((level[sibling], sibling < i))
+            i //= 2
+        proofs.append(proof)
+    return proofs
+
+
+def root_signature_message(root, n_leaves):
+    """Message signé pour un lot : la racine engage aussi la taille du lot (pas de troncature)."""
+    return ROOT_SIGNATURE_TAG + root + n_leaves.to_bytes(8, "big")
+
+
+def proof_shape(index, n_leaves):
+    """Drapeaux « frère à gauche ? » attendus pour la feuille index d'un arbre de n_leaves feuilles."""
+    flags = []
+    size = n_leaves
+    while size > 1:
+        sibling = index ^ 1
+        if sibling < size:
+            flags.append(sibling < index)
+        index //= 2
+        size = (size + 1) // 2
+    return flags
+
+
+def verify_merkle_proof(data, proof, root, index=None, n_leaves=None):
+    """
+    Recalcule la racine depuis une feuille et sa preuve (log2(N) hachages).
+    Avec index et n_leaves, la preuve doit en plus correspondre à cette position : une commande
+    déplacée dans le lot avec sa preuve est refusée.
+    """
+    if index is not None and [left for _, left in proof] != proof_shape(index, n_leaves):
+        return False
+    node = leaf_hash(data)
+    for sibling, sibling_is_left in proof:
+        node = _node_hash(sibling, node) if sibling_is_left else _node_hash(node, sibling)
+    return hmac.compare_digest(node, root)
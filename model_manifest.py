@@ -0,0 +1,66 @@
+# model_manifest.py
+import json
+import os
+import time
+
+MANIFEST_VERSION = 1
+
+
+def manifest_path_for(model_path):
+    """Chemin du manifeste placé à côté du .pth (astra_anomaly_detector.manifest.json)."""
+    return os.path.splitext(model_path)[0] + ".manifest.json"
+
+
+def manifest_mtime(model_path):
+    """Horodatage (ns) du manifeste, utilisé pour détecter une nouvelle génération d'artefacts."""
+    try:
+        return os.stat(manifest_path_for(model_path)).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
+def resolve_artifact_path(model_path, artifact_path):
+    """Résout un chemin d'artefact du manifeste, relatif au répertoire du manifeste."""
+    if not artifact_path:
+        return None
+    if os.path.isabs(artifact_path):
+        return artifact_path
+    return os.path.join(os.path.dirname(manifest_path_for(model_path)), artifact_path)
+
+
+def save_model_manifest(model_path, threshold, thresholds, threshold_policy="max", model_file=None, **extra):
+    """
+    Écrit le manifeste du modèle de manière atomique (fichier temporaire puis os.replace),
+    pour qu'un serveur ne lise jamais un manifeste à moitié écrit.
+    :param model_file: Fichier de poids actif, s'il diffère de model_path (générations successives).
+    """
+    manifest = {
+        "version": MANIFEST_VERSION,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "generation": 0,
+        "model_path": os.path.basename(model_file or model_path),
+        "threshold": float(threshold),
+        "threshold_policy": threshold_policy,
+        "thresholds": {k: float(v) for k, v in thresholds.items()},
+        **extra,
+    }
+    path = manifest_path_for(model_path)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    return path
+
+
+def load_model_manifest(model_path):
+    """Charge le manifeste associé au modèle, ou None s'il n'existe pas."""
+    path = manifest_path_for(model_path)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r") as f:
+        manifest = json.load(f)
+    if manifest.get("version") != MANIFEST_VERSION:
+        raise ValueError(f"Version de manifeste non supportée : {manifest.get('version')}")
+    return manifest
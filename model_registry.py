@@ -0,0 +1,258 @@
+# model_registry.py
+import gc
+import os
+import threading
+import time
+from collections import namedtuple
+
+# Référence de démarrage à froid : l'import de ce module précède toujours le premier appel
+_IMPORT_TIME = time.perf_counter()
+
+# Génération active, publiée d'un bloc : un appelant ne peut pas combiner le noyau d'une
+# génération avec le seuil d'une autre pendant un échange à chaud
+ActiveModel = namedtuple("ActiveModel", ["kernel", "threshold", "generation"])
+
+
+class ModelRegistry:
+    """
+    Registre des artefacts ASTRA HIVE partagé par les workers des API.
+    Les artefacts sont chargés à la demande ou dans un thread d'arrière-plan,
+    et l'état de chargement (readiness) est exposé séparément de la vivacité (liveness).
+
+    Pour partager les poids entre workers forkés (gunicorn --preload), appeler
+    preload() avant le fork : les tableaux du noyau ne sont jamais modifiés ensuite,
+    leurs pages restent donc partagées en copy-on-write.
+    """
+    def __init__(self, model_path, scaler_path, kernel_path=None, input_dim=3, encoding_dim=16, max_batch_size=4096,
+                 default_threshold=None):
+        self.model_path = model_path
+        self.scaler_path = scaler_path
+        self.kernel_path = kernel_path
+        self.input_dim = input_dim
+        self.encoding_dim = encoding_dim
+        self.max_batch_size = max_batch_size
+        self.default_threshold = default_threshold
+        self._active = ActiveModel(None, default_threshold, None)
+        self.manifest = None
+        self.state = "idle"
+        self.error = None
+        self.timings = {"load_seconds": None, "import_to_first_prediction_seconds": None}
+        self._lock = threading.Lock()
+        self._loaded = threading.Event()
+        self._loader = None
+        self._watcher = None
+        self._watch_interval = None
+        self._manifest_mtime = None
+        if hasattr(os, "register_at_fork"):
+            # Les threads ne survivent pas au fork : chaque worker relance sa surveillance
+            # et, si le fork a eu lieu pendant le chargement, son propre chargement
+            os.register_at_fork(after_in_child=self._restart_threads_after_fork)
+
+    @property
+    def kernel(self):
+        return self._active.kernel
+
+    @property
+    def threshold(self):
+        return self._active.threshold
+
+    @property
+    def generation(self):
+        return self._active.generation
+
+    def load(self):
+        """Charge les artefacts de manière synchrone (sans effet si déjà chargés)."""
+        with self._lock:
+            if self.state == "ready":
+                return self._active.kernel
+            self.state = "loading"
+            start = time.perf_counter()
+            try:
+                self._activate(*self._read_artifacts())
+                self.timings["load_seconds"] = time.perf_counter() - start
+                self.state = "ready"
+                self.error = None
+            except Exception as e:
+                self.state = "failed"
+                self.error = str(e)
+                print(f"❌ Échec du chargement des artefacts HIVE : {e}")
+                raise
+            finally:
+                # Réveille les appelants en attente une fois l'état final connu
+                self._loaded.set()
+            print(f"Artefacts HIVE chargés en {self.timings['load_seconds']:.3f} s")
+            return self._active.kernel
+
+    def _read_artifacts(self):
+        # Imports différés : le noyau exporté se charge sans torch, joblib ni pandas
+        from model_manifest import load_model_manifest, manifest_mtime, resolve_artifact_path
+
+        # Le manifeste est lu en premier : c'est lui qui désigne la génération d'artefacts active
+        mtime = manifest_mtime(self.model_path)
+        manifest = load_model_manifest(self.model_path)
+        if manifest is not None:
+            kernel_path = resolve_artifact_path(self.model_path, manifest.get("kernel_path")) or self.kernel_path
+            model_path = resolve_artifact_path(self.model_path, manifest.get("model_path")) or self.model_path
+            scaler_path = resolve_artifact_path(self.model_path, manifest.get("scaler_path")) or self.scaler_path
+        else:
+            kernel_path, model_path, scaler_path = self.kernel_path, self.model_path, self.scaler_path
+        kernel = self._load_kernel(kernel_path, model_path, scaler_path)
+        return kernel, manifest, mtime
+
+    def _load_kernel(self, kernel_path, model_path, scaler_path):
+        from hive_kernel import ScoringKernel
+
+        if kernel_path and os.path.exists(kernel_path):
+            return ScoringKernel.load(kernel_path, self.max_batch_size)
+
+        import joblib
+        import torch
+        from advanced_detector import Autoencoder
+
+        scaler = joblib.load(scaler_path)
+        model = Autoencoder(self.input_dim, self.encoding_dim)
+        model.load_state_dict(torch.load(model_path, map_location=torch.device("cpu")))
+        model.eval()
+        return ScoringKernel.from_artifacts(scaler, model, self.max_batch_size)
+
+    def _activate(self, kernel, manifest, mtime):
+        # Le seuil calibré à l'entraînement prime sur la valeur par défaut du serveur
+        if manifest is not None:
+            threshold = manifest["threshold"]
+            print(f"Seuil calibré chargé depuis le manifeste ({manifest['threshold_policy']}) : {threshold:.6f}")
+        elif self.default_threshold is not None:
+            threshold = self.default_threshold
+            print(f"⚠️ Aucun manifeste trouvé, seuil par défaut utilisé : {threshold}")
+        else:
+            raise FileNotFoundError(f"Manifeste introuvable pour {self.model_path} et aucun seuil par défaut.")
+        # Remplacement par une seule affectation : les requêtes en cours terminent avec
+        # l'ancienne génération (noyau et seuil), les suivantes utilisent la nouvelle
+        self.manifest = manifest
+        self._active = ActiveModel(kernel, threshold, manifest.get("generation", 0) if manifest else None)
+        self._manifest_mtime = mtime
+
+    def reload_if_changed(self):
+        """
+        Recharge les artefacts si le manifeste a changé (réentraînement, apprentissage en ligne).
+        Le nouveau noyau est entièrement chargé avant d'être échangé : aucune requête n'est perdue.
+        """
+        from model_manifest import manifest_mtime
+
+        if self.state != "ready" or manifest_mtime(self.model_path) == self._manifest_mtime:
+            return False
+        kernel, manifest, mtime = self._read_artifacts()
+        with self._lock:
+            self._activate(kernel, manifest, mtime)
+        print(f"🔄 Artefacts HIVE rechargés à chaud (génération {self.generation})")
+        return True
+
+    def watch(self, interval=5.0):
+        """Surveille le manifeste dans un thread et recharge à chaud les nouvelles générations."""
+        with self._lock:
+            self._watch_interval = interval
+            if self._watcher is None or not self._watcher.is_alive():
+                self._watcher = threading.Thread(target=self._watch_loop, name="hive-model-watcher", daemon=True)
+                self._watcher.start()
+
+    def _watch_loop(self):
+        while True:
+            time.sleep(self._watch_interval)
+            try:
+                self.reload_if_changed()
+            except Exception as e:
+                print(f"⚠️ Rechargement à chaud ignoré : {e}")
+
+    def _restart_threads_after_fork(self):
+        self._lock = threading.Lock()
+        self._watcher = None
+        if self.state == "loading" or (self.state == "idle" and self._loader is not None):
+            # Le thread de chargement du parent n'existe pas dans l'enfant : sans relance,
+            # l'état resterait "loading" et get_kernel() / readiness attendraient indéfiniment
+            self.state = "idle"
+            self._loader = None
+            self._loaded = threading.Event()
+            self.load_in_background()
+        if self._watch_interval is not None:
+            self.watch(self._watch_interval)
+
+    def load_in_background(self):
+        """Lance le chargement dans un thread et rend la main immédiatement."""
+        with self._lock:
+            if self.state != "idle" or self._loader is not None:
+                return
+            self._loader = threading.Thread(target=self._background_load, name="hive-model-loader", daemon=True)
+            self._loader.start()
+
+    def _background_load(self):
+        try:
+            self.load()
+        except Exception:
+            # L'erreur est conservée dans self.error et exposée par readiness()
+            pass
+
+    def preload(self):
+        """
+        Chargement synchrone à appeler dans le processus maître avant le fork des workers.
+        gc.freeze() retire les objets chargés du suivi du ramasse-miettes, qui sinon
+        écrirait dans leurs en-têtes et dupliquerait les pages partagées.
+        """
+        kernel = self.load()
+        gc.freeze()
+        return kernel
+
+    def get_active(self, timeout=None):
+        """Retourne la génération active (noyau, seuil, génération), en déclenchant le chargement si nécessaire."""
+        if self.state == "ready":
+            return self._active
+        if self.state == "idle" and self._loader is None:
+            self.load()
+            return self._active
+        if not self._loaded.wait(timeout):
+            raise TimeoutError("Les artefacts HIVE sont toujours en cours de chargement.")
+        if self.state != "ready":
+            raise RuntimeError(f"Artefacts HIVE indisponibles : {self.error}")
+        return self._active
+
+    def get_kernel(self, timeout=None):
+        """Retourne le noyau de scoring, en déclenchant le chargement si nécessaire."""
+        return self.get_active(timeout).kernel
+
+    def score_with_threshold(self, X, out=None):
+        """
+        Calcule les erreurs de reconstruction et retourne (erreurs, seuil), le seuil étant
+        celui de la génération qui a produit ces erreurs ; mesure aussi le délai jusqu'à
+        la première prédiction.
+        :param out: Tableau float32 (N,) de destination, par exemple une vue sur un tampon de réponse.
+        """
+        # Lecture unique : un échange à chaud pendant le calcul n'affecte pas cet appel
+        active = self.get_active()
+        errors = active.kernel.score(X, out=out)
+        if self.timings["import_to_first_prediction_seconds"] is None:
+            elapsed = time.perf_counter() - _IMPORT_TIME
+            self.timings["import_to_first_prediction_seconds"] = elapsed
+            print(f"Première prédiction HIVE servie {elapsed:.3f} s après l'import")
+        return errors, active.threshold
+
+    def score(self, X, out=None):
+        """Erreurs de reconstruction seules (voir score_with_threshold pour décider d'un verdict)."""
+        return self.score_with_threshold(X, out)[0]
+
+    def is_ready(self):
+        return self.state == "ready"
+
+    def liveness(self):
+        """Le processus répond : indépendant de l'état des artefacts."""
+        return {"status": "ok", "pid": os.getpid()}
+
+    def readiness(self):
+        """État de chargement des artefacts et métriques de démarrage à froid."""
+        active, manifest = self._active, self.manifest
+        return {
+            "ready": self.is_ready(),
+            "state": self.state,
+            "error": self.error,
+            "threshold": active.threshold,
+            "threshold_policy": manifest["threshold_policy"] if manifest else "default",
+            "generation": active.generation,
+            **self.timings,
+        }
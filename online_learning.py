@@ -0,0 +1,296 @@
+# online_learning.py
+import glob
+import math
+import multiprocessing
+import os
+import re
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError: # Windows : pas de verrou inter-processus, un seul worker doit activer l'apprentissage
+    fcntl = None
+
+
+class ReplayBuffer:
+    """
+    Tampon circulaire des signaux récents classés normaux (valeurs brutes, non normalisées).
+    Stockage NumPy préalloué : l'ajout d'un lot est vectorisé et la mémoire est bornée.
+    """
+    def __init__(self, capacity, input_dim=3):
+        self.capacity = capacity
+        self._data = np.empty((capacity, input_dim), dtype=np.float32)
+        self._next = 0
+        self.size = 0
+        self._lock = threading.Lock()
+
+    def add_batch(self, X):
+        X = np.asarray(X, dtype=np.float32)[-self.capacity:]
+        n = X.shape[0]
+        if n == 0:
+            return
+        with self._lock:
+            end = self._next + n
+            if end <= self.capacity:
+                self._data[self._next:end] = X
+            else:
+                split = self.capacity - self._next
+                self._data[self._next:] = X[:split]
+                self._data[:n - split] = X[split:]
+            self._next = end % self.capacity
+            self.size = min(self.size + n, self.capacity)
+
+    def snapshot(self):
+        """Copie des signaux présents, dans l'ordre d'arrivée."""
+        with self._lock:
+            if self.size < self.capacity:
+                return self._data[:self.size].copy()
+            return np.concatenate([self._data[self._next:], self._data[:self._next]])
+
+
+class PageHinkleyDriftDetector:
+    """
+    Détection de dérive (test de Page-Hinkley) sur les erreurs de reconstruction.
+    Les erreurs sont exprimées relativement à la moyenne de référence du manifeste :
+    une alarme est levée lorsque leur hausse cumulée dépasse `threshold`.
+    """
+    def __init__(self, reference_mean, delta=0.1, threshold=50.0):
+        """
+        :param reference_mean: Erreur moyenne sur les données de calibration.
+        :param delta: Hausse relative tolérée sans être comptée comme dérive (0.1 = 10 %).
+        :param threshold: Hausse relative cumulée déclenchant l'alarme.
+        """
+        self.reference_mean = max(float(reference_mean), 1e-12)
+        self.delta = delta
+        self.threshold = threshold
+        self.reset()
+
+    def reset(self, reference_mean=None):
+        if reference_mean is not None:
+            self.reference_mean = max(float(reference_mean), 1e-12)
+        self._cumulative = 0.0
+        self._minimum = 0.0
+        self.drift = False
+
+    def update(self, errors):
+        """Intègre un lot d'erreurs ; retourne True si une dérive est détectée."""
+        x = np.asarray(errors, dtype=np.float64).ravel() / self.reference_mean
+        if x.size == 0:
+            return self.drift
+        cumulative = self._cumulative + np.cumsum(x - 1.0 - self.delta)
+        running_min = np.minimum(self._minimum, np.minimum.accumulate(cumulative))
+        if np.any(cumulative - running_min > self.threshold):
+            self.drift = True
+        self._cumulative = float(cumulative[-1])
+        self._minimum = float(running_min[-1])
+        return self.drift
+
+
+def _generation_path(path, generation):
+    root, ext = os.path.splitext(path)
+    root = re.sub(r"\.gen-\d+$", "", root)
+    return f"{root}.gen-{generation:06d}{ext}"
+
+
+def _remove_old_generations(path, keep_from):
+    # On conserve la génération précédente : des workers peuvent encore être en train de la charger
+    root, ext = os.path.splitext(re.sub(r"\.gen-\d+(?=\.[^.]+$)", "", path))
+    for old in glob.glob(f"{root}.gen-*{ext}"):
+        match = re.search(r"\.gen-(\d+)", old)
+        if match and int(match.group(1)) < keep_from:
+            os.remove(old)
+
+
+def fine_tune_and_publish(model_path, samples, input_dim, encoding_dim, steps=200, lr=1e-4,
+                          batch_size=256, threshold_policy="max", seed=0):
+    """
+    Étape d'apprentissage en ligne, exécutée dans un processus séparé.
+    Repart des poids et du scaler publiés (warm start), ajuste le scaler aux nouveaux signaux,
+    affine l'autoencodeur, recalibre le seuil puis publie une nouvelle génération d'artefacts.
+    Le manifeste est écrit en dernier : c'est le point de bascule atomique pour les serveurs.
+    """
+    import joblib
+    import torch
+    from torch.utils.data import DataLoader, TensorDataset
+
+    from advanced_detector import AdvancedAnomalyDetector
+    from hive_kernel import ScoringKernel
+    from model_manifest import load_model_manifest, resolve_artifact_path, save_model_manifest
+    from training_engine import set_learning_rate
+
+    manifest = load_model_manifest(model_path)
+    if manifest is None:
+        raise FileNotFoundError(f"Aucun manifeste pour {model_path} : lancer d'abord run_production_cycle().")
+    current_model = resolve_artifact_path(model_path, manifest["model_path"])
+    current_scaler = resolve_artifact_path(model_path, manifest["scaler_path"])
+    current_kernel = resolve_artifact_path(model_path, manifest["kernel_path"])
+    generation = manifest.get("generation", 0) + 1
+
+    torch.manual_seed(seed)
+    scaler = joblib.load(current_scaler)
+    scaler.partial_fit(samples)
+    detector = AdvancedAnomalyDetector(input_dim, encoding_dim, threshold_policy=threshold_policy)
+    detector.model.load_state_dict(torch.load(current_model, map_location=detector.device))
+    set_learning_rate(detector, lr)
+    scaled = torch.from_numpy(scaler.transform(samples).astype(np.float32))
+    loader = DataLoader(TensorDataset(scaled), batch_size=batch_size, shuffle=True)
+    detector.train(loader, epochs=max(1, math.ceil(steps / len(loader))))
+
+    new_model = _generation_path(current_model, generation)
+    new_scaler = _generation_path(current_scaler, generation)
+    new_kernel = _generation_path(current_kernel, generation)
+    torch.save(detector.model.state_dict(), new_model)
+    joblib.dump(scaler, new_scaler)
+    ScoringKernel.from_artifacts(scaler, detector.model).save(new_kernel)
+    save_model_manifest(
+        model_path,
+        threshold=detector.threshold,
+        thresholds=detector.thresholds,
+        threshold_policy=threshold_policy,
+        calibration_samples=detector.calibration_samples,
+        input_dim=input_dim,
+        encoding_dim=encoding_dim,
+        generation=generation,
+        model_file=new_model,
+        scaler_path=os.path.basename(new_scaler),
+        kernel_path=os.path.basename(new_kernel)
+    )
+    for path in (current_model, current_scaler, current_kernel):
+        _remove_old_generations(path, keep_from=generation - 1)
+    return generation
+
+
+class OnlineLearner:
+    """
+    Apprentissage en ligne d'ASTRA HIVE à partir du trafic réel.
+    Les signaux classés normaux alimentent un tampon de rejeu ; une dérive de l'erreur
+    de reconstruction ou l'échéance périodique déclenche un affinage en arrière-plan,
+    dont le résultat est échangé à chaud dans le registre des artefacts.
+    """
+    def __init__(self, registry, capacity=100_000, min_samples=1_000, retrain_interval_s=3600,
+                 steps=200, lr=1e-4, batch_size=256, drift_delta=0.1, drift_threshold=50.0,
+                 lock_path="astra_online_learning.lock"):
+        self.registry = registry
+        self.buffer = ReplayBuffer(capacity, registry.input_dim)
+        self.min_samples = min_samples
+        self.retrain_interval_s = retrain_interval_s
+        self.steps = steps
+        self.lr = lr
+        self.batch_size = batch_size
+        self.lock_path = lock_path
+        self.drift = PageHinkleyDriftDetector(1.0, drift_delta, drift_threshold)
+        self._drift_generation = None
+        # Processus lancé en 'spawn' : un fork d'un serveur multi-threadé pourrait hériter de verrous tenus
+        self._executor = ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn"))
+        self._job = None
+        self._lock_file = None
+        self._last_retrain = time.monotonic()
+        self._failed = False
+        # Réentrant : le callback de fin peut s'exécuter immédiatement dans le thread qui soumet
+        self._state_lock = threading.RLock()
+        self.stats = {"observed": 0, "buffered": 0, "retrains": 0, "drift_alarms": 0, "last_error": None}
+
+    def observe(self, X, errors, threshold=None):
+        """
+        Enregistre un lot scoré. Seuls les signaux sous le seuil (classés normaux) sont
+        conservés pour le réentraînement ; le détecteur de dérive suit toutes les erreurs,
+        une dérive poussant les signaux au-delà du seuil devant justement être vue.
+        :param threshold: Seuil de la génération qui a produit errors (celui du registre par défaut).
+        """
+        if not self.registry.is_ready():
+            return
+        errors = np.asarray(errors)
+        normal = errors <= (self.registry.threshold if threshold is None else threshold)
+        with self._state_lock:
+            self._sync_reference()
+            self.buffer.add_batch(np.asarray(X)[normal])
+            self.stats["observed"] += errors.shape[0]
+            self.stats["buffered"] = self.buffer.size
+            if not self.drift.drift and self.drift.update(errors):
+                self.stats["drift_alarms"] += 1
+                print("⚠️ Dérive détectée sur l'erreur de reconstruction HIVE.")
+        self.maybe_retrain()
+
+    def _sync_reference(self):
+        # Nouvelle génération publiée : la référence de dérive devient sa moyenne de calibration
+        if self._drift_generation != self.registry.generation:
+            manifest = self.registry.manifest or {}
+            self.drift.reset(manifest.get("thresholds", {}).get("mean", self.registry.threshold))
+            self._drift_generation = self.registry.generation
+            self._failed = False
+
+    def maybe_retrain(self):
+        """
+        Lance un affinage si une dérive ou l'échéance périodique l'exige (un seul à la fois).
+        Après un échec, seule l'échéance périodique relance un affinage : la dérive, toujours
+        signalée, ne doit pas enchaîner les tentatives.
+        """
+        with self._state_lock:
+            if self._job is not None or self.buffer.size < self.min_samples:
+                return False
+            due = time.monotonic() - self._last_retrain >= self.retrain_interval_s
+            if not ((self.drift.drift and not self._failed) or due) or not self._acquire_lock():
+                return False
+            self._last_retrain = time.monotonic()
+            self._job = self._executor.submit(
+                fine_tune_and_publish,
+                self.registry.model_path,
+                self.buffer.snapshot(),
+                self.registry.input_dim,
+                self.registry.encoding_dim,
+                self.steps,
+                self.lr,
+                self.batch_size,
+                (self.registry.manifest or {}).get("threshold_policy", "max")
+            )
+            self._job.add_done_callback(self._on_retrained)
+            print(f"🔁 Affinage en ligne lancé sur {self.buffer.size} signaux.")
+            return True
+
+    def _acquire_lock(self):
+        # Plusieurs workers peuvent héberger un OnlineLearner : un seul affine à la fois
+        if fcntl is None:
+            return True
+        lock_file = open(self.lock_path, "w")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self._lock_file = lock_file
+        return True
+
+    def _release_lock(self):
+        if self._lock_file is not None:
+            fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+            self._lock_file.close()
+            self._lock_file = None
+
+    def _on_retrained(self, job):
+        # Callback du thread de l'exécuteur : l'état partagé avec observe() change sous verrou
+        try:
+            generation, error = job.result(), None
+        except Exception as e:
+            generation, error = None, e
+        with self._state_lock:
+            self._failed = error is not None
+            if error is None:
+                self.stats["retrains"] += 1
+                self.stats["last_error"] = None
+            else:
+                self.stats["last_error"] = str(error)
+            self._release_lock()
+            self._job = None
+        if error is not None:
+            print(f"❌ Échec de l'affinage en ligne : {error}")
+            return
+        print(f"✅ Génération {generation} publiée par l'apprentissage en ligne.")
+        # Rechargement hors verrou : observe() n'attend pas la lecture des nouveaux artefacts
+        self.registry.reload_if_changed()
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
@@ -0,0 +1,181 @@
+# pqc_backend.py
+import os
+
+# Ordre de préférence : liboqs (ML-KEM / ML-DSA normalisés), pq_crystals, puis le simulateur
+BACKEND_ORDER = ("oqs", "pq_crystals", "sim")
+# Noms liboqs, du plus récent (FIPS 203/204) aux anciens noms des versions < 0.10
+OQS_KEM_NAMES = ("ML-KEM-1024", "Kyber1024")
+OQS_SIG_NAMES = ("ML-DSA-87", "Dilithium5")
+
+
+class OQSKEM:
+    """Adaptateur liboqs exposant l'interface Kyber1024 du projet : keypair(), enc(pk), dec(ct, sk)."""
+    def __init__(self, oqs, alg):
+        self.oqs = oqs
+        self.alg = alg
+
+    def keypair(self):
+        with self.oqs.KeyEncapsulation(self.alg) as kem:
+            pk = kem.generate_keypair()
+            return pk, kem.export_secret_key()
+
+    def enc(self, pk):
+        with self.oqs.KeyEncapsulation(self.alg) as kem:
+            return kem.encap_secret(bytes(pk))
+
+    def dec(self, ciphertext, sk):
+        with self.oqs.KeyEncapsulation(self.alg, secret_key=bytes(sk)) as kem:
+            return kem.decap_secret(ciphertext)
+
+    def __reduce__(self):
+        # Picklable pour les pools de processus : le module oqs est réimporté dans le worker
+        return _oqs_kem, (self.alg,)
+
+
+class OQSSignature:
+    """Adaptateur liboqs exposant l'interface Dilithium5 du projet : keypair(), sign(sk, msg), verify(pk, msg, sig)."""
+    def __init__(self, oqs, alg):
+        self.oqs = oqs
+        self.alg = alg
+
+    def keypair(self):
+        with self.oqs.Signature(self.alg) as sig:
+            pk = sig.generate_keypair()
+            return pk, sig.export_secret_key()
+
+    def sign(self, sk, msg):
+        with self.oqs.Signature(self.alg, secret_key=bytes(sk)) as sig:
+            return sig.sign(msg)
+
+    def verify(self, pk, msg, signature):
+        with self.oqs.Signature(self.alg) as sig:
+            return sig.verify(msg, signature, pk)
+
+    def __reduce__(self):
+        return _oqs_signature, (self.alg,)
+
+
+def _oqs_kem(alg):
+    import oqs
+    return OQSKEM(oqs, alg)
+
+
+def _oqs_signature(alg):
+    import oqs
+    return OQSSignature(oqs, alg)
+
+
+class PQCBackend:
+    def __init__(self, name, kem, signature, kem_name, signature_name, simulated=False):
+        self.name = name
+        self.kem = kem
+        self.signature = signature
+        self.kem_name = kem_name
+        self.signature_name = signature_name
+        self.simulated = simulated
+
+    def __repr__(self):
+        return f"PQCBackend({self.name}: {self.kem_name} / {self.signature_name})"
+
+
+def _load_oqs():
+    import oqs
+    kems = set(oqs.get_enabled_kem_mechanisms())
+    sigs = set(oqs.get_enabled_sig_mechanisms())
+    kem_name = next((n for n in OQS_KEM_NAMES if n in kems), None)
+    sig_name = next((n for n in OQS_SIG_NAMES if n in sigs), None)
+    if kem_name is None or sig_name is None:
+        raise ImportError("liboqs compilé sans ML-KEM-1024 / ML-DSA-87.")
+    return PQCBackend("oqs", OQSKEM(oqs, kem_name), OQSSignature(oqs, sig_name), kem_name, sig_name)
+
+
+def _load_pq_crystals():
+    from pq_crystals.dilithium import Dilithium5
+    from pq_crystals.kyber import Kyber1024
+    return PQCBackend("pq_crystals", Kyber1024, Dilithium5, "Kyber1024", "Dilithium5")
+
+
+def _load_sim():
+    from pqc_sim import Dilithium5, Kyber1024
+    return PQCBackend("sim", Kyber1024, Dilithium5, "Kyber1024 (simulé)", "Dilithium5 (simulé)", simulated=True)
+
+
+_LOADERS = {"oqs": _load_oqs, "pq_crystals": _load_pq_crystals, "sim": _load_sim}
+
+
+def load_backend(name=None):
+    """
+    Charge le backend demandé (ou ASTRA_PQC_BACKEND), sinon le premier disponible de BACKEND_ORDER.
+    Un backend demandé explicitement mais absent lève ImportError.
+    """
+    name = name or os.environ.get("ASTRA_PQC_BACKEND")
+    if name:
+        if name not in _LOADERS:
+            raise ValueError(f"Backend PQC inconnu : {name} (disponibles : {', '.join(BACKEND_ORDER)})")
+        return _LOADERS[name]()
+    for candidate in BACKEND_ORDER:
+        try:
+            return _LOADERS[candidate]()
+        except (ImportError, AttributeError, RuntimeError):
+            continue
+    raise ImportError("Aucun backend PQC disponible.")
+
+
+def available_backends():
+    backends = []
+    for name in BACKEND_ORDER:
+        try:
+            backends.append(_LOADERS[name]())
+        except (ImportError, AttributeError, RuntimeError):
+            pass
+    return backends
+
+
+BACKEND = load_backend()
+Kyber1024 = BACKEND.kem
+Dilithium5 = BACKEND.signature
+PQC_SIMULATED = BACKEND.simulated
+
+
+def _sizes(backend):
+    pk, sk = backend.kem.keypair()
+    ciphertext, secret = backend.kem.enc(pk)
+    signing_pk, signing_sk = backend.signature.keypair()
+    signature = backend.signature.sign(signing_sk, os.urandom(32))
+    return {"kem_pk": len(pk), "kem_sk": len(sk), "ciphertext": len(ciphertext), "shared_secret": len(secret),
+            "sig_pk": len(signing_pk), "sig_sk": len(signing_sk), "signature": len(signature)}
+
+
+def run_pqc_benchmark(n_ops=500):
+    """
+    Débit et latences de keygen / encaps / decaps / sign / verify, et tailles des objets (octets),
+    pour chaque backend disponible : les chiffres simulés n'ont aucune valeur de dimensionnement.
+    """
+    from astra_bench import report, time_calls
+
+    results = {}
+    message = os.urandom(32)
+    for backend in available_backends():
+        print(f"\n--- Backend PQC {backend!r}{' : SIMULATION' if backend.simulated else ''} ---")
+        kem, sig = backend.kem, backend.signature
+        pk, sk = kem.keypair()
+        ciphertext, _ = kem.enc(pk)
+        signing_pk, signing_sk = sig.keypair()
+        signature = sig.sign(signing_sk, message)
+        runs = [
+            ("kem keygen", kem.keypair, ()),
+            ("kem encaps", kem.enc, (pk,)),
+            ("kem decaps", kem.dec, (ciphertext, sk)),
+            ("sig keygen", sig.keypair, ()),
+            ("sig sign", sig.sign, (signing_sk, message)),
+            ("sig verify", sig.verify, (signing_pk, message, signature)),
+        ]
+        results[backend.name] = {"ops": [report(f"{backend.name} {label}", n_ops, *time_calls(fn, n_ops, *args))
+                                         for label, fn, args in runs],
+                                 "sizes": _sizes(backend)}
+        print(f"Tailles (octets) : {results[backend.name]['sizes']}")
+    return results
+
+
+if __name__ == "__main__":
+    run_pqc_benchmark()
@@ -1,8 +1,20 @@
 import os
 import hashlib
+import threading
+from collections import OrderedDict
 
-# Registre temporaire pour la correspondance pk/sk (simulation)
-DILITHIUM_SK_REGISTRY = {}
+# Registre pk -> sk de la simulation, borné en LRU : au-delà de REGISTRY_MAX_KEYS, les clés
+# les moins récemment utilisées sont oubliées et leurs signatures ne vérifient plus.
+# La borne doit donc couvrir toutes les clés en service (au moins la taille de la flotte) :
+# une clé évincée est signalée par verify_status() comme UNKNOWN_KEY, pas comme une signature fausse
+REGISTRY_MAX_KEYS = int(os.environ.get("ASTRA_PQC_SIM_MAX_KEYS", "100000"))
+DILITHIUM_SK_REGISTRY = OrderedDict()
+REGISTRY_STATS = {"evictions": 0, "unknown_key": 0, "bad_signature": 0}
+_REGISTRY_LOCK = threading.Lock()
+
+# Motifs d'échec de verify_status()
+UNKNOWN_KEY = "unknown_key"
+BAD_SIGNATURE = "bad_signature"
 
 # Compteur pour s'assurer que chaque clé publique est unique
 KEY_COUNTER = 0
@@ -34,7 +46,14 @@ class Dilithium5:
         # Ajouter un compteur pour garantir l'unicité
         pk = hashlib.sha256(sk + str(KEY_COUNTER).encode()).digest()
         KEY_COUNTER += 1
-        DILITHIUM_SK_REGISTRY[pk] = sk
+        with _REGISTRY_LOCK:
+            DILITHIUM_SK_REGISTRY[pk] = sk
+            while len(DILITHIUM_SK_REGISTRY) > REGISTRY_MAX_KEYS:
+                DILITHIUM_SK_REGISTRY.popitem(last=False)
+                REGISTRY_STATS["evictions"] += 1
+                if REGISTRY_STATS["evictions"] == 1:
+                    print(f"⚠️ pqc_sim : registre plein ({REGISTRY_MAX_KEYS} clés), les plus anciennes sont oubliées "
+                          "et ne vérifient plus (augmenter ASTRA_PQC_SIM_MAX_KEYS).")
         return pk, sk
     @staticmethod
     def sign(sk, msg):
@@ -45,13 +64,31 @@ class Dilithium5:
         Vérifie une signature avec une logique stricte.
         La clé publique doit correspondre à la clé privée utilisée pour signer.
         """
+        return Dilithium5.verify_status(pk, msg, sig) is None
+
+    @staticmethod
+    def verify_status(pk, msg, sig):
+        """
+        None si la signature est valide, sinon le motif de l'échec : UNKNOWN_KEY (clé absente
+        du registre, jamais générée ou évincée) ou BAD_SIGNATURE.
+        """
         # Vérifier que la clé publique existe dans le registre
-        sk = DILITHIUM_SK_REGISTRY.get(pk)
-        if sk is None:
-            return False
+        with _REGISTRY_LOCK:
+            sk = DILITHIUM_SK_REGISTRY.get(pk)
+            if sk is None:
+                REGISTRY_STATS[UNKNOWN_KEY] += 1
+                return UNKNOWN_KEY
+            DILITHIUM_SK_REGISTRY.move_to_end(pk)
         
         # Calculer la signature attendue avec la clé privée correspondante
         expected_sig = hashlib.sha256(sk + msg).digest()
         
         # Vérifier que les signatures correspondent exactement
-        return sig == expected_sig 
\ No newline at end of file
+        if sig != expected_sig:
+            REGISTRY_STATS[BAD_SIGNATURE] += 1
+            return BAD_SIGNATURE
+        return None
+
+    @staticmethod
+    def registry_report():
+        return {**REGISTRY_STATS, "size": len(DILITHIUM_SK_REGISTRY), "max_keys": REGISTRY_MAX_KEYS} 
\ No newline at end of file
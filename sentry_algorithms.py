@@ -0,0 +1,138 @@
+# sentry_algorithms.py
+from abc import ABC, abstractmethod
+
+from cryptography.hazmat.backends import default_backend
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import ec, ed25519, padding, rsa
+
+# Paramètres construits une seule fois (objets immuables, partageables entre threads)
+PSS_PADDING = padding.PSS(
+    mgf=padding.MGF1(hashes.SHA256()),
+    salt_length=padding.PSS.MAX_LENGTH
+)
+SIGNATURE_HASH = hashes.SHA256()
+ECDSA_SHA256 = ec.ECDSA(hashes.SHA256())
+
+
+class SignatureAlgorithm(ABC):
+    """
+    Algorithme de signature de SENTRY : génération, signature et vérification.
+    verify() lève cryptography.exceptions.InvalidSignature si la signature est invalide.
+    Les clés sont sérialisées en PEM (PKCS8 / SubjectPublicKeyInfo), quel que soit l'algorithme.
+    """
+    name = None
+
+    @abstractmethod
+    def generate(self):
+        """Nouvelle clé privée."""
+
+    @abstractmethod
+    def sign(self, private_key, data):
+        """Signature de data."""
+
+    @abstractmethod
+    def verify(self, public_key, signature, data):
+        """Ne retourne rien si la signature est valide, lève InvalidSignature sinon."""
+
+    @staticmethod
+    def private_pem(private_key):
+        return private_key.private_bytes(
+            encoding=serialization.Encoding.PEM,
+            format=serialization.PrivateFormat.PKCS8,
+            encryption_algorithm=serialization.NoEncryption()
+        ).decode('utf-8')
+
+    @staticmethod
+    def public_pem(public_key):
+        return public_key.public_bytes(
+            encoding=serialization.Encoding.PEM,
+            format=serialization.PublicFormat.SubjectPublicKeyInfo
+        ).decode('utf-8')
+
+
+class RSAPSSAlgorithm(SignatureAlgorithm):
+    """RSA-PSS / SHA-256, sel de longueur maximale : l'algorithme historique des commandes critiques."""
+    def __init__(self, key_size=2048):
+        self.key_size = key_size
+        self.name = f"rsa-pss-{key_size}"
+
+    def generate(self):
+        return rsa.generate_private_key(public_exponent=65537, key_size=self.key_size, backend=default_backend())
+
+    def sign(self, private_key, data):
+        return private_key.sign(data, PSS_PADDING, SIGNATURE_HASH)
+
+    def verify(self, public_key, signature, data):
+        public_key.verify(signature, data, PSS_PADDING, SIGNATURE_HASH)
+
+
+class Ed25519Algorithm(SignatureAlgorithm):
+    """Ed25519 : génération et signature en quelques dizaines de µs, signatures de 64 octets."""
+    name = "ed25519"
+
+    def generate(self):
+        return ed25519.Ed25519PrivateKey.generate()
+
+    def sign(self, private_key, data):
+        return private_key.sign(data)
+
+    def verify(self, public_key, signature, data):
+        public_key.verify(signature, data)
+
+
+class ECDSAP256Algorithm(SignatureAlgorithm):
+    """ECDSA sur P-256 / SHA-256 (signatures DER)."""
+    name = "ecdsa-p256"
+
+    def generate(self):
+        return ec.generate_private_key(ec.SECP256R1(), default_backend())
+
+    def sign(self, private_key, data):
+        return private_key.sign(data, ECDSA_SHA256)
+
+    def verify(self, public_key, signature, data):
+        public_key.verify(signature, data, ECDSA_SHA256)
+
+
+ALGORITHMS = {alg.name: alg for alg in (RSAPSSAlgorithm(2048), RSAPSSAlgorithm(3072), Ed25519Algorithm(),
+                                        ECDSAP256Algorithm())}
+# Algorithme des clés créées sans précision, et des clés enregistrées avant l'ajout du champ "algorithm"
+DEFAULT_ALGORITHM = "rsa-pss-2048"
+
+
+def get_algorithm(name=None):
+    """Retourne l'algorithme enregistré sous ce nom (DEFAULT_ALGORITHM si None)."""
+    try:
+        return ALGORITHMS[name or DEFAULT_ALGORITHM]
+    except KeyError:
+        raise ValueError(f"Algorithme de signature inconnu : {name} (disponibles : {', '.join(ALGORITHMS)})")
+
+
+def run_signature_benchmark(n_keys=20, n_ops=2000, message_size=128):
+    """
+    Mesure, pour chaque algorithme, le débit et les percentiles de latence de la génération
+    de clés, de la signature et de la vérification sur la machine courante.
+    """
+    import os
+
+    from astra_bench import report, time_calls
+
+    message = os.urandom(message_size)
+    results = []
+    print(f"\n--- Benchmark des signatures SENTRY ({n_ops} opérations, messages de {message_size} octets) ---")
+    for name, alg in ALGORITHMS.items():
+        keygen_runs = max(1, n_keys // 4) if name.startswith("rsa") else n_keys
+        seconds, latencies = time_calls(alg.generate, keygen_runs)
+        results.append(report(f"{name} keygen", keygen_runs, seconds, latencies))
+        private_key = alg.generate()
+        public_key = private_key.public_key()
+        seconds, latencies = time_calls(alg.sign, n_ops, private_key, message)
+        results.append(report(f"{name} sign", n_ops, seconds, latencies))
+        signature = alg.sign(private_key, message)
+        seconds, latencies = time_calls(alg.verify, n_ops, public_key, signature, message)
+        results.append(report(f"{name} verify", n_ops, seconds, latencies))
+    return results
+
+
+if __name__ == "__main__":
+    run_signature_benchmark()
@@ -1,73 +1,154 @@
 # sentry_hsm_prod.py
+import ctypes
+import ctypes.util
 import hashlib
 import hmac
 import os
-import json
-from cryptography.hazmat.primitives import hashes, serialization
-from cryptography.hazmat.primitives.asymmetric import rsa, padding
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from cryptography.hazmat.primitives import serialization
 from cryptography.hazmat.backends import default_backend
 
+from hsm_keystore import HSMKeyStore
+from merkle_batch import merkle_proofs, merkle_tree, root_signature_message, verify_merkle_proof
+# PSS_PADDING et SIGNATURE_HASH restent importables depuis ce module
+from sentry_algorithms import DEFAULT_ALGORITHM, PSS_PADDING, SIGNATURE_HASH, SignatureAlgorithm, get_algorithm
+
 # --- Configuration de la Simulation HSM ---
 # Note: Cette simulation utilise cryptography pour simuler un HSM
 # En production, on utiliserait python-pkcs11 avec un vrai HSM (Thales, Utimaco, etc.)
-HSM_STORAGE_FILE = "astra_hsm_simulation.json"
+HSM_STORAGE_FILE = "astra_hsm_simulation.json" # Ancien format, migré automatiquement vers HSM_STORE_DIR
+HSM_STORE_DIR = "astra_hsm_store" # Journal append-only des clés (voir hsm_keystore.py)
+
+# mlockall(2) : MCL_CURRENT | MCL_FUTURE
+_MCL_CURRENT = 1
+_MCL_FUTURE = 2
+
+
+def lock_process_memory():
+    """
+    Verrouille les pages du processus en mémoire (mlockall) : les clés déchiffrées
+    gardées dans le cache ne peuvent pas être écrites dans le swap.
+    Retourne False si la plateforme ou les limites (RLIMIT_MEMLOCK) ne le permettent pas.
+    """
+    libc_name = ctypes.util.find_library("c")
+    if not libc_name:
+        return False
+    libc = ctypes.CDLL(libc_name, use_errno=True)
+    if not hasattr(libc, "mlockall"):
+        return False
+    return libc.mlockall(_MCL_CURRENT | _MCL_FUTURE) == 0
+
 
 class SentryHSMProduction:
     """
     Simule une interaction avec un HSM pour la signature de commandes critiques,
     conformément aux exigences de production d'Astra.
     """
-    def __init__(self):
+    def __init__(self, lock_memory=False, store_dir=HSM_STORE_DIR):
+        """
+        :param lock_memory: Verrouille la mémoire du processus (mlockall) pour protéger les clés en cache.
+        :param store_dir: Répertoire du journal des clés.
+        """
+        self.keystore = HSMKeyStore(store_dir, legacy_file=HSM_STORAGE_FILE)
         self.hsm_data = self._load_hsm_data()
+        # Cache des clés désérialisées par label : (clé privée, clé publique, algorithme)
+        self._key_cache = {}
+        self._key_lock = threading.Lock()
+        self._executor = None
+        self.memory_locked = lock_process_memory() if lock_memory else False
+        if lock_memory and not self.memory_locked:
+            print(f"⚠️ Verrouillage mémoire impossible (errno {ctypes.get_errno()}) : les clés en cache restent swappables.")
         print("Module SENTRY-HSM initialisé (simulation).")
 
     def _load_hsm_data(self):
-        """Charge les données du HSM simulé depuis un fichier sécurisé."""
-        if os.path.exists(HSM_STORAGE_FILE):
-            try:
-                with open(HSM_STORAGE_FILE, 'r') as f:
-                    return json.load(f)
-            except:
-                return {"keys": {}, "sessions": {}}
-        return {"keys": {}, "sessions": {}}
+        """
+        Expose le magasin de clés sous la forme historique {"keys": {...}, "sessions": {...}}.
+        "keys" est une vue sur le journal : seul l'index est en mémoire, les valeurs sont lues à la demande.
+        """
+        return {"keys": self.keystore.keys_mapping(), "sessions": {}}
 
     def _save_hsm_data(self):
-        """Sauvegarde les données du HSM simulé de manière sécurisée."""
-        with open(HSM_STORAGE_FILE, 'w') as f:
-            json.dump(self.hsm_data, f)
+        """Chaque écriture est déjà ajoutée au journal avec fsync : compacte seulement si nécessaire."""
+        if self.keystore.garbage_ratio() > 0.5 and len(self.keystore) > 100:
+            self.keystore.compact()
 
-    def generate_key_pair(self, label="Operator-01-Key"):
-        """Génère une paire de clés RSA directement dans le HSM simulé."""
+    def _key_handles(self, key_label):
+        """Clés désérialisées d'un label, parsées au premier usage puis servies depuis le cache."""
+        handles = self._key_cache.get(key_label)
+        if handles is not None:
+            return handles
+        with self._key_lock:
+            handles = self._key_cache.get(key_label)
+            if handles is None:
+                entry = self.hsm_data["keys"][key_label]
+                private_key = serialization.load_pem_private_key(
+                    entry["private_key"].encode('utf-8'),
+                    password=None,
+                    backend=default_backend()
+                )
+                public_key = serialization.load_pem_public_key(
+                    entry["public_key"].encode('utf-8'),
+                    backend=default_backend()
+                )
+                # Clés antérieures au champ "algorithm" : RSA-PSS 2048, l'algorithme historique
+                handles = (private_key, public_key, get_algorithm(entry.get("algorithm")))
+                self._key_cache[key_label] = handles
+            return handles
+
+    def invalidate_key_cache(self, key_label=None):
+        """Retire une clé (ou toutes) du cache ; elle sera relue depuis le stockage au prochain usage."""
+        with self._key_lock:
+            if key_label is None:
+                self._key_cache.clear()
+            else:
+                self._key_cache.pop(key_label, None)
+
+    def generate_key_pair(self, label="Operator-01-Key", algorithm=DEFAULT_ALGORITHM):
+        """
+        Génère une paire de clés directement dans le HSM simulé.
+        :param algorithm: 'rsa-pss-2048' (commandes critiques), 'rsa-pss-3072', 'ed25519' ou 'ecdsa-p256'
+                          (voir sentry_algorithms.ALGORITHMS). L'algorithme est enregistré avec la clé.
+        """
         if label in self.hsm_data["keys"]:
             print(f"La clé '{label}' existe déjà dans le HSM.")
             return
 
-        print(f"Génération d'une nouvelle paire de clés RSA '{label}' dans le HSM...")
-        
-        # Génération de la paire de clés RSA
-        private_key = rsa.generate_private_key(
-            public_exponent=65537,
-            key_size=2048,
-            backend=default_backend()
-        )
+        print(f"Génération d'une nouvelle paire de clés {algorithm} '{label}' dans le HSM...")
+        self._store_new_key_pair(label, get_algorithm(algorithm))
+        print("✅ Paire de clés générée et stockée de manière sécurisée dans le HSM.")
+
+    def rotate_key(self, label="Operator-01-Key", algorithm=None):
+        """
+        Remplace la paire de clés d'un label ; les signatures de l'ancienne clé ne sont plus acceptées.
+        :param algorithm: Nouvel algorithme, ou None pour conserver celui de la clé actuelle.
+        """
+        if algorithm is None and label in self.hsm_data["keys"]:
+            algorithm = self.hsm_data["keys"][label].get("algorithm")
+        print(f"Rotation de la paire de clés '{label}' dans le HSM...")
+        self._store_new_key_pair(label, get_algorithm(algorithm))
+        print("✅ Rotation effectuée, l'ancienne clé est révoquée.")
+
+    def key_algorithm(self, key_label="Operator-01-Key"):
+        """Nom de l'algorithme associé à une clé."""
+        return self._key_handles(key_label)[2].name
+
+    def _store_new_key_pair(self, label, algorithm):
+        private_key = algorithm.generate()
         public_key = private_key.public_key()
 
         # Stockage sécurisé dans le HSM simulé
         self.hsm_data["keys"][label] = {
-            "private_key": private_key.private_bytes(
-                encoding=serialization.Encoding.PEM,
-                format=serialization.PrivateFormat.PKCS8,
-                encryption_algorithm=serialization.NoEncryption()
-            ).decode('utf-8'),
-            "public_key": public_key.public_bytes(
-                encoding=serialization.Encoding.PEM,
-                format=serialization.PublicFormat.SubjectPublicKeyInfo
-            ).decode('utf-8')
+            "algorithm": algorithm.name,
+            "private_key": SignatureAlgorithm.private_pem(private_key),
+            "public_key": SignatureAlgorithm.public_pem(public_key)
         }
         
         self._save_hsm_data()
-        print("✅ Paire de clés générée et stockée de manière sécurisée dans le HSM.")
-    
+        # La nouvelle clé remplace immédiatement toute entrée en cache (rotation)
+        with self._key_lock:
+            self._key_cache[label] = (private_key, public_key, algorithm)
+
     def sign_command(self, command, key_label="Operator-01-Key"):
         """Signe une commande en utilisant la clé privée stockée dans le HSM."""
         if key_label not in self.hsm_data["keys"]:
@@ -75,26 +156,14 @@ class SentryHSMProduction:
             return None
 
         try:
-            # Chargement de la clé privée depuis le HSM
-            private_key_data = self.hsm_data["keys"][key_label]["private_key"]
-            private_key = serialization.load_pem_private_key(
-                private_key_data.encode('utf-8'),
-                password=None,
-                backend=default_backend()
-            )
+            # Clé privée servie par le cache : aucun parsing PEM par commande
+            private_key, _, algorithm = self._key_handles(key_label)
 
             print(f"\nSignature de la commande : '{command}'")
             print("🔐 Opération cryptographique exécutée dans le HSM...")
             
             # Signature de la commande (simulation HSM)
-            signature = private_key.sign(
-                command.encode('utf-8'),
-                padding.PSS(
-                    mgf=padding.MGF1(hashes.SHA256()),
-                    salt_length=padding.PSS.MAX_LENGTH
-                ),
-                hashes.SHA256()
-            )
+            signature = algorithm.sign(private_key, command.encode('utf-8'))
             
             print("✅ Commande signée par le HSM.")
             return signature
@@ -109,26 +178,13 @@ class SentryHSMProduction:
             return False
 
         try:
-            # Chargement de la clé publique depuis le HSM
-            public_key_data = self.hsm_data["keys"][key_label]["public_key"]
-            public_key = serialization.load_pem_public_key(
-                public_key_data.encode('utf-8'),
-                backend=default_backend()
-            )
+            _, public_key, algorithm = self._key_handles(key_label)
 
             print(f"Vérification de la signature pour la commande : '{command}'")
             print("🔍 Validation cryptographique dans le HSM...")
 
             # Vérification de la signature
-            public_key.verify(
-                signature,
-                command.encode('utf-8'),
-                padding.PSS(
-                    mgf=padding.MGF1(hashes.SHA256()),
-                    salt_length=padding.PSS.MAX_LENGTH
-                ),
-                hashes.SHA256()
-            )
+            algorithm.verify(public_key, signature, command.encode('utf-8'))
             
             print("✅ Signature valide ! La commande est authentique et intègre.")
             return True
@@ -136,6 +192,74 @@ class SentryHSMProduction:
             print(f"❌ ALERTE SÉCURITÉ : Signature invalide ! ({e})")
             return False
 
+    # --- Traitement par lots des fenêtres d'uplink ---
+    def _pool(self):
+        # OpenSSL relâche le GIL pendant les opérations RSA : les threads s'exécutent en parallèle
+        with self._key_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=os.cpu_count(), thread_name_prefix="sentry-hsm")
+            return self._executor
+
+    def sign_commands(self, commands, key_label="Operator-01-Key", merkle=False):
+        """
+        Signe un lot de commandes ; les signatures sont retournées dans l'ordre des commandes.
+        En mode merkle, une seule opération de clé privée signe la racine de l'arbre des commandes :
+        le résultat est {"root", "count", "root_signature", "proofs"} ; la signature couvre la racine et
+        la taille du lot, et chaque commande se vérifie par sa preuve à sa position.
+        Retourne None si la clé n'existe pas.
+        """
+        if key_label not in self.hsm_data["keys"]:
+            print(f"❌ ERREUR : La clé '{key_label}' n'existe pas dans le HSM.")
+            return None
+        private_key, _, algorithm = self._key_handles(key_label)
+        if merkle:
+            levels = merkle_tree(commands)
+            root = levels[-1][0]
+            print(f"🔐 Signature de la racine de Merkle d'un lot de {len(commands)} commandes...")
+            return {
+                "root": root,
+                "count": len(commands),
+                "root_signature": algorithm.sign(private_key, root_signature_message(root, len(commands))),
+                "proofs": merkle_proofs(levels),
+            }
+        print(f"🔐 Signature d'un lot de {len(commands)} commandes dans le HSM...")
+        return list(self._pool().map(
+            lambda command: algorithm.sign(private_key, command.encode('utf-8')), commands))
+
+    def verify_commands(self, commands, signatures, key_label="Operator-01-Key"):
+        """
+        Vérifie un lot produit par sign_commands (liste de signatures ou lot Merkle).
+        Retourne un booléen par commande, dans l'ordre.
+        """
+        if key_label not in self.hsm_data["keys"]:
+            print(f"❌ ERREUR : La clé '{key_label}' n'existe pas.")
+            return [False] * len(commands)
+        _, public_key, algorithm = self._key_handles(key_label)
+
+        def verify(message, signature):
+            try:
+                algorithm.verify(public_key, signature, message)
+                return True
+            except Exception:
+                return False
+
+        if isinstance(signatures, dict):
+            # Taille attendue = commandes reçues : un lot tronqué ne vérifie pas la signature de racine
+            if not verify(root_signature_message(signatures["root"], len(commands)), signatures["root_signature"]):
+                print("❌ ALERTE SÉCURITÉ : Signature de la racine de Merkle invalide !")
+                return [False] * len(commands)
+            if len(signatures["proofs"]) != len(commands):
+                return [False] * len(commands)
+            results = [verify_merkle_proof(command, proof, signatures["root"], index, len(commands))
+                       for index, (command, proof) in enumerate(zip(commands, signatures["proofs"]))]
+        else:
+            if len(signatures) != len(commands):
+                return [False] * len(commands)
+            results = list(self._pool().map(
+                lambda pair: verify(pair[0].encode('utf-8'), pair[1]), zip(commands, signatures)))
+        print(f"🔍 Lot vérifié : {sum(results)}/{len(commands)} commandes authentiques.")
+        return results
+
 def run_production_scenario():
     print("\n--- SCÉNARIO DE PRODUCTION ASTRA SENTRY : AUTORISATION PAR SIGNATURE HSM ---")
     
@@ -0,0 +1,186 @@
+# telemetry_stream.py
+import glob
+import os
+
+import numpy as np
+import torch
+from torch.utils.data import DataLoader, IterableDataset, get_worker_info
+
+# Colonnes de télémétrie utilisées par ASTRA HIVE, dans l'ordre du modèle
+FEATURE_COLUMNS = ["frequency", "power", "modulation"]
+DEFAULT_CHUNK_ROWS = 65536
+
+
+def expand_sources(sources):
+    """
+    Normalise les sources de télémétrie en une liste triée de fichiers.
+    Accepte un chemin, un motif glob, un répertoire de shards ou une liste de ceux-ci.
+    """
+    if isinstance(sources, (str, os.PathLike)):
+        sources = [sources]
+    paths = []
+    for source in sources:
+        source = os.fspath(source)
+        if os.path.isdir(source):
+            for ext in ("*.npy", "*.parquet", "*.csv"):
+                paths.extend(sorted(glob.glob(os.path.join(source, ext))))
+        elif any(c in source for c in "*?["):
+            paths.extend(sorted(glob.glob(source)))
+        else:
+            paths.append(source)
+    if not paths:
+        raise FileNotFoundError(f"Aucune source de télémétrie trouvée : {sources}")
+    return paths
+
+
+def iter_file_chunks(path, chunk_rows=DEFAULT_CHUNK_ROWS, columns=FEATURE_COLUMNS):
+    """
+    Lit un fichier de télémétrie par blocs de chunk_rows lignes, en tableaux float32 (n, len(columns)).
+    Formats : CSV (pandas par blocs), .npy (mémoire mappée) et Parquet (pyarrow, optionnel).
+    """
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".csv":
+        import pandas as pd
+        for chunk in pd.read_csv(path, usecols=columns, chunksize=chunk_rows):
+            yield chunk[columns].to_numpy(dtype=np.float32)
+    elif ext == ".npy":
+        # Le fichier n'est jamais chargé en entier : seules les pages lues sont paginées en mémoire
+        data = np.load(path, mmap_mode="r")
+        if data.ndim != 2 or data.shape[1] != len(columns):
+            raise ValueError(f"{path} : forme {data.shape} incompatible avec {len(columns)} colonnes.")
+        for start in range(0, data.shape[0], chunk_rows):
+            yield np.asarray(data[start:start + chunk_rows], dtype=np.float32)
+    elif ext == ".parquet":
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("La lecture Parquet nécessite pyarrow (pip install pyarrow).")
+        parquet_file = pq.ParquetFile(path)
+        for batch in parquet_file.iter_batches(batch_size=chunk_rows, columns=columns):
+            yield np.column_stack([batch.column(c).to_numpy(zero_copy_only=False) for c in columns]).astype(np.float32)
+    else:
+        raise ValueError(f"Format de télémétrie non supporté : {path}")
+
+
+def iter_chunks(sources, chunk_rows=DEFAULT_CHUNK_ROWS, columns=FEATURE_COLUMNS):
+    """Enchaîne les blocs de toutes les sources, dans l'ordre."""
+    for path in expand_sources(sources):
+        yield from iter_file_chunks(path, chunk_rows, columns)
+
+
+def fit_minmax_scaler_streaming(sources, chunk_rows=DEFAULT_CHUNK_ROWS, columns=FEATURE_COLUMNS):
+    """
+    Ajuste un MinMaxScaler en une passe avec partial_fit (min/max courants).
+    L'état obtenu (data_min_, data_max_, scale_, min_) est identique à un fit sur l'ensemble complet.
+    """
+    from sklearn.preprocessing import MinMaxScaler
+
+    scaler = MinMaxScaler()
+    n_rows = 0
+    for chunk in iter_chunks(sources, chunk_rows, columns):
+        scaler.partial_fit(chunk)
+        n_rows += chunk.shape[0]
+    if n_rows == 0:
+        raise ValueError("Aucune ligne de télémétrie : impossible d'ajuster le scaler.")
+    print(f"Scaler ajusté en flux sur {n_rows} signaux.")
+    return scaler
+
+
+def convert_to_npy_shards(sources, output_dir, rows_per_shard=1_000_000, columns=FEATURE_COLUMNS):
+    """
+    Convertit de la télémétrie (CSV, Parquet...) en shards .npy float32 mappables en mémoire.
+    Chaque shard est écrit directement sur disque : la mémoire reste bornée par un bloc.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    shard_paths = []
+    shard = None
+    filled = 0
+
+    def flush(rows):
+        path = os.path.join(output_dir, f"telemetry-{len(shard_paths):05d}.npy")
+        out = np.lib.format.open_memmap(path, mode="w+", dtype=np.float32, shape=(rows, len(columns)))
+        out[:] = shard[:rows]
+        out.flush()
+        del out
+        shard_paths.append(path)
+
+    for chunk in iter_chunks(sources, min(rows_per_shard, DEFAULT_CHUNK_ROWS), columns):
+        if shard is None:
+            shard = np.empty((rows_per_shard, len(columns)), dtype=np.float32)
+        start = 0
+        while start < chunk.shape[0]:
+            take = min(rows_per_shard - filled, chunk.shape[0] - start)
+            shard[filled:filled + take] = chunk[start:start + take]
+            filled += take
+            start += take
+            if filled == rows_per_shard:
+                flush(filled)
+                filled = 0
+    if filled:
+        flush(filled)
+    print(f"{len(shard_paths)} shard(s) .npy écrit(s) dans {output_dir}")
+    return shard_paths
+
+
+class TelemetryIterableDataset(IterableDataset):
+    """
+    Dataset itérable de télémétrie normalisée, en mémoire bornée.
+    Produit directement des lots (tenseur,) pour rester compatible avec
+    AdvancedAnomalyDetector.train ; les blocs sont répartis entre les workers du DataLoader
+    et, en entraînement distribué, entre les processus (rank / world_size).
+    """
+    def __init__(self, sources, scaler, batch_size=256, chunk_rows=DEFAULT_CHUNK_ROWS,
+                 shuffle=True, seed=0, columns=FEATURE_COLUMNS, rank=0, world_size=1):
+        super().__init__()
+        self.paths = expand_sources(sources)
+        self.scale = np.asarray(scaler.scale_, dtype=np.float32)
+        self.offset = np.asarray(scaler.min_, dtype=np.float32)
+        self.batch_size = batch_size
+        self.chunk_rows = chunk_rows
+        self.shuffle = shuffle
+        self.seed = seed
+        self.columns = columns
+        self.rank = rank
+        self.world_size = world_size
+        self.epoch = 0
+
+    def set_epoch(self, epoch):
+        """Change la graine du mélange local à chaque époque."""
+        self.epoch = epoch
+
+    def __iter__(self):
+        worker = get_worker_info()
+        worker_id, num_workers = (worker.id, worker.num_workers) if worker is not None else (0, 1)
+        # Un shard par couple (processus, worker) : les lectures sont disjointes
+        shard_id = self.rank * num_workers + worker_id
+        num_shards = self.world_size * num_workers
+        rng = np.random.default_rng((self.seed, self.epoch, shard_id))
+        # Assez de fichiers : chaque shard lit ses propres fichiers ; sinon les blocs
+        # d'un même fichier sont répartis en round-robin entre les shards
+        split_files = len(self.paths) >= num_shards
+        chunk_index = 0
+        for file_index, path in enumerate(self.paths):
+            if split_files and file_index % num_shards != shard_id:
+                continue
+            for chunk in iter_file_chunks(path, self.chunk_rows, self.columns):
+                mine = split_files or chunk_index % num_shards == shard_id
+                chunk_index += 1
+                if not mine:
+                    continue
+                chunk = chunk * self.scale + self.offset
+                if self.shuffle:
+                    # Mélange local au bloc : la mémoire reste bornée par chunk_rows
+                    rng.shuffle(chunk)
+                tensor = torch.from_numpy(chunk)
+                for start in range(0, tensor.shape[0], self.batch_size):
+                    yield (tensor[start:start + self.batch_size],)
+
+
+def make_telemetry_loader(sources, scaler, batch_size=256, chunk_rows=DEFAULT_CHUNK_ROWS,
+                          num_workers=0, shuffle=True, seed=0, rank=0, world_size=1):
+    """Construit le DataLoader en flux (lots déjà formés par le dataset, d'où batch_size=None)."""
+    dataset = TelemetryIterableDataset(sources, scaler, batch_size, chunk_rows, shuffle, seed,
+                                       rank=rank, world_size=world_size)
+    # Workers non persistants : ils sont recréés à chaque époque et voient donc set_epoch()
+    extra = {"prefetch_factor": 2} if num_workers > 0 else {}
+    return DataLoader(dataset, batch_size=None, num_workers=num_workers, **extra)
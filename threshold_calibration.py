@@ -0,0 +1,124 @@
+# threshold_calibration.py
+import math
+
+import numpy as np
+
+# En dessous de ce nombre d'observations, les quantiles sont calculés exactement sur les valeurs
+# conservées : un résumé approché ne peut pas estimer une queue (p99) sur peu d'échantillons
+EXACT_SAMPLE_LIMIT = 500
+# Au-delà, histogramme à intervalles logarithmiques : les erreurs de reconstruction couvrent
+# plusieurs ordres de grandeur, l'erreur relative d'un intervalle reste la même partout (~1 %)
+HISTOGRAM_RANGE = (1e-12, 1e6)
+HISTOGRAM_BINS = 4096
+
+
+class LogHistogramQuantiles:
+    """
+    Résumé de taille fixe d'un flux de valeurs positives, pour l'estimation de quantiles en une passe.
+    Chaque lot est intégré en une opération NumPy (np.bincount) : mémoire O(HISTOGRAM_BINS),
+    quel que soit le nombre d'erreurs observées. Les valeurs hors bornes tombent dans les
+    intervalles extrêmes ; les estimations sont ramenées entre le minimum et le maximum observés.
+    """
+    def __init__(self, value_range=HISTOGRAM_RANGE, bins=HISTOGRAM_BINS):
+        self.low, high = value_range
+        self.log_low = math.log(self.low)
+        self.bins = bins
+        self._scale = bins / (math.log(high) - self.log_low)
+        self.counts = np.zeros(bins, dtype=np.int64)
+        self.n = 0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add_batch(self, values):
+        values = np.asarray(values, dtype=np.float64).ravel()
+        if values.size == 0:
+            return
+        # Zéros et valeurs sous la borne basse comptés dans le premier intervalle
+        index = np.log(np.maximum(values, self.low))
+        index -= self.log_low
+        index *= self._scale
+        index = np.minimum(index, self.bins - 1).astype(np.intp)
+        self.counts += np.bincount(index, minlength=self.bins)
+        self.n += values.size
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+
+    def quantile(self, p):
+        """Quantile p, interpolé dans son intervalle (même convention de rang que np.quantile)."""
+        if self.n == 0:
+            return math.nan
+        rank = p * (self.n - 1)
+        cumulative = np.cumsum(self.counts)
+        b = int(np.searchsorted(cumulative, rank, side="right"))
+        within = (rank - (cumulative[b] - self.counts[b]) + 0.5) / self.counts[b]
+        value = math.exp(self.log_low + (b + within) / self._scale)
+        return min(max(value, self.min), self.max)
+
+
+class StreamingThresholdCalibrator:
+    """
+    Étape de calibration du seuil d'anomalie en flux.
+    Observe les erreurs de reconstruction lot par lot et maintient, en mémoire constante,
+    le maximum, la moyenne et plusieurs quantiles : exacts sur les exact_limit premières
+    erreurs (conservées), puis estimés par un histogramme logarithmique mis à jour par lot.
+    """
+    DEFAULT_QUANTILES = (0.95, 0.99, 0.999)
+
+    def __init__(self, quantiles=DEFAULT_QUANTILES, exact_limit=EXACT_SAMPLE_LIMIT):
+        self.quantiles = tuple(quantiles)
+        for q in self.quantiles:
+            if not 0.0 < q < 1.0:
+                raise ValueError("Le quantile doit être strictement compris entre 0 et 1.")
+        self.exact_limit = exact_limit
+        self._samples = []
+        self.histogram = LogHistogramQuantiles()
+        self.count = 0
+        self.mean = 0.0
+        self.max = -math.inf
+
+    def update(self, errors):
+        """Intègre un lot d'erreurs de reconstruction (tableau NumPy, tenseur ou liste)."""
+        values = np.asarray(errors, dtype=np.float64).ravel()
+        if values.size == 0:
+            return
+        batch_count = values.size
+        total = self.count + batch_count
+        self.mean += (float(values.mean()) - self.mean) * batch_count / total
+        self.count = total
+        self.max = max(self.max, float(values.max()))
+        if self._samples is not None:
+            if total < self.exact_limit:
+                self._samples.append(values.copy())
+                return
+            # Seuil atteint : les valeurs conservées rejoignent l'histogramme
+            for samples in self._samples:
+                self.histogram.add_batch(samples)
+            self._samples = None
+        self.histogram.add_batch(values)
+
+    @staticmethod
+    def policy_name(q):
+        """Nom de politique associé à un quantile, par exemple 0.99 -> 'p99', 0.999 -> 'p99.9'."""
+        return "p" + f"{q * 100:.6g}"
+
+    def thresholds(self):
+        """Retourne tous les seuils candidats : 'max', 'mean' et un 'pXX' par quantile suivi."""
+        result = {"max": self.max, "mean": self.mean}
+        exact = np.concatenate(self._samples) if self._samples else None
+        for q in self.quantiles:
+            if exact is not None:
+                result[self.policy_name(q)] = float(np.quantile(exact, q))
+            elif self._samples is not None:
+                result[self.policy_name(q)] = math.nan
+            else:
+                result[self.policy_name(q)] = self.histogram.quantile(q)
+        return result
+
+    def threshold(self, policy="max"):
+        """Seuil retenu pour une politique donnée ('max' reproduit l'ancien comportement)."""
+        if self.count == 0:
+            raise ValueError("Aucune erreur de reconstruction observée : calibration impossible.")
+        thresholds = self.thresholds()
+        if policy not in thresholds:
+            raise ValueError(f"Politique de seuil inconnue : {policy} (disponibles : {sorted(thresholds)})")
+        return thresholds[policy]
@@ -0,0 +1,132 @@
+# training_engine.py
+import math
+import os
+import tempfile
+
+import torch
+import torch.distributed as dist
+import torch.multiprocessing as mp
+from torch.nn.parallel import DistributedDataParallel
+
+from advanced_detector import AdvancedAnomalyDetector
+from telemetry_stream import make_telemetry_loader
+
+
+def configure_threads(num_threads=None, num_interop_threads=None):
+    """
+    Fixe le nombre de threads intra-op (et inter-op) de PyTorch.
+    Par défaut, tous les cœurs disponibles pour ce processus.
+    """
+    if num_threads is None:
+        num_threads = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count()
+    torch.set_num_threads(num_threads)
+    if num_interop_threads is not None:
+        try:
+            torch.set_num_interop_threads(num_interop_threads)
+        except RuntimeError:
+            # Ne peut être fixé qu'une fois, avant tout travail parallèle
+            pass
+    return num_threads
+
+
+def scale_learning_rate(base_lr, batch_size, base_batch_size, rule="sqrt"):
+    """
+    Adapte le taux d'apprentissage à la taille de lot effective.
+    :param rule: 'linear' (Goyal et al.), 'sqrt' (recommandé avec Adam) ou None.
+    """
+    ratio = batch_size / base_batch_size
+    if rule == "linear":
+        return base_lr * ratio
+    if rule == "sqrt":
+        return base_lr * math.sqrt(ratio)
+    if rule is None:
+        return base_lr
+    raise ValueError(f"Règle de mise à l'échelle inconnue : {rule}")
+
+
+def set_learning_rate(detector, lr):
+    """Applique un taux d'apprentissage à l'optimiseur du détecteur."""
+    for group in detector.optimizer.param_groups:
+        group["lr"] = lr
+
+
+def _distributed_worker(rank, world_size, init_file, options, result_path):
+    dist.init_process_group("gloo", init_method=f"file://{init_file}", rank=rank, world_size=world_size)
+    try:
+        configure_threads(options["threads_per_rank"])
+        torch.manual_seed(options["seed"]) # Même initialisation des poids sur tous les processus
+        detector = AdvancedAnomalyDetector(
+            input_dim=options["input_dim"],
+            encoding_dim=options["encoding_dim"],
+            threshold_policy=options["threshold_policy"]
+        )
+        set_learning_rate(detector, options["lr"])
+        detector.model = DistributedDataParallel(detector.model)
+        loader = make_telemetry_loader(
+            options["sources"], options["scaler"],
+            batch_size=options["batch_size"],
+            chunk_rows=options["chunk_rows"],
+            num_workers=options["num_workers"],
+            seed=options["seed"],
+            rank=rank,
+            world_size=world_size
+        )
+        detector.train(
+            loader,
+            epochs=options["epochs"],
+            accumulation_steps=options["accumulation_steps"],
+            early_stopping_patience=options["early_stopping_patience"],
+            min_delta=options["min_delta"],
+            calibrate=False
+        )
+        if rank == 0:
+            # Calibration du seuil sur l'ensemble des données, par un seul processus
+            detector.model = detector.model.module
+            full_loader = make_telemetry_loader(
+                options["sources"], options["scaler"],
+                batch_size=options["batch_size"],
+                chunk_rows=options["chunk_rows"],
+                shuffle=False
+            )
+            detector._set_threshold(full_loader)
+            torch.save({
+                "state_dict": detector.model.state_dict(),
+                "threshold": detector.threshold,
+                "thresholds": detector.thresholds,
+                "calibration_samples": detector.calibration_samples,
+            }, result_path)
+    finally:
+        dist.destroy_process_group()
+
+
+def train_distributed(sources, scaler, world_size, input_dim, encoding_dim, epochs, batch_size, lr,
+                      chunk_rows=65536, num_workers=0, accumulation_steps=1, early_stopping_patience=None,
+                      min_delta=0.0, threshold_policy="max", seed=0, threads_per_rank=None):
+    """
+    Entraîne l'autoencodeur en data-parallel sur world_size processus CPU (backend gloo).
+    Chaque processus lit un shard disjoint de la télémétrie ; les gradients sont moyennés
+    par DistributedDataParallel. Retourne un AdvancedAnomalyDetector entraîné et calibré.
+    """
+    if threads_per_rank is None:
+        threads_per_rank = max(1, (os.cpu_count() or 1) // world_size)
+    options = {
+        "sources": sources, "scaler": scaler, "input_dim": input_dim, "encoding_dim": encoding_dim,
+        "epochs": epochs, "batch_size": batch_size, "lr": lr, "chunk_rows": chunk_rows,
+        "num_workers": num_workers, "accumulation_steps": accumulation_steps,
+        "early_stopping_patience": early_stopping_patience, "min_delta": min_delta,
+        "threshold_policy": threshold_policy, "seed": seed, "threads_per_rank": threads_per_rank,
+    }
+    print(f"Entraînement distribué : {world_size} processus x {threads_per_rank} threads (gloo).")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        init_file = os.path.join(tmp_dir, "rendezvous")
+        result_path = os.path.join(tmp_dir, "result.pt")
+        mp.spawn(_distributed_worker, args=(world_size, init_file, options, result_path), nprocs=world_size)
+        result = torch.load(result_path)
+
+    detector = AdvancedAnomalyDetector(input_dim, encoding_dim, threshold_policy=threshold_policy)
+    detector.model.load_state_dict(result["state_dict"])
+    detector.threshold = result["threshold"]
+    detector.thresholds = result["thresholds"]
+    detector.calibration_samples = result["calibration_samples"]
+    print(f"Seuil d'anomalie déterminé ({threshold_policy}) : {detector.threshold:.6f}")
+    return detector
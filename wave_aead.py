@@ -0,0 +1,298 @@
+# wave_aead.py
+import copy
+import os
+import struct
+
+from cryptography.exceptions import InvalidTag
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM, ChaCha20Poly1305
+
+from wave_channel_manager import hkdf, hkdf_expand
+
+# En-tête de trame : époque de clé (u32), compteur (u64), longueur du clair (u32).
+# Ses 12 premiers octets servent de nonce, l'en-tête entier de données associées :
+# une trame déplacée, tronquée ou rejouée sur une autre époque échoue à l'authentification.
+FRAME_HEADER = struct.Struct(">IQI")
+NONCE_SIZE = 12
+TAG_SIZE = 16
+CIPHERS = {"chacha20-poly1305": ChaCha20Poly1305, "aes-256-gcm": AESGCM}
+DEFAULT_CIPHER = "chacha20-poly1305"
+# Changement de clé après ce volume chiffré (largement sous les limites des deux AEAD)
+DEFAULT_REKEY_BYTES = 1 << 30
+# Nombre maximal d'époques qu'un récepteur accepte de sauter d'un coup
+MAX_EPOCH_SKIP = 16
+# En-tête de flux : marqueur de version suivi de l'identifiant aléatoire du flux.
+# Chaque flux a ses propres clés : deux émetteurs sur le même secret ne partagent jamais (clé, nonce).
+STREAM_MAGIC = b"AWV1"
+STREAM_ID_SIZE = 16
+STREAM_HEADER_SIZE = len(STREAM_MAGIC) + STREAM_ID_SIZE
+
+
+class WaveFrameError(ValueError):
+    """Trame ou en-tête de flux mal formé, trame rejouée ou appartenant à une époque de clé révolue."""
+
+
+def parse_stream_header(stream_header):
+    """Retourne l'identifiant de flux d'un en-tête produit par WaveFrameSealer.stream_header."""
+    stream_header = bytes(stream_header)
+    if len(stream_header) != STREAM_HEADER_SIZE or not stream_header.startswith(STREAM_MAGIC):
+        raise WaveFrameError("En-tête de flux WAVE invalide.")
+    return stream_header[len(STREAM_MAGIC):]
+
+
+def frame_size(record_len):
+    return FRAME_HEADER.size + record_len + TAG_SIZE
+
+
+class _TrafficKeys:
+    """
+    Clés de trafic d'un sens de communication : l'époque e dérive sa clé AEAD du secret e,
+    le secret e+1 est dérivé du secret e puis le remplace (cliquet HKDF, pas de retour en arrière).
+    """
+    def __init__(self, hybrid_secret, direction, cipher, stream_id):
+        if cipher not in CIPHERS:
+            raise ValueError(f"AEAD inconnu : {cipher} (disponibles : {', '.join(CIPHERS)})")
+        self.cipher_class = CIPHERS[cipher]
+        self.direction = direction
+        self.epoch = 0
+        self._secret = hkdf(hybrid_secret, salt=stream_id, info=b"astra-wave telemetry " + direction)
+        self.aead = self._make_aead()
+
+    def _make_aead(self):
+        return self.cipher_class(hkdf_expand(self._secret, b"astra-wave key " + self.direction))
+
+    def ratchet(self):
+        self._secret = hkdf_expand(self._secret, b"astra-wave rekey")
+        self.epoch += 1
+        self.aead = self._make_aead()
+
+    def advanced(self, epoch):
+        """Copie avancée jusqu'à epoch ; l'original reste utilisable tant que la trame n'est pas authentifiée."""
+        keys = copy.copy(self)
+        while keys.epoch < epoch:
+            keys.ratchet()
+        return keys
+
+
+class WaveFrameSealer:
+    """
+    Chiffrement authentifié du flux de télémétrie WAVE, côté émetteur.
+    Nonces issus d'un compteur par époque ; la clé change après rekey_bytes octets chiffrés.
+    Chaque émetteur tire un identifiant de flux aléatoire qui entre dans la dérivation des clés :
+    un redémarrage ou un second émetteur sur le même secret ne réutilise aucun nonce.
+    stream_header doit être transmis avant les trames ; le récepteur ne peut rien déchiffrer sans lui.
+    seal_batch() écrit un lot de trames dans un tampon préalloué, sans copie par trame
+    quand la bibliothèque fournit encrypt_into() (cryptography >= 47).
+    """
+    def __init__(self, hybrid_secret, direction=b"downlink", cipher=DEFAULT_CIPHER, rekey_bytes=DEFAULT_REKEY_BYTES):
+        self.stream_id = os.urandom(STREAM_ID_SIZE)
+        self.stream_header = STREAM_MAGIC + self.stream_id
+        self.keys = _TrafficKeys(hybrid_secret, direction, cipher, self.stream_id)
+        self.rekey_bytes = rekey_bytes
+        self.counter = 0
+        self.epoch_bytes = 0
+        self._encrypt_into = hasattr(self.keys.aead, "encrypt_into")
+        self.stats = {"frames": 0, "bytes": 0, "rekeys": 0}
+        self._layout_key = None
+        self._layout = None
+
+    def _next_counter(self, record_len):
+        if self.epoch_bytes + record_len > self.rekey_bytes or self.counter == 0xFFFFFFFFFFFFFFFF:
+            self.keys.ratchet()
+            self.counter = 0
+            self.epoch_bytes = 0
+            self.stats["rekeys"] += 1
+        counter = self.counter
+        self.counter += 1
+        self.epoch_bytes += record_len
+        self.stats["frames"] += 1
+        self.stats["bytes"] += record_len
+        return counter
+
+    def seal(self, record):
+        """Chiffre un enregistrement et retourne la trame (en-tête + chiffré + tag)."""
+        counter = self._next_counter(len(record))
+        header = FRAME_HEADER.pack(self.keys.epoch, counter, len(record))
+        return header + self.keys.aead.encrypt(header[:NONCE_SIZE], bytes(record), header)
+
+    def _seal_at(self, view, record, offset):
+        # En-tête écrit en place ; nonce et données associées sont des tranches de la même vue
+        record_len = len(record)
+        counter = self._next_counter(record_len)
+        FRAME_HEADER.pack_into(view, offset, self.keys.epoch, counter, record_len)
+        start = offset + FRAME_HEADER.size
+        end = start + record_len + TAG_SIZE
+        if self._encrypt_into:
+            self.keys.aead.encrypt_into(view[offset:offset + NONCE_SIZE], record, view[offset:start], view[start:end])
+        else:
+            header = bytes(view[offset:start])
+            view[start:end] = self.keys.aead.encrypt(header[:NONCE_SIZE], bytes(record), header)
+        return end
+
+    def seal_into(self, record, out, offset=0):
+        """Écrit la trame de record dans out (bytearray ou memoryview) à offset ; retourne l'offset suivant."""
+        return self._seal_at(memoryview(out), record, offset)
+
+    def _frame_layout(self, out, lengths):
+        # Vues (nonce, en-tête, corps) de chaque trame, construites une fois par tampon et par forme de lot
+        key = (id(out), len(out), lengths)
+        if key != self._layout_key:
+            view = memoryview(out)
+            layout = []
+            offset = 0
+            for record_len in lengths:
+                start = offset + FRAME_HEADER.size
+                end = start + record_len + TAG_SIZE
+                layout.append((offset, view[offset:offset + NONCE_SIZE], view[offset:start], view[start:end]))
+                offset = end
+            self._layout_key, self._layout = key, layout
+        return self._layout
+
+    def seal_batch(self, records, out=None):
+        """
+        Chiffre un lot d'enregistrements bout à bout dans out (réutilisé s'il est assez grand,
+        alloué sinon) ; retourne la memoryview des octets écrits.
+        Les vues de trames d'un tampon réutilisé sont gardées en cache pour les lots de même forme :
+        un bytearray passé ici ne peut plus être redimensionné tant qu'il reste le dernier utilisé.
+        """
+        lengths = tuple(map(len, records))
+        total = sum(lengths) + len(lengths) * (FRAME_HEADER.size + TAG_SIZE)
+        if out is None or len(out) < total:
+            out = bytearray(total)
+        pack_into = FRAME_HEADER.pack_into
+        for record, (offset, nonce, header, body) in zip(records, self._frame_layout(out, lengths)):
+            counter = self._next_counter(len(record))
+            pack_into(out, offset, self.keys.epoch, counter, len(record))
+            if self._encrypt_into:
+                self.keys.aead.encrypt_into(nonce, record, header, body)
+            else:
+                body[:] = self.keys.aead.encrypt(nonce, record, header)
+        return memoryview(out)[:total]
+
+
+class WaveFrameOpener:
+    """
+    Déchiffrement et vérification des trames côté récepteur.
+    Les compteurs doivent croître strictement au sein d'une époque (des trames perdues sont
+    tolérées, pas les rejeux) ; une nouvelle époque fait avancer le cliquet et oublie l'ancienne clé.
+    Un récepteur correspond à un flux, identifié par l'en-tête de flux de son émetteur.
+    """
+    def __init__(self, hybrid_secret, stream_header, direction=b"downlink", cipher=DEFAULT_CIPHER):
+        self.stream_id = parse_stream_header(stream_header)
+        self.keys = _TrafficKeys(hybrid_secret, direction, cipher, self.stream_id)
+        self.last_counter = -1
+        self._decrypt_into = hasattr(self.keys.aead, "decrypt_into")
+        self.stats = {"frames": 0, "bytes": 0, "rejected": 0}
+
+    def _check_header(self, header):
+        epoch, counter, record_len = FRAME_HEADER.unpack(header)
+        if epoch < self.keys.epoch or (epoch == self.keys.epoch and counter <= self.last_counter):
+            self.stats["rejected"] += 1
+            raise WaveFrameError(f"Trame rejouée ou périmée (époque {epoch}, compteur {counter}).")
+        if epoch - self.keys.epoch > MAX_EPOCH_SKIP:
+            self.stats["rejected"] += 1
+            raise WaveFrameError(f"Époque {epoch} trop éloignée de l'époque courante {self.keys.epoch}.")
+        return epoch, counter, record_len
+
+    def _advance(self, epoch, counter, record_len):
+        # Appelé après authentification réussie : une trame forgée ne fait pas avancer le cliquet
+        self.last_counter = counter
+        self.stats["frames"] += 1
+        self.stats["bytes"] += record_len
+
+    def _aead_for(self, epoch):
+        if epoch == self.keys.epoch:
+            return self.keys.aead, None
+        candidate = self.keys.advanced(epoch)
+        return candidate.aead, candidate
+
+    def open_from(self, buffer, offset=0, out=None):
+        """
+        Déchiffre la trame qui commence à offset dans buffer ; retourne (clair, offset suivant).
+        Avec out (tampon préalloué) et decrypt_into(), le clair est écrit dans out et une
+        memoryview sur celui-ci est retournée. Lève cryptography.exceptions.InvalidTag si la trame est altérée.
+        """
+        view = memoryview(buffer)
+        if len(view) - offset < FRAME_HEADER.size + TAG_SIZE:
+            raise WaveFrameError("Trame tronquée.")
+        header = bytes(view[offset:offset + FRAME_HEADER.size])
+        epoch, counter, record_len = self._check_header(header)
+        start = offset + FRAME_HEADER.size
+        end = start + record_len + TAG_SIZE
+        if end > len(view):
+            raise WaveFrameError("Trame tronquée.")
+        aead, new_keys = self._aead_for(epoch)
+        try:
+            if out is not None and self._decrypt_into:
+                plaintext = memoryview(out)[:record_len]
+                aead.decrypt_into(header[:NONCE_SIZE], view[start:end], header, plaintext)
+            else:
+                plaintext = aead.decrypt(header[:NONCE_SIZE], view[start:end], header)
+        except InvalidTag:
+            self.stats["rejected"] += 1
+            raise
+        if new_keys is not None:
+            self.keys = new_keys
+        self._advance(epoch, counter, record_len)
+        return plaintext, end
+
+    def open(self, frame):
+        return self.open_from(frame)[0]
+
+    def open_batch(self, buffer):
+        """Déchiffre toutes les trames d'un tampon produit par seal_batch() ; retourne la liste des clairs."""
+        records = []
+        offset = 0
+        while offset < len(buffer):
+            record, offset = self.open_from(buffer, offset)
+            records.append(record)
+        return records
+
+
+def telemetry_channel(hybrid_secret, direction=b"downlink", cipher=DEFAULT_CIPHER, rekey_bytes=DEFAULT_REKEY_BYTES):
+    """Paire (émetteur, récepteur) d'un même flux, pour les simulations où les deux extrémités sont locales."""
+    sealer = WaveFrameSealer(hybrid_secret, direction, cipher, rekey_bytes)
+    return sealer, WaveFrameOpener(hybrid_secret, sealer.stream_header, direction, cipher)
+
+
+def run_aead_benchmark(record_size=1024, n_records=200_000, batch_size=256):
+    """
+    Débit de chiffrement de la télémétrie en Mo/s sur un cœur (un seul thread),
+    trame par trame et par lots dans un tampon réutilisé, pour chaque AEAD.
+    """
+    import time
+
+    from astra_bench import report
+
+    secret = os.urandom(32)
+    records = [os.urandom(record_size) for _ in range(batch_size)]
+    megabytes = record_size * n_records / 1e6
+    n_batches = n_records // batch_size
+    print(f"\n--- Chiffrement de la télémétrie WAVE ({n_records} enregistrements de {record_size} octets, 1 cœur) ---")
+    results = []
+    for cipher in CIPHERS:
+        sealer, opener = telemetry_channel(secret, cipher=cipher)
+        start = time.perf_counter()
+        for i in range(n_records):
+            sealer.seal(records[i % batch_size])
+        results.append(report(f"{cipher} trame par trame", megabytes, time.perf_counter() - start, unit="Mo"))
+
+        sealer, opener = telemetry_channel(secret, cipher=cipher)
+        out = bytearray(sum(frame_size(len(r)) for r in records))
+        start = time.perf_counter()
+        for _ in range(n_batches):
+            frames = sealer.seal_batch(records, out)
+        seconds = time.perf_counter() - start
+        results.append(report(f"{cipher} par lots de {batch_size}", record_size * batch_size * n_batches / 1e6,
+                              seconds, unit="Mo"))
+
+        start = time.perf_counter()
+        opened = opener.open_batch(frames)
+        # Le récepteur ne voit que le dernier lot : les trames précédentes sont considérées perdues
+        results.append(report(f"{cipher} déchiffrement", record_size * len(opened) / 1e6,
+                              time.perf_counter() - start, unit="Mo"))
+        print(f"   encrypt_into : {'oui' if sealer._encrypt_into else 'non (une copie par trame)'}")
+    return results
+
+
+if __name__ == "__main__":
+    run_aead_benchmark()
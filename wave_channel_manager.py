@@ -0,0 +1,258 @@
+# wave_channel_manager.py
+import hashlib
+import hmac
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF, HKDFExpand
+
+HASH_LEN = 32
+HKDF_HASH = hashes.SHA256()
+
+
+def hkdf_expand(prk, info, length=HASH_LEN):
+    """HKDF-Expand (RFC 5869) avec HMAC-SHA256."""
+    return HKDFExpand(HKDF_HASH, length, info).derive(prk)
+
+
+def hkdf(ikm, salt=b"", info=b"", length=HASH_LEN):
+    """HKDF complet (RFC 5869) avec HMAC-SHA256 ; un sel vide vaut HASH_LEN octets nuls."""
+    return HKDF(HKDF_HASH, length, salt or None, info).derive(ikm)
+
+
+def resumed_root(resumption_secret, ticket_id, nonce):
+    """Racine d'une session reprise, calculée à l'identique par la station et par le satellite."""
+    return hkdf(resumption_secret, salt=nonce, info=b"astra-wave resumed root" + ticket_id)
+
+
+def key_confirmation(root_secret):
+    """Valeur de confirmation échangée pour vérifier que les deux extrémités ont la même racine."""
+    return hkdf(root_secret, info=b"astra-wave confirm")
+
+
+class ChannelSession:
+    """
+    Session WAVE établie avec un satellite.
+    Les clés de commande sont dérivées par cliquet HKDF : chaque clé de chaîne est remplacée
+    après usage, une clé compromise ne révèle donc ni les clés passées ni la clé racine.
+    """
+    def __init__(self, satellite_id, root_secret, ttl, max_uses, resumed=False):
+        self.satellite_id = satellite_id
+        self.created_at = time.monotonic()
+        self.expires_at = self.created_at + ttl
+        self.max_uses = max_uses
+        self.uses = 0
+        self.resumed = resumed
+        self._chain_key = hkdf(root_secret, info=b"astra-wave chain")
+        self.resumption_secret = hkdf(root_secret, info=b"astra-wave resumption")
+        self.confirmation = key_confirmation(root_secret)
+
+    def is_valid(self, now=None):
+        return self.uses < self.max_uses and (now or time.monotonic()) < self.expires_at
+
+    def next_command_key(self):
+        """Retourne (compteur, clé de commande de 32 octets) et fait avancer le cliquet."""
+        counter = self.uses
+        label = counter.to_bytes(8, "big")
+        command_key = hkdf_expand(self._chain_key, b"astra-wave command" + label)
+        self._chain_key = hkdf_expand(self._chain_key, b"astra-wave ratchet" + label)
+        self.uses += 1
+        return counter, command_key
+
+    def key_for(self, counter):
+        """Clé de la commande n°counter côté récepteur (commandes perdues sautées, rejeux refusés)."""
+        if counter < self.uses:
+            raise ValueError(f"Clé de commande n°{counter} déjà consommée.")
+        while self.uses < counter:
+            self.next_command_key()
+        return self.next_command_key()[1]
+
+
+class SatelliteChannelEndpoint:
+    """
+    Extrémité satellite d'un canal WAVE : session courante et ticket de reprise reçu de la station.
+    Le satellite recalcule lui-même la racine d'une session reprise à partir du ticket et du nonce
+    envoyés par la station ; aucun secret ne transite.
+    """
+    def __init__(self, satellite_id):
+        self.satellite_id = satellite_id
+        self.session = None
+        self.ticket_id = None
+
+    def accept(self, root_secret, ttl, max_uses):
+        """Session issue d'une poignée de main complète ; retourne la confirmation de clé."""
+        self.session = ChannelSession(self.satellite_id, root_secret, ttl, max_uses)
+        return self.session.confirmation
+
+    def store_ticket(self, ticket_id):
+        self.ticket_id = ticket_id
+
+    def resume(self, ticket_id, nonce, ttl, max_uses):
+        """Reprise 0-RTT : dérive la nouvelle racine du ticket, qui est consommé ; retourne la confirmation."""
+        if self.session is None or ticket_id != self.ticket_id:
+            raise ConnectionError(f"[{self.satellite_id}] Ticket de reprise inconnu.")
+        self.ticket_id = None
+        root = resumed_root(self.session.resumption_secret, ticket_id, nonce)
+        self.session = ChannelSession(self.satellite_id, root, ttl, max_uses, resumed=True)
+        return self.session.confirmation
+
+    def command_key(self, counter):
+        return self.session.key_for(counter)
+
+
+class WaveChannelManager:
+    """
+    Gestionnaire des canaux hybrides WAVE côté station sol.
+    Un canal établi est réutilisé tant que sa durée de vie (TTL) et son nombre d'usages le permettent.
+    À expiration, un ticket de reprise à usage unique rétablit une session sans KEM ni signature
+    (reprise 0-RTT : la station envoie l'identifiant du ticket et un nonce frais, le satellite
+    dérive la même racine) ; la poignée de main complète n'est rejouée que sans ticket valide.
+    Le satellite doit exposer wave_endpoint (SatelliteChannelEndpoint).
+    """
+    def __init__(self, ground_station, session_ttl=300.0, max_uses=1000, ticket_ttl=3600.0, max_sessions=10_000):
+        self.ground_station = ground_station
+        self.session_ttl = session_ttl
+        self.max_uses = max_uses
+        self.ticket_ttl = ticket_ttl
+        self.max_sessions = max_sessions
+        self._sessions = OrderedDict()
+        self._tickets = {}
+        self._lock = threading.Lock()
+        self.stats = {"handshakes": 0, "resumptions": 0, "cache_hits": 0, "expired": 0, "failed_handshakes": 0,
+                      "failed_resumptions": 0, "revoked": 0}
+
+    def has_session(self, satellite_id):
+        """Vrai si une commande peut partir sans poignée de main (session valide ou ticket de reprise)."""
+        with self._lock:
+            session = self._sessions.get(satellite_id)
+            if session is not None and session.is_valid():
+                return True
+            ticket = self._tickets.get(satellite_id)
+            return ticket is not None and ticket[2] > time.monotonic()
+
+    def command_key(self, satellite):
+        """
+        Clé de la prochaine commande pour ce satellite : (compteur, clé, mode, reprise), où mode vaut
+        'cached', 'resumed' ou 'handshake' et reprise est le couple (ticket_id, nonce) à transmettre
+        au satellite lors d'une reprise (None sinon). Lève ConnectionError si l'identité du satellite
+        est invalide ou révoquée, ou si les deux extrémités ne dérivent pas la même racine.
+        """
+        satellite_id = satellite.name
+        with self._lock:
+            if self._is_revoked(satellite):
+                # Identité révoquée : ni session en cache ni ticket ne doivent plus servir
+                self._sessions.pop(satellite_id, None)
+                self._tickets.pop(satellite_id, None)
+                self.stats["revoked"] += 1
+                raise ConnectionError(f"Identité du satellite {satellite_id} révoquée : canal refusé.")
+            session = self._sessions.get(satellite_id)
+            if session is not None and session.is_valid():
+                self._sessions.move_to_end(satellite_id)
+                self.stats["cache_hits"] += 1
+                return (*session.next_command_key(), "cached", None)
+            if session is not None:
+                self.stats["expired"] += 1
+            ticket = self._tickets.pop(satellite_id, None)
+        resumption = None
+        if ticket is not None and ticket[2] > time.monotonic():
+            session, resumption = self._resume(satellite, ticket)
+            mode = "resumed" if resumption is not None else "handshake"
+        else:
+            # Poignée de main complète hors verrou : les autres satellites restent servis
+            session = self._handshake(satellite)
+            mode = "handshake"
+        with self._lock:
+            ticket_id = self._store(session)
+            counter, command_key = session.next_command_key()
+        # Nouveau ticket transmis au satellite avec la réponse (chiffré par la session dans un vrai lien)
+        satellite.wave_endpoint.store_ticket(ticket_id)
+        return counter, command_key, mode, resumption
+
+    def _is_revoked(self, satellite):
+        identity_cache = getattr(self.ground_station, "identity_cache", None)
+        return identity_cache is not None and identity_cache.is_revoked(satellite.signing_pk)
+
+    def _resume(self, satellite, ticket):
+        ticket_id, resumption_secret, _ = ticket
+        # Nonce frais : deux reprises à partir du même ticket ne peuvent pas donner la même racine
+        nonce = os.urandom(16)
+        session = ChannelSession(satellite.name, resumed_root(resumption_secret, ticket_id, nonce),
+                                 self.session_ttl, self.max_uses, resumed=True)
+        try:
+            confirmation = satellite.wave_endpoint.resume(ticket_id, nonce, self.session_ttl, self.max_uses)
+        except ConnectionError:
+            confirmation = None
+        if confirmation is None or not hmac.compare_digest(confirmation, session.confirmation):
+            # Ticket refusé ou racines divergentes : repli sur une poignée de main complète
+            self.stats["failed_resumptions"] += 1
+            return self._handshake(satellite), None
+        self.stats["resumptions"] += 1
+        return session, (ticket_id, nonce)
+
+    def _handshake(self, satellite):
+        signing_pk, kem_pk, signature = satellite.get_signed_public_keys()
+        result = self.ground_station.establish_hybrid_channel(signing_pk, kem_pk, signature)
+        if result is None:
+            self.stats["failed_handshakes"] += 1
+            raise ConnectionError(f"Identité du satellite {satellite.name} invalide : canal refusé.")
+        ciphertext, hybrid_secret, classic_secret = result
+        # Côté satellite : il recalcule le secret hybride et renvoie sa confirmation de clé
+        satellite_secret = hashlib.sha256(satellite.decrypt_hybrid_secret(ciphertext) + classic_secret).digest()
+        confirmation = satellite.wave_endpoint.accept(satellite_secret, self.session_ttl, self.max_uses)
+        session = ChannelSession(satellite.name, hybrid_secret, self.session_ttl, self.max_uses)
+        if not hmac.compare_digest(confirmation, session.confirmation):
+            self.stats["failed_handshakes"] += 1
+            raise ConnectionError(f"Secrets hybrides divergents avec {satellite.name} : canal refusé.")
+        self.stats["handshakes"] += 1
+        return session
+
+    def _store(self, session):
+        self._sessions[session.satellite_id] = session
+        self._sessions.move_to_end(session.satellite_id)
+        # Ticket à usage unique, renouvelé à chaque nouvelle session
+        ticket_id = os.urandom(16)
+        self._tickets[session.satellite_id] = (ticket_id, session.resumption_secret,
+                                               time.monotonic() + self.ticket_ttl)
+        while len(self._sessions) > self.max_sessions:
+            evicted, _ = self._sessions.popitem(last=False)
+            self._tickets.pop(evicted, None)
+        return ticket_id
+
+    def invalidate(self, satellite_id):
+        """Oublie la session et le ticket d'un satellite (compromission, changement d'identité)."""
+        with self._lock:
+            self._sessions.pop(satellite_id, None)
+            self._tickets.pop(satellite_id, None)
+
+
+def run_channel_benchmark(n_commands=10_000, max_uses=1000):
+    """Compare une poignée de main par commande au gestionnaire de canaux."""
+    import contextlib
+    import io
+
+    from wave_hybrid_prod import AuthenticatedSatellite, SecureGroundStation
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        satellite = AuthenticatedSatellite()
+        ground_station = SecureGroundStation()
+        manager = WaveChannelManager(ground_station, max_uses=max_uses)
+        start = time.perf_counter()
+        for _ in range(min(n_commands, 500)):
+            ground_station.establish_hybrid_channel(*satellite.get_signed_public_keys())
+        handshake_rate = min(n_commands, 500) / (time.perf_counter() - start)
+        start = time.perf_counter()
+        for _ in range(n_commands):
+            counter, command_key, _, _ = manager.command_key(satellite)
+            if satellite.wave_endpoint.command_key(counter) != command_key:
+                raise RuntimeError("Clés de commande divergentes entre station et satellite.")
+        managed_rate = n_commands / (time.perf_counter() - start)
+    print(f"\n--- Canaux WAVE ({n_commands} commandes, {max_uses} usages par session) ---")
+    print(f"Poignée de main par commande : {handshake_rate:,.0f} commandes/s")
+    print(f"Gestionnaire de canaux       : {managed_rate:,.0f} commandes/s {manager.stats}")
+
+
+if __name__ == "__main__":
+    run_channel_benchmark()
@@ -2,23 +2,31 @@
 import hashlib
 import os
 
-# --- Simulation des primitives PQC si pq_crystals n'est pas disponible ---
-try:
-    from pq_crystals.kyber import Kyber1024
-    from pq_crystals.dilithium import Dilithium5
-    PQC_AVAILABLE = True
-except ImportError:
-    PQC_AVAILABLE = False
-    print("[SIMULATION] pq_crystals non disponible, utilisation de primitives simulées.")
-    from pqc_sim import Kyber1024, Dilithium5
+from identity_cache import IdentityCache
+from wave_channel_manager import SatelliteChannelEndpoint
+
+# --- Primitives PQC : liboqs, pq_crystals ou simulateur selon l'environnement ---
+from pqc_backend import BACKEND, Dilithium5, Kyber1024
+
+PQC_AVAILABLE = not BACKEND.simulated
+if not PQC_AVAILABLE:
+    print("[SIMULATION] Aucune bibliothèque PQC disponible, utilisation de primitives simulées.")
 
 class AuthenticatedSatellite:
     """
     Représente le satellite, qui doit prouver son identité 
     avant d'établir un canal de communication.
     """
-    def __init__(self, name="Astra-Sat-042-Prod"):
+    def __init__(self, name="Astra-Sat-042-Prod", kem_pool=None):
+        """
+        :param kem_pool: KEMKeyPool fournissant une paire Kyber éphémère par session ;
+                         sans réserve, une paire Kyber fixe est générée ici.
+        """
         self.name = name
+        self.kem_pool = kem_pool
+        # État WAVE côté satellite : session en cours et ticket de reprise
+        self.wave_endpoint = SatelliteChannelEndpoint(name)
+        self._session_kem = None
         print(f"Satellite de production '{self.name}' initialisé.")
         
         # 1. Génération de la paire de clés de signature (long terme)
@@ -26,9 +34,16 @@ class AuthenticatedSatellite:
         self.signing_pk, self.signing_sk = Dilithium5.keypair()
         
         # 2. Génération de la paire de clés d'encapsulation (court terme)
-        self.kem_pk, self.kem_sk = Kyber1024.keypair()
+        if kem_pool is None:
+            self.kem_pk, self.kem_sk = Kyber1024.keypair()
 
     def get_signed_public_keys(self):
+        if self.kem_pool is not None:
+            # Nouvelle session : clé éphémère prête, la précédente (non consommée) est effacée
+            if self._session_kem is not None:
+                self._session_kem.discard()
+            self._session_kem = self.kem_pool.acquire()
+            self.kem_pk = self._session_kem.public_key
         print(f"[{self.name}] Signature de la clé publique Kyber avec l'identité Dilithium...")
         message_to_sign = hashlib.sha256(self.kem_pk).digest()
         signature = Dilithium5.sign(self.signing_sk, message_to_sign)
@@ -36,21 +51,38 @@ class AuthenticatedSatellite:
         return self.signing_pk, self.kem_pk, signature
 
     def decrypt_hybrid_secret(self, ciphertext):
+        if self.kem_pool is not None:
+            session_kem, self._session_kem = self._session_kem, None
+            if session_kem is None:
+                raise ValueError(f"[{self.name}] Aucune clé KEM de session en attente.")
+            return session_kem.decapsulate(ciphertext)
         return Kyber1024.dec(ciphertext, self.kem_sk)
 
 class SecureGroundStation:
-    def __init__(self, name="GroundStation-EU-Prod"):
+    def __init__(self, name="GroundStation-EU-Prod", identity_cache=None):
+        """
+        :param identity_cache: IdentityCache partagé (par exemple entre stations d'un même site) ;
+                               un cache propre à la station est créé par défaut.
+        """
         self.name = name
+        self.identity_cache = identity_cache if identity_cache is not None else IdentityCache()
         print(f"Station au sol de production '{self.name}' initialisée.")
 
     def establish_hybrid_channel(self, signing_pk, kem_pk, signature):
         print(f"\n[{self.name}] Réception des clés publiques et de la signature du satellite.")
-        print(f"[{self.name}] Vérification de la signature avec la clé publique Dilithium...")
-        message_to_verify = hashlib.sha256(kem_pk).digest()
-        if not Dilithium5.verify(signing_pk, message_to_verify, signature):
-            print(f"[{self.name}] ❌ ALERTE SÉCURITÉ : SIGNATURE INVALIDE ! Communication annulée.")
+        if self.identity_cache.is_revoked(signing_pk):
+            print(f"[{self.name}] ❌ ALERTE SÉCURITÉ : IDENTITÉ RÉVOQUÉE ! Communication annulée.")
             return None
-        print(f"[{self.name}] ✅ Identité du satellite vérifiée. La clé publique Kyber est authentique.")
+        message_to_verify = hashlib.sha256(kem_pk).digest()
+        if self.identity_cache.lookup(signing_pk, message_to_verify, signature):
+            print(f"[{self.name}] ✅ Identité du satellite déjà vérifiée (cache).")
+        else:
+            print(f"[{self.name}] Vérification de la signature avec la clé publique Dilithium...")
+            if not Dilithium5.verify(signing_pk, message_to_verify, signature):
+                print(f"[{self.name}] ❌ ALERTE SÉCURITÉ : SIGNATURE INVALIDE ! Communication annulée.")
+                return None
+            self.identity_cache.remember(signing_pk, message_to_verify, signature)
+            print(f"[{self.name}] ✅ Identité du satellite vérifiée. La clé publique Kyber est authentique.")
         print(f"[{self.name}] Création d'un secret hybride...")
         ciphertext, pqc_secret = Kyber1024.enc(kem_pk)
         classic_secret = os.urandom(32)
@@ -58,6 +90,20 @@ class SecureGroundStation:
         print(f"[{self.name}] ✅ Secret hybride généré.")
         return ciphertext, final_hybrid_secret, classic_secret
 
+def protect_telemetry(secret_at_ground, secret_at_satellite, n_records=4):
+    """Chiffre un lot de télémétrie côté satellite et le déchiffre côté sol avec le secret hybride."""
+    from wave_aead import WaveFrameOpener, WaveFrameSealer
+
+    sealer = WaveFrameSealer(secret_at_satellite, direction=b"downlink")
+    # L'en-tête de flux précède les trames sur la liaison descendante
+    opener = WaveFrameOpener(secret_at_ground, sealer.stream_header, direction=b"downlink")
+    records = [f"TLM frequency=12.5 power=100.0 seq={i}".encode() for i in range(n_records)]
+    frames = sealer.seal_batch(records)
+    if opener.open_batch(frames) == records:
+        print(f"🔒 Télémétrie protégée : {n_records} trames ChaCha20-Poly1305 ({len(frames)} octets) authentifiées.")
+    else:
+        print("❌ ÉCHEC : La télémétrie déchiffrée ne correspond pas !")
+
 def run_hybrid_production_scenario():
     print("\n--- SCÉNARIO DE PRODUCTION ASTRA WAVE : CANAL AUTHENTIFIÉ ET HYBRIDE ---")
     satellite = AuthenticatedSatellite()
@@ -76,6 +122,7 @@ def run_hybrid_production_scenario():
             print("\n=============================================")
             print("✅ SUCCÈS : Canal authentifié et hybride établi.")
             print("=============================================")
+            protect_telemetry(hybrid_secret_at_ground, final_hybrid_secret_sat)
         else:
             print("\n=============================================")
             print("❌ ÉCHEC : Les secrets hybrides ne correspondent pas !")
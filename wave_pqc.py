@@ -1,4 +1,4 @@
-from pq_crystals.kyber import Kyber1024 # Utilisation de Kyber-1024, le plus haut niveau de sécurité
+from pqc_backend import Kyber1024 # Utilisation de Kyber-1024 / ML-KEM-1024, le plus haut niveau de sécurité
 
 class GroundStation:
     """Représente la station au sol qui initie la communication."""